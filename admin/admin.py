@@ -1,18 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import insert, delete
-from database import get_async_session
-from auth.utils import verify_token
+from sqlalchemy.exc import IntegrityError
+from database import get_async_session, pool_stats, replica_engine, replica_monitor
+from auth.utils import token_cache, current_user_cache, claims_versions
 from models.models import user, saved_client, saved_seller, gigs_category, gigs_tags,skills,seller,seller_occupation
-from admin.utils import superuser_check
+from models.models import gig_tag_association, gigs
+from admin.utils import superuser_check, reference_cache, reference_response
 from admin.schemes import UserResponse, ClientCreate, TagCreate,SkillCreate1,SellerResponse,UserWithSellerResponse
 from typing import List
 from admin.schemes import GigCategoryPost
 from fastapi.responses import JSONResponse
 from sqlalchemy import join
-from auth.auth import pwd_context
+from auth.passwords import password_hasher
+from ratelimit import rate_limiter
 from client.schemes import GigCategoryResponse,GigTag
+from jobs import enqueue, job_queue
+from seller.utils import profile_cache
+from storage.blobs import release_gig_blobs, release_seller_blobs, collect_garbage
+from storage.reaper import reap_orphans
 
 from models.models import occupation,seller_occupation
 from admin.schemes import OccupCreate1,SellerOccupation
@@ -45,7 +52,7 @@ async def add_client(
         )
 
    
-    hashed_password = pwd_context.hash(client_data.password)
+    hashed_password = await password_hasher.hash(client_data.password)
 
   
     query = insert(user).values(
@@ -187,9 +194,19 @@ async def delete_user(
         raise HTTPException(status_code=404, detail="User not found")
 
  
+    gig_result = await session.execute(select(gigs.c.id).where(gigs.c.user_id == user_id))
+    user_gig_ids = gig_result.scalars().all()
+
+    await release_gig_blobs(session, gigs.c.user_id == user_id)
+    await release_seller_blobs(session, seller.c.user_id == user_id)
     query = delete(user).where(user.c.id == user_id)
     await session.execute(query)
+    if user_gig_ids:
+        await enqueue(session, 'reindex_gigs', gig_ids=user_gig_ids)
     await session.commit()
+    claims_versions.delete(user_id)
+    await current_user_cache.delete(user_id)
+    await profile_cache.clear()
 
     return JSONResponse(
         status_code=200,
@@ -215,9 +232,14 @@ async def create_gig_category(
  
     new_category_data = new_category.dict()
     query = insert(gigs_category).values(**new_category_data).returning(gigs_category)
-    result = await session.execute(query)
-    created_category = result.fetchone()
-    await session.commit()
+    try:
+        result = await session.execute(query)
+        created_category = result.fetchone()
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=400, detail="This category already exists")
+    await reference_cache.refresh(session, 'categories')
 
     if created_category:
         return JSONResponse(
@@ -233,23 +255,10 @@ async def create_gig_category(
 
 
 @router_superuser.get('/categories', response_model=List[GigCategoryResponse], summary="Get all Gig Categories")
-async def get_all_gig_categories(
-    session: AsyncSession = Depends(get_async_session)
-):
- 
-    result = await session.execute(select(gigs_category))
-    categories_data = result.fetchall()
-    
- 
-    categories = [
-        GigCategoryResponse(
-            id=category.id,
-            category_name=category.category_name
-        )
-        for category in categories_data
-    ]
+async def get_all_gig_categories(request: Request, session: AsyncSession = Depends(get_async_session)):
+    entry = await reference_cache.get(session, 'categories')
 
-    return categories
+    return reference_response(request, entry)
 
 
 
@@ -266,8 +275,15 @@ async def delete_gig_category(
     if not category_data:
         raise HTTPException(status_code=404, detail="Category not found")
 
+    gig_result = await session.execute(select(gigs.c.id).where(gigs.c.category_id == category_id))
+    category_gig_ids = gig_result.scalars().all()
+
+    await release_gig_blobs(session, gigs.c.category_id == category_id)
     await session.execute(delete(gigs_category).where(gigs_category.c.id == category_id))
+    if category_gig_ids:
+        await enqueue(session, 'reindex_gigs', gig_ids=category_gig_ids)
     await session.commit()
+    await reference_cache.refresh(session, 'categories')
 
     return JSONResponse(
         status_code=200,
@@ -282,8 +298,13 @@ async def create_tag(
 ):
     tag_data = new_tag.dict()
     query = insert(gigs_tags).values(**tag_data)
-    await session.execute(query)
-    await session.commit()
+    try:
+        await session.execute(query)
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=400, detail="This tag already exists")
+    await reference_cache.refresh(session, 'tags')
 
     return JSONResponse(
         status_code=201,
@@ -296,18 +317,13 @@ async def create_tag(
 
 
 @router_superuser.get('/tag', response_model=List[GigTag], summary="Get all tags")
-async def get_tags(session: AsyncSession = Depends(get_async_session)):
-    query = select(gigs_tags)
-    result = await session.execute(query)
-    tags_data = result.fetchall()
-    
+async def get_tags(request: Request, session: AsyncSession = Depends(get_async_session)):
+    entry = await reference_cache.get(session, 'tags')
 
-    tags_list = [GigTag(id=row.id, tag_name=row.tag_name) for row in tags_data]
-
-    if not tags_list:
+    if not entry.items:
         raise HTTPException(status_code=404, detail="No tags found")
 
-    return tags_list
+    return reference_response(request, entry)
 
 
 
@@ -324,9 +340,15 @@ async def delete_tag(
     if not tag_data:
         raise HTTPException(status_code=404, detail="Tag not found")
 
+    gig_result = await session.execute(select(gig_tag_association.c.gig_id).where(gig_tag_association.c.tag_id == tag_id))
+    tagged_gig_ids = gig_result.scalars().all()
+
     delete_query = delete(gigs_tags).where(gigs_tags.c.id == tag_id)
     await session.execute(delete_query)
+    if tagged_gig_ids:
+        await enqueue(session, 'reindex_gigs', gig_ids=tagged_gig_ids)
     await session.commit()
+    await reference_cache.refresh(session, 'tags')
 
     return JSONResponse(
         status_code=200,
@@ -342,8 +364,13 @@ async def create_skill(
 ):
     skill_data = new_skill.dict()
     query = insert(skills).values(**skill_data)
-    await session.execute(query)
-    await session.commit()
+    try:
+        await session.execute(query)
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=400, detail="This skill already exists")
+    await reference_cache.refresh(session, 'skills')
 
     return JSONResponse(
         status_code=201,
@@ -356,18 +383,13 @@ async def create_skill(
 from admin.schemes import SellerSkill
 
 @router_superuser.get('/skills', response_model=List[SellerSkill], summary="Get all tags")
-async def get_tags(session: AsyncSession = Depends(get_async_session)):
-    query = select(skills)
-    result = await session.execute(query)
-    skills_data = result.fetchall()
-    
-
-    skill_list = [SellerSkill(id=row.id, skill_name=row.skill_name) for row in skills_data]
+async def get_tags(request: Request, session: AsyncSession = Depends(get_async_session)):
+    entry = await reference_cache.get(session, 'skills')
 
-    if not skill_list:
+    if not entry.items:
         raise HTTPException(status_code=404, detail="No skill found")
 
-    return skill_list
+    return reference_response(request, entry)
 
 
 @router_superuser.delete('/skill/{skill_id}', summary="Delete a skill by ID")
@@ -387,6 +409,8 @@ async def delete_skill(
     delete_query = delete(skills).where(skills.c.id == skill_id)
     await session.execute(delete_query)
     await session.commit()
+    await reference_cache.refresh(session, 'skills')
+    await profile_cache.clear()
 
     return JSONResponse(
         status_code=200,
@@ -402,8 +426,13 @@ async def create_skill(
 ):
     occup_data = new_occup.dict()
     query = insert(occupation).values(**occup_data)
-    await session.execute(query)
-    await session.commit()
+    try:
+        await session.execute(query)
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=400, detail="This occupation already exists")
+    await reference_cache.refresh(session, 'occupations')
 
     return JSONResponse(
         status_code=201,
@@ -415,18 +444,13 @@ async def create_skill(
 
 
 @router_superuser.get('/occupations', response_model=List[SellerOccupation], summary="Get all tags")
-async def get_occup(session: AsyncSession = Depends(get_async_session)):
-    query = select(occupation)
-    result = await session.execute(query)
-    occup_data = result.fetchall()
-    
+async def get_occup(request: Request, session: AsyncSession = Depends(get_async_session)):
+    entry = await reference_cache.get(session, 'occupations')
 
-    occup_list = [SellerOccupation(id=row.id, occup_name=row.occup_name) for row in occup_data]
-
-    if not occup_list:
+    if not entry.items:
         raise HTTPException(status_code=404, detail="No occupation found")
 
-    return occup_list
+    return reference_response(request, entry)
 
 
 
@@ -448,8 +472,71 @@ async def delete_occupation(
     delete_query = delete(occupation).where(occupation.c.id == occupation_id)
     await session.execute(delete_query)
     await session.commit()
+    await reference_cache.refresh(session, 'occupations')
+    await profile_cache.clear()
 
     return JSONResponse(
         status_code=200,
         content={"message": "Occupation successfully deleted"}
-    )
\ No newline at end of file
+    )
+
+
+
+@router_superuser.get('/stats/cache', summary="Cache hit/miss/eviction counters")
+async def get_cache_stats(user_data: dict = Depends(superuser_check)):
+    return {
+        "seller_profile": profile_cache.stats(),
+        "reference": reference_cache.stats(),
+        "token": token_cache.stats(),
+        "current_user": current_user_cache.stats()
+    }
+
+
+@router_superuser.get('/stats/pool', summary="Database connection pool usage")
+async def get_pool_stats(user_data: dict = Depends(superuser_check)):
+    return {
+        "primary": pool_stats(),
+        "replica": pool_stats(replica_engine.pool) if replica_engine is not None else None,
+        "replica_routing": replica_monitor.stats()
+    }
+
+
+@router_superuser.get('/stats/password_hasher', summary="Password hashing pool usage")
+async def get_password_hasher_stats(user_data: dict = Depends(superuser_check)):
+    return password_hasher.stats()
+
+
+@router_superuser.get('/stats/rate_limit', summary="Rate limiter allowed/shed counters")
+async def get_rate_limit_stats(user_data: dict = Depends(superuser_check)):
+    return rate_limiter.stats()
+
+
+@router_superuser.get('/stats/jobs', summary="Job queue worker counters and queued jobs by status")
+async def get_job_stats(
+    user_data: dict = Depends(superuser_check),
+    session: AsyncSession = Depends(get_async_session)
+):
+    return await job_queue.stats(session)
+
+
+@router_superuser.post('/storage/gc', summary="Remove stored files no longer referenced by any row")
+async def collect_storage_garbage(
+    user_data: dict = Depends(superuser_check),
+    session: AsyncSession = Depends(get_async_session)
+):
+    return await collect_garbage(session)
+
+
+@router_superuser.post('/storage/reap', summary="Find files on disk that no row references and delete or quarantine them")
+async def reap_storage_orphans(
+    dry_run: bool = True,
+    quarantine: bool = False,
+    in_background: bool = False,
+    user_data: dict = Depends(superuser_check),
+    session: AsyncSession = Depends(get_async_session)
+):
+    if in_background:
+        await enqueue(session, 'reap_orphans', dedupe_key='reap_orphans', dry_run=dry_run, quarantine=quarantine)
+        await session.commit()
+        return JSONResponse(status_code=202, content={"message": "Orphan reaper scheduled"})
+    return await reap_orphans(session, dry_run=dry_run, quarantine=quarantine)
@@ -24,6 +24,7 @@ class SellerResponse(BaseModel):
     id: int
     user_id: int
     image_url: Optional[str]
+    image_thumb_url: Optional[str] = None
     description: Optional[str]
     cv_url: Optional[str]
     birth_date: Optional[str]
@@ -1,27 +1,41 @@
-from models.models import user
-from fastapi import HTTPException,status
+from models.models import user, gigs_category, gigs_tags, skills, occupation
+from fastapi import HTTPException,status, Request, Response
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, Depends
-from auth.utils import verify_token
+from auth.utils import require_superuser
 from database import get_async_session
+from cache import ReferenceCache
+from config import REFERENCE_CACHE_TTL
 
 
-async def superuser_check(
-    token: dict = Depends(verify_token), 
-    session: AsyncSession = Depends(get_async_session)
-):
-    if token is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not registered")
-    
-    user_id = token.get('user_id')
-    if not user_id:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+superuser_check = require_superuser
 
-    result = await session.execute(select(user).where(user.c.id == user_id))
-    user_data = result.fetchone()
 
-    if not user_data or not user_data.is_superuser:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="you have not permission")
+def _reference_loader(table, *columns):
+    async def load(session: AsyncSession):
+        result = await session.execute(select(*[table.c[column] for column in columns]).order_by(table.c.id))
+        return [dict(row._mapping) for row in result.fetchall()]
+    return load
 
-    return user_data
+
+reference_cache = ReferenceCache(
+    {
+        'categories': _reference_loader(gigs_category, 'id', 'category_name'),
+        'tags': _reference_loader(gigs_tags, 'id', 'tag_name'),
+        'skills': _reference_loader(skills, 'id', 'skill_name'),
+        'occupations': _reference_loader(occupation, 'id', 'occup_name')
+    },
+    ttl=REFERENCE_CACHE_TTL
+)
+
+
+def reference_response(request: Request, entry):
+    headers = {'ETag': entry.etag, 'Cache-Control': 'no-cache'}
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        etags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        if '*' in etags or entry.etag in etags:
+            reference_cache.not_modified += 1
+            return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type='application/json', headers=headers)
@@ -1,18 +1,47 @@
+import logging
 from typing import List
-import aiofiles
 from fastapi import APIRouter, Depends, HTTPException, UploadFile
-from passlib.context import CryptContext
-from sqlalchemy import select, insert
+from sqlalchemy import select, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from sqlalchemy.exc import NoResultFound
-from .schemes import UserRegister, UserInDB, UserLogin, UserResponse
-from .utils import generate_token, verify_token
-from database import get_async_session
+from sqlalchemy.exc import NoResultFound, IntegrityError
+from .schemes import UserRegister, UserInDB, UserLogin, UserResponse, TokenRefresh
+from .utils import generate_token, verify_token, decode_token, revoke_token, user_claims, bump_claims_version
+from .utils import current_user_cache
+from .passwords import password_hasher
+from database import get_async_session, violated_constraint
 from models.models import user , seller
+from storage.utils import save_upload
+from storage.blobs import retain_blob
+from jobs import enqueue
 
 auth_router = APIRouter()
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+logger = logging.getLogger(__name__)
+
+CURRENT_USER_FIELDS = (
+    'id', 'first_name', 'last_name', 'email', 'username', 'registered_date', 'is_seller', 'is_client', 'telegram_username'
+)
+
+UNIQUE_USER_FIELDS = (
+    ('username', 'Username already in use'),
+    ('email', 'Email already in use'),
+    ('telegram_username', 'Telegram username in use'),
+    ('phone_number', 'Phone already in use')
+)
+
+
+def unique_violation_detail(error: IntegrityError):
+    constraint = violated_constraint(error)
+    # The constraints carry Postgres' default '<table>_<column>_key' names.
+    for field, detail in UNIQUE_USER_FIELDS:
+        if constraint == f'user_{field}_key':
+            return detail
+    return 'Account already exists'
+
+
+def select_user_with_seller_id():
+    seller_id = select(seller.c.id).where(seller.c.user_id == user.c.id).order_by(seller.c.id).limit(1).scalar_subquery()
+    return select(user, seller_id.label('seller_id'))
 
 
 @auth_router.post('/register')
@@ -23,57 +52,54 @@ async def register(
         if user1.password1 != user1.password2:
             raise HTTPException(status_code=400, detail='Passwords are not the same!')
 
-        username_query = select(user).where(user.c.username == user1.username)
-        email_query = select(user).where(user.c.email == user1.email)
-        telegram_query=select(user).where(user.c.telegram_username == user1.telegram_username)
-        phone_query=select(user).where(user.c.phone_number == user1.phone_number)
-
-        username_result = await session.execute(username_query)
-        email_result = await session.execute(email_query)
-        telegram_result = await session.execute(telegram_query)
-        phone_result= await session.execute(phone_query)
-
-        if username_result.first():
-            raise HTTPException(status_code=400, detail="Username already in use")
-        if email_result.first():
-            raise HTTPException(status_code=400, detail="Email already in use")
-        if telegram_result.first():
-            raise HTTPException(status_code=400, detail="Telegram username in use")
-        if phone_result.first():
-            raise HTTPException(status_code=400, detail="Phone already in use")
-        password=pwd_context.hash(user1.password1)
-        user_count=await  session.execute(select(user))
-        user_count = len(user_count.fetchall())
-
-        is_superuser=user_count==0
+        taken_query = select(
+            select(user.c.id).where(user.c.username == user1.username).exists().label('username'),
+            select(user.c.id).where(user.c.email == user1.email).exists().label('email'),
+            select(user.c.id).where(user.c.telegram_username == user1.telegram_username).exists().label('telegram_username'),
+            select(user.c.id).where(user.c.phone_number == user1.phone_number).exists().label('phone_number'),
+            select(user.c.id).exists().label('has_users')
+        )
+        taken = (await session.execute(taken_query)).one()
 
-        user_in_db=UserInDB(**dict(user1),password=password,registered_date=datetime.utcnow(),is_superuser=is_superuser)
-        query=insert(user).values(**dict(user_in_db))
-        result=await session.execute(query)
-        await session.commit()
+        for field, detail in UNIQUE_USER_FIELDS:
+            if getattr(taken, field):
+                raise HTTPException(status_code=400, detail=detail)
+        password=await password_hasher.hash(user1.password1)
 
-        user_id = result.inserted_primary_key[0]
+        is_superuser=not taken.has_users
 
-  
-        if user1.is_seller:
-            seller_query = insert(seller).values(user_id=user_id)
-            await session.execute(seller_query)
+        user_in_db=UserInDB(**dict(user1),password=password,registered_date=datetime.utcnow(),is_superuser=is_superuser)
+        try:
+            query=insert(user).values(**dict(user_in_db)).returning(user.c.id)
+            user_id=(await session.execute(query)).scalar_one()
+
+            if user1.is_seller:
+                seller_query = insert(seller).values(user_id=user_id)
+                await session.execute(seller_query)
             await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            # A concurrent registration won the race past the existence check above.
+            raise HTTPException(status_code=400, detail=unique_violation_detail(e))
         return {'success': True, 'message': 'Account created successfully'}
 
 
 
 @auth_router.post('/login')
 async def login(user_date: UserLogin, session: AsyncSession = Depends(get_async_session)):
-    query = select(user).where(user.c.username == user_date.username)
+    query = select_user_with_seller_id().where(user.c.username == user_date.username)
     userdata = await session.execute(query)
 
     try:
         userdata = userdata.one()
     except NoResultFound:
         raise HTTPException(status_code=404, detail="Username or password is incorrect")
-    if pwd_context.verify(user_date.password, userdata.password):
-        token = generate_token(userdata.id)
+    valid, new_hash = await password_hasher.verify_and_update(user_date.password, userdata.password)
+    if valid:
+        if new_hash is not None:
+            await session.execute(update(user).where(user.c.id == userdata.id).values(password=new_hash))
+            await session.commit()
+        token = generate_token(userdata.id, user_claims(userdata, userdata.seller_id))
         return token
     else:
         raise HTTPException(status_code=404, detail='Username or password is incorrect')
@@ -81,6 +107,39 @@ async def login(user_date: UserLogin, session: AsyncSession = Depends(get_async_
     
 
 
+@auth_router.post('/refresh')
+async def refresh(token_data: TokenRefresh, session: AsyncSession = Depends(get_async_session)):
+    payload = decode_token(token_data.refresh)
+    if payload.get('type') != 'refresh':
+        raise HTTPException(status_code=401, detail='Token invalid!')
+    # Rotation: a refresh token is good for exactly one exchange.
+    if not await revoke_token(session, payload):
+        raise HTTPException(status_code=401, detail='Token is revoked!')
+    await session.commit()
+
+    result = await session.execute(select_user_with_seller_id().where(user.c.id == payload['user_id']))
+    userdata = result.fetchone()
+    if userdata is None:
+        raise HTTPException(status_code=401, detail='User not found')
+
+    return generate_token(userdata.id, user_claims(userdata, userdata.seller_id))
+
+
+@auth_router.post('/logout')
+async def logout(
+    token_data: TokenRefresh,
+    token: dict = Depends(verify_token),
+    session: AsyncSession = Depends(get_async_session)
+):
+    payload = decode_token(token_data.refresh)
+    if payload.get('type') != 'refresh' or payload['user_id'] != token['user_id']:
+        raise HTTPException(status_code=401, detail='Token invalid!')
+    await revoke_token(session, payload)
+    await revoke_token(session, token)
+    await session.commit()
+    return {'success': True}
+
+
 @auth_router.get('/get_current_user')
 async def get_current_user(
     token: dict = Depends(verify_token),
@@ -90,24 +149,19 @@ async def get_current_user(
         return HTTPException(status_code=403, detail='Forbidden')
 
     user_id = token.get('user_id')
-    user_info = select(user).where(user.c.id == user_id)
+    user_dict = await current_user_cache.get(user_id)
+    logger.debug('get_current_user', extra={'user_id': user_id, 'cached': user_dict is not None})
+    if user_dict is not None:
+        return user_dict
+
+    user_info = select(*[user.c[column] for column in CURRENT_USER_FIELDS]).where(user.c.id == user_id)
     user_result = await session.execute(user_info)
     user_data = user_result.fetchone()
-    print(user_data)
     if user_data is None:
         raise HTTPException(status_code=404, detail='User not found')
 
-    user_dict = {
-        "id": user_data[0],
-        "first_name": user_data[1],
-        "last_name": user_data[2],
-        "email": user_data[3],
-        "username": user_data[4],
-        "registered_date": user_data[6],
-        "is_seller": user_data[7],
-        "is_client": user_data[8],
-        "telegram_username":user_data[9]
-    }
+    user_dict = dict(user_data._mapping)
+    await current_user_cache.set(user_id, user_dict)
     return user_dict
 
 
@@ -117,7 +171,6 @@ async def get_users(
     cv: UploadFile = None,
     description: str = None,
     birth_date: datetime = None,
-    active_gigs: int = None,
     session: AsyncSession = Depends(get_async_session),
     token: dict = Depends(verify_token)
 ):
@@ -125,42 +178,47 @@ async def get_users(
         return HTTPException(status_code=403, detail='Forbidden')
     user_id = token.get('user_id')
 
-    user_query = select(user).filter(user.c.id == user_id, user.c.is_seller == True)
-    user_result = await session.execute(user_query)
-    user_record = user_result.scalars().first()
+    user_query = (
+        select(user.c.is_client, user.c.is_seller, user.c.is_superuser, user.c.claims_version, seller.c.id.label('seller_id'))
+        .select_from(user.outerjoin(seller, seller.c.user_id == user.c.id))
+        .where(user.c.id == user_id)
+    )
+    user_record = (await session.execute(user_query)).first()
 
-    if not user_record:
+    if not user_record or not user_record.is_seller:
         raise HTTPException(status_code=400, detail='User is not a seller or does not exist')
-    query = select(seller).where(seller.c.user_id == user_id)
-    result = await session.execute(query)
-    existing_seller = result.scalars().first()
-
-    if existing_seller:
+    if user_record.seller_id is not None:
         raise HTTPException(status_code=400, detail='Seller already exists')
 
     image_path = None
     if image:
-        image_path = f'seller_photos/{user_id}_{image.filename}'
-        async with aiofiles.open(image_path, 'wb') as f:
-            content = await image.read()
-            await f.write(content)
+        image_path = await save_upload(image, 'image')
 
     cv_path = None
     if cv:
-        cv_path = f'seller_cvs/{user_id}_{cv.filename}'
-        async with aiofiles.open(cv_path, 'wb') as f:
-            content = await cv.read()
-            await f.write(content)
+        cv_path = await save_upload(cv, 'cv')
 
     query_insert = insert(seller).values(
         user_id=user_id,
         description=description,
         birth_date=birth_date,
-        active_gigs=active_gigs,
         image_url=image_path,
         cv_url=cv_path
-    )
-    await session.execute(query_insert)
+    ).returning(seller.c.id)
+    try:
+        seller_id = (await session.execute(query_insert)).scalar_one()
+    except IntegrityError:
+        await session.rollback()
+        # A concurrent /add_seller for the same user won the race past the check above.
+        raise HTTPException(status_code=400, detail='Seller already exists')
+    if image_path is not None:
+        await retain_blob(session, 'image', image_path)
+        await enqueue(session, 'process_image', kind='image', url=image_path)
+    if cv_path is not None:
+        await retain_blob(session, 'cv', cv_path)
+    # Tokens issued before this carry no seller_id; retire them and hand back fresh ones.
+    claims_version = await bump_claims_version(session, user_id)
     await session.commit()
 
-    return {"message": "Seller added successfully"}
\ No newline at end of file
+    claims = dict(user_claims(user_record, seller_id), claims_version=claims_version)
+    return {"message": "Seller added successfully", **generate_token(user_id, claims)}
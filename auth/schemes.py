@@ -54,6 +54,10 @@ class UserLogin(BaseModel):
     password: str
 
 
+class TokenRefresh(BaseModel):
+    refresh: str
+
+
 class UserResponse(BaseModel):
     id: int
     first_name: str
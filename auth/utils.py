@@ -1,93 +1,111 @@
+import asyncio
+import hashlib
 import secrets
+import time
 
-import aiofiles
 import jwt
 
 from datetime import datetime, timedelta
-from config import SECRET
+from config import SECRET, TOKEN_CACHE_SIZE, REVOCATION_PURGE_INTERVAL, REVOCATION_REFRESH_INTERVAL, \
+    CURRENT_USER_CACHE_TTL, CURRENT_USER_CACHE_SIZE, CLAIMS_VERSION_CACHE_TTL, CLAIMS_VERSION_CACHE_SIZE
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from fastapi import Depends, HTTPException, UploadFile
+from fastapi import Depends, HTTPException
+from sqlalchemy import select, update, delete, event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import TTLCache, MemoryCacheBackend
+from database import get_async_session, dialect_insert
+from jobs import enqueue, job_handler
+from models.models import user, revoked_token
 
 
 algorithm = 'HS256'
 security = HTTPBearer()
+ACCESS_TOKEN_LIFETIME = timedelta(minutes=30)
+REFRESH_TOKEN_LIFETIME = timedelta(days=1)
 
+# Decoded payloads keyed by token digest; each entry lives only until the token's own exp.
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_LIFETIME.total_seconds())
 
-def generate_token(user_id: int):
-    jti_access = secrets.token_urlsafe(32)
-    jti_refresh = secrets.token_urlsafe(32)
+current_user_cache = MemoryCacheBackend(maxsize=CURRENT_USER_CACHE_SIZE, ttl=CURRENT_USER_CACHE_TTL)
 
-    payload_access = {
-        'type': 'access',
-        'exp': datetime.utcnow() + timedelta(minutes=30),
-        'user_id': user_id,
-        'jti': jti_access
-    }
-    payload_refresh = {
-        'type': 'refresh',
-        'exp': datetime.utcnow() + timedelta(days=1),
-        'user_id': user_id,
-        'jti': jti_refresh
-    }
-    access_token = jwt.encode(payload_access, SECRET, algorithm=algorithm)
-    refresh_token = jwt.encode(payload_refresh, SECRET, algorithm=algorithm)
-    return {
-        'access': access_token,
-        'refresh': refresh_token
-    }
+# user_id -> claims_version. Signed claims are trusted between lookups, so another worker's role change or
+# user deletion is seen here within CLAIMS_VERSION_CACHE_TTL; this worker's own bumps apply on commit.
+claims_versions = TTLCache(maxsize=CLAIMS_VERSION_CACHE_SIZE, ttl=CLAIMS_VERSION_CACHE_TTL)
 
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET, algorithms=[algorithm])
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail='Token is expired!')
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail='Token invalid!')
+class RevocationList:
+    # Per-process mirror of revoked_token, so a request only pays for a set lookup. Other workers' revocations
+    # show up within refresh_interval; entries are dropped once the token they deny has expired anyway.
+    # Rows are picked up by revoked_at, overlapping the previous sync so slow-committing inserts are not missed.
+    SYNC_OVERLAP = timedelta(minutes=1)
 
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._expires = {}
+        self._synced_at = None
+        self._next_refresh = 0.0
+        self._lock = asyncio.Lock()
 
-async def upload_photo(file_upload: UploadFile):
-    out_photo = f'files/{file_upload.filename}'
-    async with aiofiles.open(f'seller_photos/{out_photo}', 'wb') as f:
-        content = await file_upload.read()
-        await f.write(content)
+    def __contains__(self, jti):
+        return jti in self._expires
 
+    def __len__(self):
+        return len(self._expires)
 
-async def upload_file(file_upload: UploadFile):
-    out_file = f'files/{file_upload.filename}'
-    async with aiofiles.open(f'seller_cv/{out_file}', 'wb') as f:
-        content = await file_upload.read()
-        await f.write(content)
-import secrets
+    def add(self, jti, expires_at: datetime):
+        self._expires[jti] = expires_at
 
-import aiofiles
-import jwt
+    def stale(self):
+        return time.monotonic() >= self._next_refresh
 
-from datetime import datetime, timedelta
-from config import SECRET
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from fastapi import Depends, HTTPException, UploadFile
+    async def refresh(self, session: AsyncSession):
+        async with self._lock:
+            if not self.stale():
+                return
+            now = datetime.utcnow()
+            query = select(revoked_token.c.jti, revoked_token.c.expires_at).where(revoked_token.c.expires_at > now)
+            if self._synced_at is not None:
+                query = query.where(revoked_token.c.revoked_at >= self._synced_at - self.SYNC_OVERLAP)
+            rows = (await session.execute(query)).all()
+            self._expires = {jti: expires_at for jti, expires_at in self._expires.items() if expires_at > now}
+            self._expires.update(rows)
+            self._synced_at = now
+            self._next_refresh = time.monotonic() + self.refresh_interval
 
+    def clear(self):
+        self._expires = {}
+        self._synced_at = None
+        self._next_refresh = 0.0
 
-algorithm = 'HS256'
-security = HTTPBearer()
+
+revoked_tokens = RevocationList(REVOCATION_REFRESH_INTERVAL)
 
 
-def generate_token(user_id: int):
+def user_claims(user_row, seller_id=None):
+    return {
+        'is_client': bool(user_row.is_client),
+        'is_seller': bool(user_row.is_seller),
+        'is_superuser': bool(user_row.is_superuser),
+        'seller_id': seller_id,
+        'claims_version': user_row.claims_version
+    }
+
+
+def generate_token(user_id: int, claims: dict = None):
     jti_access = secrets.token_urlsafe(32)
     jti_refresh = secrets.token_urlsafe(32)
 
     payload_access = {
         'type': 'access',
-        'exp': datetime.utcnow() + timedelta(minutes=30),
+        'exp': datetime.utcnow() + ACCESS_TOKEN_LIFETIME,
         'user_id': user_id,
-        'jti': jti_access
+        'jti': jti_access,
+        **(claims or {})
     }
     payload_refresh = {
         'type': 'refresh',
-        'exp': datetime.utcnow() + timedelta(days=1),
+        'exp': datetime.utcnow() + REFRESH_TOKEN_LIFETIME,
         'user_id': user_id,
         'jti': jti_refresh
     }
@@ -99,26 +117,110 @@ def generate_token(user_id: int):
     }
 
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def decode_token(token: str):
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET, algorithms=[algorithm])
-        return payload
+        return jwt.decode(token, SECRET, algorithms=[algorithm], options={'require': ['exp', 'jti']})
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail='Token is expired!')
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail='Token invalid!')
 
 
-async def upload_photo(file_upload: UploadFile):
-    out_photo = f'files/{file_upload.filename}'
-    async with aiofiles.open(f'seller_photos/{out_photo}', 'wb') as f:
-        content = await file_upload.read()
-        await f.write(content)
-
+async def revoke_token(session: AsyncSession, payload: dict) -> bool:
+    # The denylist lives in the DB so every worker sees it; a row only leaves it once its token has expired.
+    # Returns False when the jti was already revoked, which makes refresh-token rotation single-use.
+    expires_at = datetime.utcfromtimestamp(payload['exp'])
+    query = (
+        dialect_insert(session)(revoked_token)
+        .values(jti=payload['jti'], expires_at=expires_at, revoked_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=[revoked_token.c.jti])
+        .returning(revoked_token.c.jti)
+    )
+    revoked = (await session.execute(query)).scalar() is not None
+    # This worker stops accepting the token as soon as the row is durable; the rest catch up on their next refresh.
+    event.listen(session.sync_session, 'after_commit', lambda _: revoked_tokens.add(payload['jti'], expires_at), once=True)
+    await enqueue(session, 'purge_revoked_tokens', delay=REVOCATION_PURGE_INTERVAL, dedupe_key='purge_revoked_tokens')
+    return revoked
+
+
+@job_handler('purge_revoked_tokens')
+async def purge_revoked_tokens(session: AsyncSession):
+    await session.execute(delete(revoked_token).where(revoked_token.c.expires_at < datetime.utcnow()))
+
+
+async def verify_token(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    session: AsyncSession = Depends(get_async_session)
+):
+    token = credentials.credentials
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = decode_token(token)
+        if payload.get('type') != 'access':
+            raise HTTPException(status_code=401, detail='Token invalid!')
+        token_cache.set(key, payload, ttl=payload['exp'] - time.time())
+    elif payload['exp'] <= time.time():
+        token_cache.delete(key)
+        raise HTTPException(status_code=401, detail='Token is expired!')
 
-async def upload_file(file_upload: UploadFile):
-    out_file = f'files/{file_upload.filename}'
-    async with aiofiles.open(f'seller_cv/{out_file}', 'wb') as f:
-        content = await file_upload.read()
-        await f.write(content)
+    if revoked_tokens.stale():
+        await revoked_tokens.refresh(session)
+    if payload['jti'] in revoked_tokens:
+        raise HTTPException(status_code=401, detail='Token is revoked!')
+
+    if 'claims_version' in payload:
+        claims_version = claims_versions.get(payload['user_id'])
+        if claims_version is None:
+            claims_version = (await session.execute(
+                select(user.c.claims_version).where(user.c.id == payload['user_id'])
+            )).scalar()
+            if claims_version is None:
+                raise HTTPException(status_code=401, detail='User not found')
+            claims_versions.set(payload['user_id'], claims_version)
+        if payload['claims_version'] != claims_version:
+            raise HTTPException(status_code=401, detail='Token is outdated, log in again')
+    return payload
+
+
+async def bump_claims_version(session: AsyncSession, user_id: int):
+    result = await session.execute(
+        update(user).where(user.c.id == user_id)
+        .values(claims_version=user.c.claims_version + 1)
+        .returning(user.c.claims_version)
+    )
+    claims_version = result.scalar_one_or_none()
+    if claims_version is not None:
+        event.listen(session.sync_session, 'after_commit', lambda _: _claims_committed(user_id, claims_version), once=True)
+    return claims_version
+
+
+def _claims_committed(user_id: int, claims_version: int):
+    claims_versions.set(user_id, claims_version)
+    # Dropped only once the new claims are visible, so a concurrent /get_current_user cannot re-cache the old ones.
+    asyncio.get_running_loop().create_task(current_user_cache.delete(user_id))
+
+
+async def verify_claims(token: dict = Depends(verify_token)):
+    # verify_token has already matched claims_version; this only rejects tokens minted without it.
+    if 'claims_version' not in token:
+        raise HTTPException(status_code=401, detail='Token is outdated, log in again')
+    return token
+
+
+async def require_client(claims: dict = Depends(verify_claims)):
+    if not claims['is_client']:
+        raise HTTPException(status_code=403, detail='Only clients can perform this action')
+    return claims
+
+
+async def require_seller(claims: dict = Depends(verify_claims)):
+    if claims['seller_id'] is None:
+        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {claims['user_id']}")
+    return claims
+
+
+async def require_superuser(claims: dict = Depends(verify_claims)):
+    if not claims['is_superuser']:
+        raise HTTPException(status_code=403, detail='you have not permission')
+    return claims
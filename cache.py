@@ -0,0 +1,156 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict, namedtuple
+
+
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        item = self._data.get(key, MISSING)
+        if item is MISSING:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            self._data.pop(key, None)
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        return self._data.pop(key, MISSING) is not MISSING
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class CacheBackend:
+    async def get(self, key, default=None):
+        raise NotImplementedError
+
+    async def set(self, key, value, ttl: float = None):
+        raise NotImplementedError
+
+    async def add(self, key, value, ttl: float = None) -> bool:
+        raise NotImplementedError
+
+    async def delete(self, key):
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize, ttl)
+
+    async def get(self, key, default=None):
+        return self._cache.get(key, default)
+
+    async def set(self, key, value, ttl: float = None):
+        self._cache.set(key, value, ttl)
+
+    async def add(self, key, value, ttl: float = None) -> bool:
+        if self._cache.get(key, MISSING) is not MISSING:
+            return False
+        self._cache.set(key, value, ttl)
+        return True
+
+    async def delete(self, key):
+        return self._cache.delete(key)
+
+    async def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+ReferenceEntry = namedtuple('ReferenceEntry', ['items', 'body', 'etag', 'version', 'expires_at'])
+
+
+class ReferenceCache:
+    def __init__(self, loaders: dict, ttl: float):
+        self._loaders = loaders
+        self.ttl = ttl
+        self._entries = {}
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    async def refresh(self, session, *names):
+        for name in names or self._loaders:
+            items = await self._loaders[name](session)
+            body = json.dumps(items, separators=(',', ':')).encode()
+            self.version += 1
+            self._entries[name] = ReferenceEntry(
+                items=items,
+                body=body,
+                etag='"%s"' % hashlib.sha256(body).hexdigest()[:32],
+                version=self.version,
+                expires_at=time.monotonic() + self.ttl
+            )
+
+    async def get(self, session, name):
+        entry = self._entries.get(name)
+        if entry is None or entry.expires_at <= time.monotonic():
+            self.misses += 1
+            await self.refresh(session, name)
+            return self._entries[name]
+        self.hits += 1
+        return entry
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "entries": {name: {"version": entry.version, "size": len(entry.items)} for name, entry in self._entries.items()}
+        }
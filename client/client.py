@@ -1,19 +1,23 @@
-from fastapi import Depends, HTTPException, APIRouter, UploadFile
-from auth.utils import verify_token
-from typing import List
-from database import get_async_session
+from fastapi import Depends, HTTPException, APIRouter, Request, UploadFile
+from auth.utils import verify_claims, require_client
+from typing import List, Optional
+from database import get_async_session, get_read_session, read_session_maker
 from sqlalchemy import insert, update, delete
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from .schemes import Gig,GigPost
-from client.schemes import GigStatus
-import aiofiles
+from client.schemes import GigStatus, GigPage, JobTypeEnum, WorkModeEnum, GigSearchResults
 from client.schemes import GigFileResponse,GigTagResponse,GigCategoryResponse,GigResponsesearch
 from .schemes import GigFile,Gigfull,GigCategoryResponse,GigResponse
 from models.models import (gigs_category, gigs_tags, gigs_file, 
 user,gig_tag_association,saved_client,seller,user,gigs)
-from fastapi.responses import JSONResponse
-from client.utils import convert_to_gig_model
+from fastapi.responses import JSONResponse, StreamingResponse
+from client.utils import convert_to_gig_model, convert_to_gig_search_model, load_gig_aggregates, filter_gigs, gig_row_to_dict, stream_gigs_ndjson
+from client.search import search_gigs, reindex_gigs
+from storage.utils import save_upload
+from storage.blobs import retain_blob, release_blobs, release_gig_blobs
+from jobs import enqueue
+from storage.images import is_image
 from enum import Enum
 from fastapi import HTTPException, Query
 
@@ -28,20 +32,12 @@ router_public=APIRouter(tags=["Public API"])
 
 
 @router_client.post('/gig',summary="Create a Gig")
-async def create_gig(new_gig: GigPost, token: dict = Depends(verify_token), session: AsyncSession = Depends(get_async_session)):
+async def create_gig(new_gig: GigPost, token: dict = Depends(require_client), session: AsyncSession = Depends(get_async_session)):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
     user_id = token.get('user_id')
 
 
-    result = await session.execute(select(user).where(user.c.id == user_id))
-    user_data = result.fetchone()
-    if not user_data:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    if not user_data.is_client:
-        raise HTTPException(status_code=403, detail="Only clients can post gigs")
-
 
     category_result = await session.execute(select(gigs_category).where(gigs_category.c.id == new_gig.category_id))
     category_data = category_result.fetchone()
@@ -75,6 +71,7 @@ async def create_gig(new_gig: GigPost, token: dict = Depends(verify_token), sess
     query = insert(gigs).values(**new_gig_data).returning(gigs.c.id)
     result = await session.execute(query)
     created_gig_id = result.fetchone()[0]
+    await reindex_gigs(session, [created_gig_id])
     await session.commit()
 
     return JSONResponse(
@@ -88,7 +85,7 @@ async def create_gig(new_gig: GigPost, token: dict = Depends(verify_token), sess
 
 
 @router_client.get('/gigs', response_model=List[Gig], summary="Get all Gigs by User")
-async def get_user_gigs(token: dict = Depends(verify_token), session: AsyncSession = Depends(get_async_session)):
+async def get_user_gigs(token: dict = Depends(verify_claims), session: AsyncSession = Depends(get_async_session)):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
     user_id = token.get('user_id')
@@ -107,7 +104,7 @@ async def get_user_gigs(token: dict = Depends(verify_token), session: AsyncSessi
 @router_client.delete('/gigs/{gig_id}', summary="Delete a Gig")
 async def delete_gig(
     gig_id: int,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(verify_claims),
     session: AsyncSession = Depends(get_async_session)
 ):
    
@@ -115,11 +112,6 @@ async def delete_gig(
         raise HTTPException(status_code=401, detail="Not registered")
     user_id = token.get('user_id')
 
-  
-    result = await session.execute(select(user).where(user.c.id == user_id))
-    user_data = result.fetchone()
-    if not user_data:
-        raise HTTPException(status_code=404, detail="User not found")
 
     result = await session.execute(select(gigs).where(gigs.c.id == gig_id))
     gig_data = result.fetchone()
@@ -128,7 +120,9 @@ async def delete_gig(
 
     if gig_data.user_id !=user_id:
          raise HTTPException(status_code=403, detail="You can only delete your own gigs")
+    await release_gig_blobs(session, gigs.c.id == gig_id)
     await session.execute(delete(gigs).where(gigs.c.id == gig_id))
+    await reindex_gigs(session, [gig_id])
     await session.commit()
 
     return JSONResponse(
@@ -143,18 +137,13 @@ async def delete_gig(
 async def update_gig(
     gig_id: int,
     updated_gig: GigStatus,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(verify_claims),
     session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
     user_id = token.get('user_id')
 
-    result = await session.execute(select(user).where(user.c.id == user_id))
-    user_data = result.fetchone()
-    if not user_data:
-        raise HTTPException(status_code=404, detail="User not found")
-
     result = await session.execute(select(gigs).where(gigs.c.id == gig_id))
     gig_data = result.fetchone()
     if not gig_data or gig_data.user_id != user_id:
@@ -165,6 +154,7 @@ async def update_gig(
         status=updated_gig.status
     )
     await session.execute(query)
+    await reindex_gigs(session, [gig_id])
     await session.commit()
 
     result = await session.execute(select(gigs).where(gigs.c.id == gig_id))
@@ -185,7 +175,7 @@ async def update_gig(
 async def add_tags_to_gig(
     gig_id: int,
     tag_ids: List[int],  
-    token: dict = Depends(verify_token),
+    token: dict = Depends(verify_claims),
     session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
@@ -219,6 +209,7 @@ async def add_tags_to_gig(
         insert_query = insert(gig_tag_association).values(gig_id=gig_id, tag_id=tag_id)
         await session.execute(insert_query)
 
+    await reindex_gigs(session, [gig_id])
     await session.commit()
 
     return JSONResponse(
@@ -231,27 +222,11 @@ async def add_tags_to_gig(
 
 
 @router_client.post('/gigs_file', summary="Create a Gig File")
-async def create_gig_file(file: UploadFile, gig_id: int, token: dict = Depends(verify_token), session: AsyncSession = Depends(get_async_session)):
+async def create_gig_file(file: UploadFile, gig_id: int, token: dict = Depends(require_client), session: AsyncSession = Depends(get_async_session)):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
     user_id = token.get('user_id')
 
-  
-    result = await session.execute(select(user).where(user.c.id == user_id))
-    user_data = result.fetchone()
-    if not user_data:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if file is not None:
-        out_file = f'/{file.filename}'
-        async with aiofiles.open(f'gig_file/{out_file}', 'wb') as f:
-            content = await file.read()
-            await f.write(content)
-        
-   
-    if not user_data.is_client:
-        raise HTTPException(status_code=403, detail="Only clients can post files")
-
 
     result = await session.execute(select(gigs).where(gigs.c.id == gig_id))
     gig_data = result.fetchone()
@@ -259,10 +234,14 @@ async def create_gig_file(file: UploadFile, gig_id: int, token: dict = Depends(v
         raise HTTPException(status_code=403, detail="Gig not found")
     if gig_data.user_id != user_id:
         raise HTTPException(status_code=403, detail="You can only add files to your own gigs")
-    
-    
+
+    out_file = await save_upload(file, 'gig_file')
+
     query = insert(gigs_file).values(gigs_id=gig_id, file_url=out_file)
     result = await session.execute(query)
+    await retain_blob(session, 'gig_file', out_file)
+    if is_image(out_file):
+        await enqueue(session, 'process_image', kind='gig_file', url=out_file)
     
     await session.commit()
     return JSONResponse(
@@ -274,15 +253,10 @@ async def create_gig_file(file: UploadFile, gig_id: int, token: dict = Depends(v
 
 
 @router_client.get('/gigs/{gig_id}/files',response_model=List[GigFile], summary="Get files for a specific gig")
-async def get_gig_files(gig_id: int, token: dict = Depends(verify_token), session: AsyncSession = Depends(get_async_session)):
+async def get_gig_files(gig_id: int, token: dict = Depends(verify_claims), session: AsyncSession = Depends(get_async_session)):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
     user_id = token.get('user_id')
-
-    result = await session.execute(select(user).where(user.c.id == user_id))
-    user_data = result.fetchone()
-    if not user_data:
-        raise HTTPException(status_code=404, detail="User not found")
     
   
     result = await session.execute(select(gigs).where(gigs.c.id == gig_id))
@@ -308,7 +282,7 @@ async def get_gig_files(gig_id: int, token: dict = Depends(verify_token), sessio
 async def delete_gig_file(
     gig_id: int,
     file_id: int,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(verify_claims),
     session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
@@ -316,11 +290,6 @@ async def delete_gig_file(
     
     user_id = token.get('user_id')
 
-    result = await session.execute(select(user).where(user.c.id == user_id))
-    user_data = result.fetchone()
-    if not user_data:
-        raise HTTPException(status_code=404, detail="User not found")
-
 
     result = await session.execute(select(gigs).where(gigs.c.id == gig_id))
     gig_data = result.fetchone()
@@ -337,6 +306,7 @@ async def delete_gig_file(
 
 
     await session.execute(delete(gigs_file).where(gigs_file.c.id == file_id))
+    await release_blobs(session, 'gig_file', [file_data.file_url])
     await session.commit()
 
 
@@ -350,22 +320,13 @@ async def delete_gig_file(
 @router_client.post('/saved_sellers', summary="Save a Seller")
 async def save_seller(
     seller_id: int, 
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_client),
     session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
     
     user_id = token.get('user_id')
-    
-    result = await session.execute(select(user).where(user.c.id == user_id))
-    user_data = result.fetchone()
-    
-    if not user_data:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if not user_data.is_client:
-        raise HTTPException(status_code=403, detail="Only clients can save sellers")
 
     result = await session.execute(select(seller).where(seller.c.id == seller_id))
     seller_data = result.fetchone()
@@ -387,7 +348,7 @@ async def save_seller(
 
 @router_client.get('/saved_sellers', summary="Get Saved Sellers")
 async def get_saved_sellers(
-    token: dict = Depends(verify_token),
+    token: dict = Depends(verify_claims),
     session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
@@ -418,7 +379,7 @@ async def get_saved_sellers(
 @router_client.delete('/saved_sellers/{saved_seller_id}', summary="Delete Saved Seller")
 async def delete_saved_seller(
     saved_seller_id: int,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(verify_claims),
     session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
@@ -444,47 +405,86 @@ async def delete_saved_seller(
 
 
 @router_client.get('/{gig_id}/full', response_model=Gigfull, summary="Get Gig with all details")
-async def get_gig_with_details(gig_id: int, session: AsyncSession = Depends(get_async_session)):
-
-    result = await session.execute(select(gigs).where(gigs.c.id == gig_id))
-    gig_data = result.fetchone()
-    if not gig_data:
+async def get_gig_with_details(gig_id: int, session: AsyncSession = Depends(get_read_session)):
+    aggregates = await load_gig_aggregates(session, [gig_id])
+    if gig_id not in aggregates:
         raise HTTPException(status_code=404, detail="Gig not found")
 
-    result = await session.execute(select(gigs_category).where(gigs_category.c.id == gig_data.category_id))
-    categories = result.fetchall()
-
-    result = await session.execute(select(gigs_tags).join(gig_tag_association).where(gig_tag_association.c.gig_id == gig_id))
-    tags = result.fetchall()
+    return convert_to_gig_model(aggregates[gig_id])
 
-    result = await session.execute(select(gigs_file).where(gigs_file.c.gigs_id == gig_id))
-    files = result.fetchall()
 
-    return convert_to_gig_model(gig_data, categories, tags, files)
 
 
 
 
 
 
+@router_public.get('/gigs', response_model=GigPage, summary="Get all Gigs aaa User")
+async def get_public_gigs(
+    request: Request,
+    cursor: Optional[int] = Query(None, description="Return gigs with id greater than this"),
+    limit: int = Query(20, ge=1, le=100),
+    category_id: Optional[int] = None,
+    job_type: Optional[JobTypeEnum] = None,
+    work_mode: Optional[WorkModeEnum] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    status: Optional[bool] = None,
+    duration: Optional[int] = None,
+    stream: bool = Query(False, description="Stream every matching gig as NDJSON"),
+    session: AsyncSession = Depends(get_read_session)
+):
+    query = filter_gigs(
+        select(gigs), category_id=category_id, job_type=job_type, work_mode=work_mode,
+        min_price=min_price, max_price=max_price, status=status, duration=duration
+    )
+    if cursor is not None:
+        query = query.where(gigs.c.id > cursor)
+    query = query.order_by(gigs.c.id)
 
+    if stream:
+        return StreamingResponse(stream_gigs_ndjson(await read_session_maker(request), query), media_type="application/x-ndjson")
 
-@router_public.get('/gigs', response_model=List[Gig], summary="Get all Gigs aaa User")
-async def get_public_gigs(session: AsyncSession = Depends(get_async_session)):
-    result = await session.execute(select(gigs))
+    result = await session.execute(query.limit(limit + 1))
     gigs_list = result.fetchall()
 
-    if not gigs_list:
-        raise HTTPException(status_code=404, detail="No gigs found")
+    next_cursor = None
+    if len(gigs_list) > limit:
+        gigs_list = gigs_list[:limit]
+        next_cursor = gigs_list[-1].id
 
-    return gigs_list
+    return GigPage(items=[gig_row_to_dict(gig) for gig in gigs_list], next_cursor=next_cursor)
+
+
+
+@router_public.get('/search', response_model=GigSearchResults, summary="Full-text search over Gigs")
+async def search_public_gigs(
+    q: str = Query(..., min_length=1, max_length=200),
+    category_id: Optional[int] = None,
+    work_mode: Optional[WorkModeEnum] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_read_session)
+):
+    total, hits, facets = await search_gigs(
+        session, q, category_id=category_id, work_mode=work_mode,
+        min_price=min_price, max_price=max_price, limit=limit, offset=offset
+    )
+
+    return GigSearchResults(
+        total=total,
+        items=[dict(gig_row_to_dict(gig), rank=rank) for gig, rank in hits],
+        facets=facets
+    )
 
 
 
 @router_public.get('/search/{category_name}/gigs', response_model=List[GigResponse], summary="Get all Gigs for a specific Category by Name")
 async def get_gigs_by_category_name(
     category_name: str,
-    session: AsyncSession = Depends(get_async_session)
+    session: AsyncSession = Depends(get_read_session)
 ):
 
     result = await session.execute(
@@ -527,7 +527,12 @@ async def get_gigs_by_category_name(
 
 
 @router_public.get('/search/{tag_name}', response_model=List[GigResponsesearch], summary="Get gigs by tag")
-async def get_gigs_by_tag(tag_name: str, session: AsyncSession = Depends(get_async_session)):
+async def get_gigs_by_tag(
+    tag_name: str,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_read_session)
+):
 
     tag_query = select(gigs_tags.c.id).where(gigs_tags.c.tag_name == tag_name)
     tag_result = await session.execute(tag_query)
@@ -540,67 +545,23 @@ async def get_gigs_by_tag(tag_name: str, session: AsyncSession = Depends(get_asy
 
 
     gig_query = (
-        select(
-            gigs.c.id, gigs.c.gigs_title, gigs.c.duration, gigs.c.price, 
-            gigs.c.description, gigs.c.status,gigs.c.job_type,gigs.c.work_mode, gigs.c.user_id,
-            gigs_category.c.id.label("category_id"),
-            gigs_category.c.category_name,
-            gigs_tags.c.id.label("tag_id"), 
-            gigs_tags.c.tag_name, 
-            gigs_file.c.id.label("file_id"), 
-            gigs_file.c.file_url
-        )
+        select(gigs.c.id)
         .select_from(
             gigs
             .join(gig_tag_association, gigs.c.id == gig_tag_association.c.gig_id)
-            .join(gigs_tags, gigs_tags.c.id == gig_tag_association.c.tag_id)
             .join(gigs_category, gigs.c.category_id == gigs_category.c.id)
-            .outerjoin(gigs_file, gigs.c.id == gigs_file.c.gigs_id)
         )
         .where(gig_tag_association.c.tag_id == tag_id)
+        .order_by(gigs.c.id)
+        .limit(limit)
+        .offset(offset)
     )
     gig_result = await session.execute(gig_query)
-    gigs_data = gig_result.fetchall()
+    gig_ids = gig_result.scalars().all()
 
-    if not gigs_data:
+    if not gig_ids:
         raise HTTPException(status_code=404, detail="No gigs found for this tag")
 
+    aggregates = await load_gig_aggregates(session, gig_ids)
 
-    gigs_dict = {}
-    for row in gigs_data:
-        gig_id = row.id
-
-        if gig_id not in gigs_dict:
-            gigs_dict[gig_id] = GigResponsesearch(
-                id=row.id,
-                gigs_title=row.gigs_title,
-                duration=row.duration,
-                price=row.price,
-                description=row.description,
-                status=row.status,
-                job_type=row.job_type,
-                work_mode=row.work_mode,
-                user_id=row.user_id,
-                category=GigCategoryResponse(id=row.category_id, category_name=row.category_name),
-                tags=[],
-                files=[]
-            )
-        
-        gig_response = gigs_dict[gig_id]
-
-     
-        if row.tag_id and not any(tag.id == row.tag_id for tag in gig_response.tags):
-            gig_response.tags.append(GigTagResponse(id=row.tag_id, tag_name=row.tag_name))
-
- 
-        if row.file_id and not any(file.id == row.file_id for file in gig_response.files):
-            gig_response.files.append(GigFileResponse(id=row.file_id, file_url=row.file_url))
-
-    return list(gigs_dict.values())
-
-
-
-
-
-
-
+    return [convert_to_gig_search_model(aggregates[gig_id]) for gig_id in gig_ids if gig_id in aggregates]
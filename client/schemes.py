@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime, time
-from typing import List, Optional
+from typing import Dict, List, Optional
 from enum import Enum
 
 
@@ -63,6 +63,8 @@ class GigFile(BaseModel):
     id:int
     file_url: str
     gigs_id: int
+    thumb_url: Optional[str] = None
+    webp_url: Optional[str] = None
 
 
 class GigCategory(BaseModel):
@@ -83,6 +85,7 @@ class GigCategoryfull(BaseModel):
 class GigFilefull(BaseModel):
     id: int
     file_url: str
+    thumb_url: Optional[str] = None
 
 
 class Gigfull(BaseModel):
@@ -130,6 +133,7 @@ class GigCategoryResponse(BaseModel):
 class GigFileResponse(BaseModel):
     id: int
     file_url: str
+    thumb_url: Optional[str] = None
 
 
 class GigTagResponse(BaseModel):
@@ -156,3 +160,25 @@ class GigResponsesearch(BaseModel):
     files: List[GigFileResponse]
     user_id: int
 
+
+
+class GigPage(BaseModel):
+    items: List[Gig]
+    next_cursor: Optional[int] = None
+
+
+class GigSearchHit(GigResponse):
+    rank: float
+
+
+class GigSearchFacets(BaseModel):
+    categories: Dict[int, int] = {}
+    work_modes: Dict[str, int] = {}
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+
+class GigSearchResults(BaseModel):
+    total: int
+    items: List[GigSearchHit]
+    facets: GigSearchFacets
@@ -0,0 +1,331 @@
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+from sqlalchemy import select, func, literal, literal_column, and_, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from jobs import job_handler
+from models.models import gigs, gigs_category, gigs_tags, gig_tag_association, gig_search_index
+
+
+SEARCH_CONFIG = 'simple'
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Same ordering as the tsvector weights: title (A), tags (B), category (C), description (D).
+FIELD_WEIGHTS = {'title': 1.0, 'tags': 0.4, 'category': 0.2, 'description': 0.1}
+PREFIX_FACTOR = 0.8
+TYPO_FACTOR = 0.5
+TYPO_WEIGHT = 0.5
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+
+def _max_typos(term):
+    if len(term) < 4:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+def _edit_distance(a, b, limit):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+class GigSearchIndex:
+    def __init__(self):
+        self._postings = defaultdict(dict)
+        self._terms = []
+        self._documents = {}
+
+    def __len__(self):
+        return len(self._documents)
+
+    def clear(self):
+        self._postings.clear()
+        self._terms = []
+        self._documents.clear()
+
+    def add(self, gig_id, fields, facets):
+        self.remove(gig_id)
+        doc_terms = set()
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for term in tokenize(text):
+                postings = self._postings[term]
+                if not postings:
+                    self._terms.insert(bisect_left(self._terms, term), term)
+                postings[gig_id] = postings.get(gig_id, 0.0) + weight
+                doc_terms.add(term)
+        self._documents[gig_id] = (doc_terms, facets)
+
+    def remove(self, gig_id):
+        document = self._documents.pop(gig_id, None)
+        if document is None:
+            return
+        for term in document[0]:
+            postings = self._postings[term]
+            postings.pop(gig_id, None)
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+
+    def _expand(self, token):
+        matches = {}
+        start = bisect_left(self._terms, token)
+        for term in self._terms[start:]:
+            if not term.startswith(token):
+                break
+            matches[term] = 1.0 if term == token else PREFIX_FACTOR
+        if matches:
+            return matches
+
+        limit = _max_typos(token)
+        if limit:
+            for term in self._terms:
+                if _edit_distance(token, term, limit) <= limit:
+                    matches[term] = TYPO_FACTOR
+        return matches
+
+    def _score(self, tokens):
+        total_docs = len(self._documents)
+        scores = None
+        for token in tokens:
+            token_scores = defaultdict(float)
+            for term, factor in self._expand(token).items():
+                postings = self._postings[term]
+                idf = math.log(1 + total_docs / len(postings))
+                for gig_id, weight in postings.items():
+                    token_scores[gig_id] += weight * factor * idf
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {gig_id: score + token_scores[gig_id] for gig_id, score in scores.items() if gig_id in token_scores}
+            if not scores:
+                return {}
+        return scores or {}
+
+    def search(self, query, category_id=None, work_mode=None, min_price=None, max_price=None, limit=20, offset=0):
+        scores = self._score(tokenize(query))
+        facets = _empty_facets()
+        hits = []
+        for gig_id, score in scores.items():
+            doc_facets = self._documents[gig_id][1]
+            _add_facet(facets, doc_facets['category_id'], doc_facets['work_mode'], doc_facets['price'])
+            if category_id is not None and doc_facets['category_id'] != category_id:
+                continue
+            if work_mode is not None and doc_facets['work_mode'] != work_mode:
+                continue
+            if min_price is not None and doc_facets['price'] < min_price:
+                continue
+            if max_price is not None and doc_facets['price'] > max_price:
+                continue
+            hits.append((gig_id, score))
+
+        hits.sort(key=lambda hit: (-hit[1], hit[0]))
+        return len(hits), hits[offset:offset + limit], facets
+
+
+fallback_index = GigSearchIndex()
+_fallback_loaded = False
+
+
+def _empty_facets():
+    return {"categories": {}, "work_modes": {}, "min_price": None, "max_price": None}
+
+
+def _add_facet(facets, category_id, work_mode, price, count=1, low=None, high=None):
+    low = price if low is None else low
+    high = price if high is None else high
+    if category_id is not None:
+        facets["categories"][category_id] = facets["categories"].get(category_id, 0) + count
+    if work_mode is not None:
+        facets["work_modes"][work_mode] = facets["work_modes"].get(work_mode, 0) + count
+    if low is not None and (facets["min_price"] is None or low < facets["min_price"]):
+        facets["min_price"] = low
+    if high is not None and (facets["max_price"] is None or high > facets["max_price"]):
+        facets["max_price"] = high
+
+
+def _is_postgres(session: AsyncSession):
+    return session.bind.dialect.name == 'postgresql'
+
+
+def _tags_text():
+    return (
+        select(func.string_agg(gigs_tags.c.tag_name, ' '))
+        .select_from(gig_tag_association.join(gigs_tags, gigs_tags.c.id == gig_tag_association.c.tag_id))
+        .where(gig_tag_association.c.gig_id == gigs.c.id)
+        .scalar_subquery()
+    )
+
+
+def _weighted(text, weight):
+    return func.setweight(func.to_tsvector(SEARCH_CONFIG, func.coalesce(text, '')), literal_column(f"'{weight}'"))
+
+
+async def _load_fallback_documents(session: AsyncSession, gig_ids=None):
+    query = select(
+        gigs.c.id, gigs.c.gigs_title, gigs.c.description, gigs.c.price, gigs.c.work_mode,
+        gigs.c.category_id, gigs_category.c.category_name
+    ).select_from(gigs.outerjoin(gigs_category, gigs.c.category_id == gigs_category.c.id)).where(gigs.c.status == True)
+    tags_query = select(gig_tag_association.c.gig_id, gigs_tags.c.tag_name).select_from(
+        gig_tag_association.join(gigs_tags, gigs_tags.c.id == gig_tag_association.c.tag_id)
+    )
+    if gig_ids is not None:
+        query = query.where(gigs.c.id.in_(gig_ids))
+        tags_query = tags_query.where(gig_tag_association.c.gig_id.in_(gig_ids))
+
+    tags_by_gig = defaultdict(list)
+    for row in (await session.execute(tags_query)).fetchall():
+        tags_by_gig[row.gig_id].append(row.tag_name)
+
+    found = set()
+    for row in (await session.execute(query)).fetchall():
+        found.add(row.id)
+        fallback_index.add(
+            row.id,
+            {
+                'title': row.gigs_title,
+                'tags': ' '.join(tags_by_gig[row.id]),
+                'category': row.category_name,
+                'description': row.description
+            },
+            {'category_id': row.category_id, 'work_mode': row.work_mode.value, 'price': row.price}
+        )
+    for gig_id in set(gig_ids or ()) - found:
+        fallback_index.remove(gig_id)
+
+
+@job_handler('reindex_gigs')
+async def reindex_gigs(session: AsyncSession, gig_ids):
+    gig_ids = list(gig_ids)
+    if not gig_ids:
+        return
+
+    if not _is_postgres(session):
+        if _fallback_loaded:
+            await _load_fallback_documents(session, gig_ids)
+        return
+
+    tags_text = _tags_text()
+    document = (
+        _weighted(gigs.c.gigs_title, 'A')
+        .op('||')(_weighted(tags_text, 'B'))
+        .op('||')(_weighted(gigs_category.c.category_name, 'C'))
+        .op('||')(_weighted(gigs.c.description, 'D'))
+    )
+    search_text = func.concat_ws(' ', gigs.c.gigs_title, tags_text, gigs_category.c.category_name)
+    source = (
+        select(gigs.c.id, document, search_text)
+        .select_from(gigs.outerjoin(gigs_category, gigs.c.category_id == gigs_category.c.id))
+        .where(gigs.c.id.in_(gig_ids))
+    )
+    query = pg_insert(gig_search_index).from_select(['gig_id', 'document', 'search_text'], source)
+    query = query.on_conflict_do_update(
+        index_elements=[gig_search_index.c.gig_id],
+        set_={'document': query.excluded.document, 'search_text': query.excluded.search_text}
+    )
+    await session.execute(query)
+
+
+def _apply_facet_filters(query, category_id, work_mode, min_price, max_price):
+    if category_id is not None:
+        query = query.where(gigs.c.category_id == category_id)
+    if work_mode is not None:
+        query = query.where(gigs.c.work_mode == work_mode)
+    if min_price is not None:
+        query = query.where(gigs.c.price >= min_price)
+    if max_price is not None:
+        query = query.where(gigs.c.price <= max_price)
+    return query
+
+
+async def _search_postgres(session, q, tokens, category_id, work_mode, min_price, max_price, limit, offset):
+    ts_query = func.to_tsquery(SEARCH_CONFIG, ' & '.join(f'{token}:*' for token in tokens))
+    # Checked at query time so a gig switched off never shows up, whatever state its document is in.
+    match = and_(
+        gigs.c.status == True,
+        or_(gig_search_index.c.document.op('@@')(ts_query), gig_search_index.c.search_text.op('%>')(q))
+    )
+    rank = (
+        func.ts_rank_cd(gig_search_index.c.document, ts_query)
+        + func.word_similarity(q, gig_search_index.c.search_text) * literal(TYPO_WEIGHT)
+    ).label('rank')
+    matched = gigs.join(gig_search_index, gig_search_index.c.gig_id == gigs.c.id)
+
+    hits_query = _apply_facet_filters(
+        select(gigs, rank, func.count().over().label('total')).select_from(matched).where(match),
+        category_id, work_mode, min_price, max_price
+    ).order_by(rank.desc(), gigs.c.id).limit(limit).offset(offset)
+    hits = (await session.execute(hits_query)).fetchall()
+
+    by_work_mode = func.grouping(gigs.c.category_id).label('by_work_mode')
+    facets_query = (
+        select(
+            gigs.c.category_id, gigs.c.work_mode, by_work_mode,
+            func.count().label('count'), func.min(gigs.c.price).label('low'), func.max(gigs.c.price).label('high')
+        )
+        .select_from(matched)
+        .where(match)
+        .group_by(func.grouping_sets(gigs.c.category_id, gigs.c.work_mode))
+    )
+    facets = _empty_facets()
+    for row in (await session.execute(facets_query)).fetchall():
+        if row.by_work_mode:
+            _add_facet(facets, None, row.work_mode.value, None, row.count)
+        else:
+            _add_facet(facets, row.category_id, None, None, row.count, row.low, row.high)
+
+    total = hits[0].total if hits else 0
+    return total, [(row, row.rank) for row in hits], facets
+
+
+async def _search_fallback(session, q, category_id, work_mode, min_price, max_price, limit, offset):
+    global _fallback_loaded
+    if not _fallback_loaded:
+        fallback_index.clear()
+        await _load_fallback_documents(session)
+        _fallback_loaded = True
+
+    total, hits, facets = fallback_index.search(
+        q, category_id=category_id, work_mode=work_mode, min_price=min_price, max_price=max_price,
+        limit=limit, offset=offset
+    )
+    if not hits:
+        return total, [], facets
+
+    result = await session.execute(select(gigs).where(gigs.c.id.in_([gig_id for gig_id, _ in hits])))
+    rows = {row.id: row for row in result.fetchall()}
+    return total, [(rows[gig_id], score) for gig_id, score in hits if gig_id in rows], facets
+
+
+async def search_gigs(session: AsyncSession, q, category_id=None, work_mode=None, min_price=None, max_price=None,
+                      limit=20, offset=0):
+    tokens = tokenize(q)
+    if not tokens:
+        return 0, [], _empty_facets()
+    if work_mode is not None:
+        work_mode = work_mode.value
+
+    if _is_postgres(session):
+        return await _search_postgres(session, q, tokens, category_id, work_mode, min_price, max_price, limit, offset)
+    return await _search_fallback(session, q, category_id, work_mode, min_price, max_price, limit, offset)
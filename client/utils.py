@@ -1,19 +1,18 @@
-import aiofiles
-from fastapi import UploadFile
-from client.schemes import GigCategoryfull,GigTagfull,GigFilefull,Gigfull
-
+import json
 
-async def upload_file(file_upload: UploadFile):
-    out_file = f'files/{file_upload.filename}'
-    async with aiofiles.open(f'gig_file/{out_file}', 'wb') as f:
-        content = await file_upload.read()
-        await f.write(content)
+from sqlalchemy import select, func, literal_column, JSON
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from client.schemes import GigCategoryfull,GigTagfull,GigFilefull,Gigfull
+from client.schemes import GigResponsesearch,GigCategoryResponse,GigTagResponse,GigFileResponse
+from models.models import gigs, gigs_category, gigs_tags, gig_tag_association, gigs_file
 
 
-def convert_to_gig_model(gig_data, categories, tags, files):
-    categories_list = [GigCategoryfull(id=cat.id, category_name=cat.category_name) for cat in categories]
-    tags_list = [GigTagfull(id=tag.id, tag_name=tag.tag_name) for tag in tags]
-    files_list = [GigFilefull(id=file.id, file_url=file.file_url) for file in files]
+def convert_to_gig_model(aggregate):
+    gig_data = aggregate["gig"]
+    categories_list = [GigCategoryfull(**aggregate["category"])] if aggregate["category"] else []
+    tags_list = [GigTagfull(**tag) for tag in aggregate["tags"]]
+    files_list = [GigFilefull(**file) for file in aggregate["files"]]
 
     return Gigfull(
         id=gig_data.id,
@@ -27,4 +26,143 @@ def convert_to_gig_model(gig_data, categories, tags, files):
         categories=categories_list,
         tags=tags_list,
         files=files_list
-    )        
\ No newline at end of file
+    )
+
+
+def convert_to_gig_search_model(aggregate):
+    gig_data = aggregate["gig"]
+
+    return GigResponsesearch(
+        id=gig_data.id,
+        gigs_title=gig_data.gigs_title,
+        duration=gig_data.duration,
+        price=gig_data.price,
+        description=gig_data.description,
+        status=gig_data.status,
+        job_type=gig_data.job_type,
+        work_mode=gig_data.work_mode,
+        user_id=gig_data.user_id,
+        category=GigCategoryResponse(**aggregate["category"]),
+        tags=[GigTagResponse(**tag) for tag in aggregate["tags"]],
+        files=[GigFileResponse(**file) for file in aggregate["files"]]
+    )
+
+
+def _json_list(expr, order_by):
+    return func.coalesce(func.json_agg(aggregate_order_by(expr, order_by)), literal_column("'[]'::json"), type_=JSON)
+
+
+async def _load_gig_aggregates_postgres(session: AsyncSession, gig_ids):
+    category_json = (
+        select(func.json_build_object('id', gigs_category.c.id, 'category_name', gigs_category.c.category_name, type_=JSON))
+        .where(gigs_category.c.id == gigs.c.category_id)
+        .scalar_subquery()
+    )
+    tags_json = (
+        select(_json_list(func.json_build_object('id', gigs_tags.c.id, 'tag_name', gigs_tags.c.tag_name), gigs_tags.c.id))
+        .select_from(gig_tag_association.join(gigs_tags, gigs_tags.c.id == gig_tag_association.c.tag_id))
+        .where(gig_tag_association.c.gig_id == gigs.c.id)
+        .scalar_subquery()
+    )
+    files_json = (
+        select(_json_list(func.json_build_object('id', gigs_file.c.id, 'file_url', gigs_file.c.file_url, 'thumb_url', gigs_file.c.thumb_url), gigs_file.c.id))
+        .where(gigs_file.c.gigs_id == gigs.c.id)
+        .scalar_subquery()
+    )
+    query = select(
+        gigs,
+        category_json.label('category_json'),
+        tags_json.label('tags_json'),
+        files_json.label('files_json')
+    ).where(gigs.c.id.in_(gig_ids))
+    result = await session.execute(query)
+
+    return {
+        row.id: {"gig": row, "category": row.category_json, "tags": row.tags_json, "files": row.files_json}
+        for row in result.fetchall()
+    }
+
+
+async def _load_gig_aggregates_batched(session: AsyncSession, gig_ids):
+    result = await session.execute(
+        select(gigs, gigs_category.c.category_name)
+        .select_from(gigs.outerjoin(gigs_category, gigs_category.c.id == gigs.c.category_id))
+        .where(gigs.c.id.in_(gig_ids))
+    )
+    aggregates = {}
+    for row in result.fetchall():
+        category = None
+        if row.category_name is not None:
+            category = {"id": row.category_id, "category_name": row.category_name}
+        aggregates[row.id] = {"gig": row, "category": category, "tags": [], "files": []}
+    if not aggregates:
+        return aggregates
+
+    result = await session.execute(
+        select(gig_tag_association.c.gig_id, gigs_tags.c.id, gigs_tags.c.tag_name)
+        .select_from(gig_tag_association.join(gigs_tags, gigs_tags.c.id == gig_tag_association.c.tag_id))
+        .where(gig_tag_association.c.gig_id.in_(aggregates))
+        .order_by(gigs_tags.c.id)
+    )
+    for row in result.fetchall():
+        aggregates[row.gig_id]["tags"].append({"id": row.id, "tag_name": row.tag_name})
+
+    result = await session.execute(
+        select(gigs_file.c.gigs_id, gigs_file.c.id, gigs_file.c.file_url, gigs_file.c.thumb_url)
+        .where(gigs_file.c.gigs_id.in_(aggregates))
+        .order_by(gigs_file.c.id)
+    )
+    for row in result.fetchall():
+        aggregates[row.gigs_id]["files"].append({"id": row.id, "file_url": row.file_url, "thumb_url": row.thumb_url})
+
+    return aggregates
+
+
+async def load_gig_aggregates(session: AsyncSession, gig_ids):
+    gig_ids = list(dict.fromkeys(gig_ids))
+    if not gig_ids:
+        return {}
+    if session.bind.dialect.name == 'postgresql':
+        return await _load_gig_aggregates_postgres(session, gig_ids)
+    return await _load_gig_aggregates_batched(session, gig_ids)
+
+
+def filter_gigs(query, category_id=None, job_type=None, work_mode=None, min_price=None,
+                max_price=None, status=None, duration=None):
+    if category_id is not None:
+        query = query.where(gigs.c.category_id == category_id)
+    if job_type is not None:
+        query = query.where(gigs.c.job_type == job_type.value)
+    if work_mode is not None:
+        query = query.where(gigs.c.work_mode == work_mode.value)
+    if min_price is not None:
+        query = query.where(gigs.c.price >= min_price)
+    if max_price is not None:
+        query = query.where(gigs.c.price <= max_price)
+    if status is not None:
+        query = query.where(gigs.c.status == status)
+    if duration is not None:
+        query = query.where(gigs.c.duration == duration)
+    return query
+
+
+def gig_row_to_dict(row):
+    return {
+        "id": row.id,
+        "gigs_title": row.gigs_title,
+        "duration": row.duration,
+        "price": row.price,
+        "description": row.description,
+        "status": row.status,
+        "category_id": row.category_id,
+        "user_id": row.user_id,
+        "job_type": row.job_type.value,
+        "work_mode": row.work_mode.value
+    }
+
+
+async def stream_gigs_ndjson(session_maker, query, batch_size=500):
+    async with session_maker() as session:
+        result = await session.stream(query.execution_options(yield_per=batch_size))
+        async for row in result:
+            yield json.dumps(gig_row_to_dict(row)) + '\n'
@@ -10,3 +10,64 @@ DB_HOST = os.environ.get('DB_HOST')
 DB_PORT = os.environ.get('DB_PORT')
 SECRET = os.environ.get('SECRET')
 
+
+PROFILE_CACHE_TTL = float(os.environ.get('PROFILE_CACHE_TTL', 60))
+PROFILE_CACHE_SIZE = int(os.environ.get('PROFILE_CACHE_SIZE', 10000))
+REFERENCE_CACHE_TTL = float(os.environ.get('REFERENCE_CACHE_TTL', 300))
+
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 100))
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 30000))
+
+DB_REPLICA_URL = os.environ.get('DB_REPLICA_URL')
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 5))
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', 5))
+READ_YOUR_WRITES_WINDOW = int(os.environ.get('READ_YOUR_WRITES_WINDOW', 5))
+
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', PASSWORD_HASH_WORKERS))
+
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+REVOCATION_PURGE_INTERVAL = int(os.environ.get('REVOCATION_PURGE_INTERVAL', 3600))
+REVOCATION_REFRESH_INTERVAL = int(os.environ.get('REVOCATION_REFRESH_INTERVAL', 5))
+
+# Rate limits are "<requests>/<seconds>"; an empty value disables that limit.
+LOGIN_RATE_LIMIT_IP = os.environ.get('LOGIN_RATE_LIMIT_IP', '20/60')
+LOGIN_RATE_LIMIT_USERNAME = os.environ.get('LOGIN_RATE_LIMIT_USERNAME', '5/60')
+REGISTER_RATE_LIMIT_IP = os.environ.get('REGISTER_RATE_LIMIT_IP', '10/3600')
+REFRESH_RATE_LIMIT_IP = os.environ.get('REFRESH_RATE_LIMIT_IP', '60/60')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+
+CURRENT_USER_CACHE_TTL = int(os.environ.get('CURRENT_USER_CACHE_TTL', 30))
+CURRENT_USER_CACHE_SIZE = int(os.environ.get('CURRENT_USER_CACHE_SIZE', 10000))
+CLAIMS_VERSION_CACHE_TTL = int(os.environ.get('CLAIMS_VERSION_CACHE_TTL', 30))
+CLAIMS_VERSION_CACHE_SIZE = int(os.environ.get('CLAIMS_VERSION_CACHE_SIZE', 10000))
+
+IMAGE_UPLOAD_MAX_SIZE = int(os.environ.get('IMAGE_UPLOAD_MAX_SIZE', 5 * 1024 * 1024))
+CV_UPLOAD_MAX_SIZE = int(os.environ.get('CV_UPLOAD_MAX_SIZE', 10 * 1024 * 1024))
+CERTIFICATE_UPLOAD_MAX_SIZE = int(os.environ.get('CERTIFICATE_UPLOAD_MAX_SIZE', 10 * 1024 * 1024))
+PROJECT_FILE_UPLOAD_MAX_SIZE = int(os.environ.get('PROJECT_FILE_UPLOAD_MAX_SIZE', 50 * 1024 * 1024))
+GIG_FILE_UPLOAD_MAX_SIZE = int(os.environ.get('GIG_FILE_UPLOAD_MAX_SIZE', 50 * 1024 * 1024))
+
+BLOB_GC_GRACE = int(os.environ.get('BLOB_GC_GRACE', 3600))
+BLOB_GC_BATCH_SIZE = int(os.environ.get('BLOB_GC_BATCH_SIZE', 500))
+
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+THUMBNAIL_SIZE = int(os.environ.get('THUMBNAIL_SIZE', 320))
+WEBP_MAX_SIZE = int(os.environ.get('WEBP_MAX_SIZE', 1280))
+WEBP_QUALITY = int(os.environ.get('WEBP_QUALITY', 80))
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+JOB_RETRY_BACKOFF = float(os.environ.get('JOB_RETRY_BACKOFF', 2))
+JOB_RETRY_BACKOFF_MAX = float(os.environ.get('JOB_RETRY_BACKOFF_MAX', 300))
+JOB_LOCK_TIMEOUT = int(os.environ.get('JOB_LOCK_TIMEOUT', 600))
+
+REAPER_BATCH_SIZE = int(os.environ.get('REAPER_BATCH_SIZE', 1000))
+REAPER_QUARANTINE_DIR = os.environ.get('REAPER_QUARANTINE_DIR', 'quarantine')
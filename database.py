@@ -1,20 +1,202 @@
+import hashlib
+import time
 from typing import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.datastructures import MutableHeaders
+from cache import TTLCache
 from config import DB_NAME,DB_USER,DB_PASSWORD,DB_HOST,DB_PORT
-from sqlalchemy.orm import sessionmaker
+from config import (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+                    DB_STATEMENT_CACHE_SIZE, DB_STATEMENT_TIMEOUT)
+from config import DB_REPLICA_URL, REPLICA_MAX_LAG, REPLICA_LAG_CHECK_INTERVAL, READ_YOUR_WRITES_WINDOW
 
 from sqlalchemy.ext.declarative import declarative_base
 
 DATABASE_URL = f'postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
 
-engine = create_async_engine(DATABASE_URL)
-async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=True)
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_COOKIE = 'read_primary'
+
+
+class CountingQueuePool(AsyncAdaptedQueuePool):
+    # Callers inside connect() that do not have a connection yet; with the pool exhausted they are the ones
+    # queued for up to DB_POOL_TIMEOUT. Counted around the public connect() so no pool internals are read.
+    waiters = 0
+
+    def connect(self):
+        self.waiters += 1
+        try:
+            return super().connect()
+        finally:
+            self.waiters -= 1
+
+
+def _engine_options(url):
+    options = {'pool_recycle': DB_POOL_RECYCLE, 'pool_pre_ping': DB_POOL_PRE_PING}
+    if url.startswith('sqlite'):
+        return options
+    options.update(poolclass=CountingQueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                   pool_timeout=DB_POOL_TIMEOUT)
+    if url.startswith('postgresql+asyncpg'):
+        options['connect_args'] = {
+            'statement_cache_size': DB_STATEMENT_CACHE_SIZE,
+            'server_settings': {'statement_timeout': str(DB_STATEMENT_TIMEOUT)}
+        }
+    return options
+
+
+engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=True)
+
+replica_engine = None
+replica_session_maker = None
+if DB_REPLICA_URL:
+    replica_engine = create_async_engine(DB_REPLICA_URL, **_engine_options(DB_REPLICA_URL))
+    replica_session_maker = async_sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=True)
 
 Base = declarative_base()
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    # The session autobegins: no connection is checked out and no transaction
+    # is opened until the handler runs its first statement.
     async with async_session_maker() as session:
         yield session
 
+
+class ReplicaMonitor:
+    LAG_QUERY = text(
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    )
+
+    def __init__(self, max_lag: float, interval: float):
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lag = None
+        self.healthy = True
+        self.checked_at = 0.0
+        self.replica_reads = 0
+        self.primary_fallbacks = 0
+        self.sticky_reads = 0
+
+    async def check(self, engine):
+        self.checked_at = time.monotonic()
+        try:
+            async with engine.connect() as conn:
+                if engine.dialect.name == 'postgresql':
+                    self.lag = float(await conn.scalar(self.LAG_QUERY))
+                else:
+                    await conn.execute(text('SELECT 1'))
+                    self.lag = 0.0
+            self.healthy = self.lag <= self.max_lag
+        except Exception:
+            self.lag = None
+            self.healthy = False
+        return self.healthy
+
+    async def is_usable(self, engine):
+        if time.monotonic() - self.checked_at < self.interval:
+            return self.healthy
+        return await self.check(engine)
+
+    def stats(self):
+        return {
+            "configured": replica_engine is not None,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "max_lag_seconds": self.max_lag,
+            "replica_reads": self.replica_reads,
+            "primary_fallbacks": self.primary_fallbacks,
+            "sticky_reads": self.sticky_reads
+        }
+
+
+replica_monitor = ReplicaMonitor(REPLICA_MAX_LAG, REPLICA_LAG_CHECK_INTERVAL)
+recent_writers = TTLCache(maxsize=100000, ttl=READ_YOUR_WRITES_WINDOW)
+
+
+def _writer_key(authorization):
+    return hashlib.sha256(authorization.encode()).hexdigest() if authorization else None
+
+
+def wrote_recently(request: Request):
+    if request.cookies.get(STICKY_COOKIE):
+        return True
+    key = _writer_key(request.headers.get('authorization'))
+    return key is not None and recent_writers.get(key) is not None
+
+
+async def read_session_maker(request: Request):
+    if replica_engine is None:
+        return async_session_maker
+    if wrote_recently(request):
+        replica_monitor.sticky_reads += 1
+        return async_session_maker
+    if not await replica_monitor.is_usable(replica_engine):
+        replica_monitor.primary_fallbacks += 1
+        return async_session_maker
+    replica_monitor.replica_reads += 1
+    return replica_session_maker
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    session_maker = await read_session_maker(request)
+    async with session_maker() as session:
+        yield session
+
+
+
+def dialect_insert(session: AsyncSession):
+    # Postgres and SQLite both support INSERT ... ON CONFLICT, each through its own dialect construct.
+    return pg_insert if session.bind.dialect.name == 'postgresql' else sqlite_insert
+
+
+def violated_constraint(error: IntegrityError):
+    # psycopg reports the constraint through diag; asyncpg on the driver exception SQLAlchemy re-raises from.
+    diag = getattr(error.orig, 'diag', None)
+    if diag is not None:
+        return diag.constraint_name
+    return getattr(error.orig.__cause__, 'constraint_name', None)
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] in READ_METHODS:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start' and message['status'] < 400:
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    'set-cookie',
+                    f'{STICKY_COOKIE}=1; Max-Age={READ_YOUR_WRITES_WINDOW}; Path=/; HttpOnly; SameSite=Lax'
+                )
+                authorization = dict(scope['headers']).get(b'authorization')
+                if authorization:
+                    recent_writers.set(_writer_key(authorization.decode('latin-1')), True)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def pool_stats(pool=None):
+    pool = pool or engine.pool
+    return {
+        "size": pool.size() if hasattr(pool, 'size') else 0,
+        "checked_in": pool.checkedin() if hasattr(pool, 'checkedin') else 0,
+        "checked_out": pool.checkedout() if hasattr(pool, 'checkedout') else 0,
+        "overflow": max(pool.overflow(), 0) if hasattr(pool, 'overflow') else 0,
+        "max_overflow": DB_MAX_OVERFLOW if hasattr(pool, 'overflow') else 0,
+        "waiters": getattr(pool, 'waiters', 0),
+        "status": pool.status()
+    }
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, delete, func, and_, or_, event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import JOB_WORKERS, JOB_POLL_INTERVAL, JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF, JOB_RETRY_BACKOFF_MAX
+from config import JOB_LOCK_TIMEOUT
+from database import async_session_maker, dialect_insert
+from models.models import job
+
+
+logger = logging.getLogger(__name__)
+
+# Job name -> async handler(session, **payload)
+job_handlers = {}
+
+
+def job_handler(name: str):
+    def register(handler):
+        job_handlers[name] = handler
+        return handler
+    return register
+
+
+class JobQueue:
+    def __init__(self, session_maker, workers: int, poll_interval: float, max_attempts: int,
+                 backoff: float, backoff_max: float, lock_timeout: float):
+        self.session_maker = session_maker
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.lock_timeout = lock_timeout
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+        self.busy = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.total_run_time = 0.0
+
+    def wake(self):
+        self._wakeup.set()
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        # A job cut off here stays 'running' and is picked up again once its lock times out.
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _claimable(self, now: datetime):
+        return or_(
+            and_(job.c.status == 'pending', job.c.run_at <= now),
+            and_(job.c.status == 'running', job.c.locked_at < now - timedelta(seconds=self.lock_timeout))
+        )
+
+    async def _claim(self, session: AsyncSession):
+        now = datetime.utcnow()
+        candidate = select(job.c.id).where(self._claimable(now)).order_by(job.c.run_at, job.c.id).limit(1)
+        if session.bind.dialect.name == 'postgresql':
+            candidate = candidate.with_for_update(skip_locked=True)
+        job_id = (await session.execute(candidate)).scalar()
+        if job_id is None:
+            await session.rollback()
+            return None
+        # Re-checking the condition makes this a compare-and-set where SKIP LOCKED is unavailable.
+        # Dropping the dedupe key lets an identical job queue up behind this one while it runs.
+        result = await session.execute(
+            update(job)
+            .where(job.c.id == job_id, self._claimable(now))
+            .values(status='running', locked_at=now, attempts=job.c.attempts + 1, dedupe_key=None)
+            .returning(job.c.id, job.c.name, job.c.payload, job.c.attempts)
+        )
+        claimed = result.fetchone()
+        await session.commit()
+        return claimed
+
+    def _retry_delay(self, attempts: int):
+        delay = min(self.backoff_max, self.backoff * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1)
+
+    async def _finish(self, claimed, error: Exception = None):
+        async with self.session_maker() as session:
+            if error is None:
+                await session.execute(delete(job).where(job.c.id == claimed.id))
+            elif claimed.attempts >= self.max_attempts:
+                await session.execute(
+                    update(job).where(job.c.id == claimed.id).values(status='failed', last_error=repr(error))
+                )
+            else:
+                await session.execute(
+                    update(job).where(job.c.id == claimed.id).values(
+                        status='pending',
+                        locked_at=None,
+                        run_at=datetime.utcnow() + timedelta(seconds=self._retry_delay(claimed.attempts)),
+                        last_error=repr(error)
+                    )
+                )
+            await session.commit()
+
+    async def _heartbeat(self, claimed):
+        # Keeps the lock of a long job fresh so it is not reclaimed and run a second time alongside itself.
+        while True:
+            await asyncio.sleep(self.lock_timeout / 3)
+            try:
+                async with self.session_maker() as session:
+                    await session.execute(
+                        update(job)
+                        .where(job.c.id == claimed.id, job.c.status == 'running', job.c.attempts == claimed.attempts)
+                        .values(locked_at=datetime.utcnow())
+                    )
+                    await session.commit()
+            except Exception:
+                logger.exception('Could not refresh the lock of job %s', claimed.id)
+
+    async def _run(self, claimed):
+        started = time.monotonic()
+        error = None
+        self.busy += 1
+        heartbeat = asyncio.create_task(self._heartbeat(claimed))
+        try:
+            handler = job_handlers.get(claimed.name)
+            if handler is None:
+                raise LookupError(f'No handler registered for job {claimed.name!r}')
+            async with self.session_maker() as session:
+                await handler(session, **claimed.payload)
+                await session.commit()
+        except Exception as exc:
+            logger.exception('Job %s (%s) failed on attempt %s', claimed.id, claimed.name, claimed.attempts)
+            error = exc
+        finally:
+            heartbeat.cancel()
+            self.busy -= 1
+            self.total_run_time += time.monotonic() - started
+
+        if error is None:
+            self.completed += 1
+        elif claimed.attempts >= self.max_attempts:
+            self.failed += 1
+        else:
+            self.retried += 1
+        await self._finish(claimed, error)
+
+    async def _worker(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                async with self.session_maker() as session:
+                    claimed = await self._claim(session)
+                if claimed is not None:
+                    await self._run(claimed)
+                    continue
+            except Exception:
+                # E.g. the DB went away while claiming or recording the outcome. A claimed job stays
+                # 'running' and is picked up again once its lock times out; this worker keeps going.
+                logger.exception('Job worker cycle failed')
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stats(self, session: AsyncSession):
+        result = await session.execute(select(job.c.status, func.count()).group_by(job.c.status))
+        finished = self.completed + self.retried + self.failed
+        return {
+            "workers": len(self._tasks),
+            "busy": self.busy,
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "avg_run_ms": self.total_run_time / finished * 1000 if finished else 0.0,
+            "queued": dict(result.fetchall())
+        }
+
+
+job_queue = JobQueue(
+    async_session_maker,
+    workers=JOB_WORKERS,
+    poll_interval=JOB_POLL_INTERVAL,
+    max_attempts=JOB_MAX_ATTEMPTS,
+    backoff=JOB_RETRY_BACKOFF,
+    backoff_max=JOB_RETRY_BACKOFF_MAX,
+    lock_timeout=JOB_LOCK_TIMEOUT
+)
+
+
+async def enqueue(session: AsyncSession, name: str, delay: float = 0, dedupe_key: str = None, **payload):
+    # The row is written in the caller's transaction, so the job exists only if that transaction commits.
+    now = datetime.utcnow()
+    query = dialect_insert(session)(job).values(
+        name=name,
+        payload=payload,
+        dedupe_key=dedupe_key,
+        status='pending',
+        attempts=0,
+        run_at=now + timedelta(seconds=delay),
+        created_at=now
+    )
+    if dedupe_key is not None:
+        query = query.on_conflict_do_nothing(index_elements=[job.c.dedupe_key])
+    await session.execute(query)
+    if not delay:
+        event.listen(session.sync_session, 'after_commit', lambda _: job_queue.wake(), once=True)
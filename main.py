@@ -1,13 +1,35 @@
+from contextlib import asynccontextmanager
+
 from fastapi import APIRouter, FastAPI
 from auth.auth import auth_router
 from client.client import router_client,router_public
 from admin.admin import router_superuser
+from admin.utils import reference_cache
 from seller.seller import seller_router
-
-
-
-
-app = FastAPI(title='CogniJobs FREENLANCER', version='1.0.0')
+from storage.storage import storage_router
+from auth.passwords import password_hasher
+from auth.utils import revoked_tokens
+from storage.images import image_executor
+from jobs import job_queue
+from database import async_session_maker, ReadYourWritesMiddleware
+from ratelimit import RateLimitMiddleware, rate_limiter
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with async_session_maker() as session:
+        await reference_cache.refresh(session)
+        await revoked_tokens.refresh(session)
+    job_queue.start()
+    yield
+    await job_queue.stop()
+    password_hasher.shutdown()
+    image_executor.shutdown(cancel_futures=True)
+
+
+app = FastAPI(title='CogniJobs FREENLANCER', version='1.0.0', lifespan=lifespan)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
 
 router = APIRouter()
 
@@ -22,6 +44,7 @@ app.include_router(router_client)
 app.include_router(router_public,prefix="/public")
 app.include_router(router_superuser,prefix='/superuser')
 app.include_router(seller_router)
+app.include_router(storage_router, prefix='/files')
 
 
 
@@ -0,0 +1,53 @@
+"""add user unique constraints
+
+Revision ID: 3f1c9a7be2d4
+Revises: d76b82a784e9
+Create Date: 2026-10-18 14:02:17.640913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7be2d4'
+down_revision: Union[str, None] = 'd76b82a784e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def clear_duplicates(column):
+    # An optional contact detail stays with the oldest account that has it; newer accounts lose it and can set it again.
+    op.execute(f"""
+        UPDATE "user" u SET {column} = NULL
+        FROM (SELECT id, min(id) OVER (PARTITION BY {column}) AS keep_id FROM "user" WHERE {column} IS NOT NULL) d
+        WHERE u.id = d.id AND d.id <> d.keep_id
+    """)
+
+
+def upgrade() -> None:
+    # Emails are required and identify accounts, so duplicates are reported for manual merging instead of guessed at.
+    op.execute("""
+        DO $$
+        DECLARE duplicates text;
+        BEGIN
+            SELECT string_agg(email || ' (ids ' || ids || ')', ', ') INTO duplicates
+            FROM (SELECT email, string_agg(id::text, ', ' ORDER BY id) AS ids FROM "user" GROUP BY email HAVING count(*) > 1) d;
+            IF duplicates IS NOT NULL THEN
+                RAISE EXCEPTION 'Resolve duplicate user emails before adding user_email_key: %', duplicates;
+            END IF;
+        END $$
+    """)
+    clear_duplicates('telegram_username')
+    clear_duplicates('phone_number')
+    op.create_unique_constraint('user_email_key', 'user', ['email'])
+    op.create_unique_constraint('user_telegram_username_key', 'user', ['telegram_username'])
+    op.create_unique_constraint('user_phone_number_key', 'user', ['phone_number'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('user_phone_number_key', 'user', type_='unique')
+    op.drop_constraint('user_telegram_username_key', 'user', type_='unique')
+    op.drop_constraint('user_email_key', 'user', type_='unique')
@@ -0,0 +1,204 @@
+"""initial schema
+
+Revision ID: 5b9d2e7c1a04
+Revises:
+Create Date: 2026-10-18 09:31:52.104738
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b9d2e7c1a04'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('first_name', sa.String(), nullable=True),
+        sa.Column('last_name', sa.String(), nullable=True),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('username', sa.String(), nullable=False),
+        sa.Column('password', sa.String(), nullable=False),
+        sa.Column('registered_date', sa.TIMESTAMP(), nullable=True),
+        sa.Column('is_seller', sa.Boolean(), nullable=True),
+        sa.Column('is_client', sa.Boolean(), nullable=True),
+        sa.Column('is_superuser', sa.Boolean(), nullable=True),
+        sa.Column('telegram_username', sa.String(), nullable=True),
+        sa.Column('phone_number', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username')
+    )
+    op.create_table(
+        'occupation',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('occup_name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'skills',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('skill_name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'gigs_category',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('category_name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'gigs_tags',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('tag_name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'seller',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('image_url', sa.Text(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('cv_url', sa.Text(), nullable=True),
+        sa.Column('birth_date', sa.Date(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'gigs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('gigs_title', sa.String(), nullable=False),
+        sa.Column('duration', sa.Integer(), nullable=True),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('status', sa.Boolean(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('job_type', sa.Enum('full_time', 'part_time', 'contract', 'one_time_project', 'internship',
+                                      name='jobtypeenum'), nullable=False),
+        sa.Column('work_mode', sa.Enum('online', 'offline', name='workmodeenum'), nullable=False),
+        sa.ForeignKeyConstraint(['category_id'], ['gigs_category.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'seller_occupation',
+        sa.Column('seller_id', sa.Integer(), nullable=False),
+        sa.Column('occupation_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['occupation_id'], ['occupation.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['seller_id'], ['seller.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('seller_id', 'occupation_id')
+    )
+    op.create_table(
+        'seller_skills',
+        sa.Column('seller_id', sa.Integer(), nullable=False),
+        sa.Column('skill_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['seller_id'], ['seller.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['skill_id'], ['skills.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('seller_id', 'skill_id')
+    )
+    op.create_table(
+        'gig_tag_connect',
+        sa.Column('gig_id', sa.Integer(), nullable=False),
+        sa.Column('tag_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['gig_id'], ['gigs.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['tag_id'], ['gigs_tags.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('gig_id', 'tag_id')
+    )
+    op.create_table(
+        'gigs_file',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('file_url', sa.Text(), nullable=True),
+        sa.Column('gigs_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['gigs_id'], ['gigs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'seller_projects',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('delivery_days', sa.Integer(), nullable=True),
+        sa.Column('seller_id', sa.Integer(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('status', sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(['seller_id'], ['seller.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'experience',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('company_name', sa.String(), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=True),
+        sa.Column('end_date', sa.Date(), nullable=True),
+        sa.Column('seller_id', sa.Integer(), nullable=True),
+        sa.Column('city', sa.String(), nullable=True),
+        sa.Column('country', sa.String(), nullable=True),
+        sa.Column('job_title', sa.String(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['seller_id'], ['seller.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'certificate',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('pdf_url', sa.Text(), nullable=True),
+        sa.Column('seller_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['seller_id'], ['seller.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'project_files',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('file_url', sa.Text(), nullable=True),
+        sa.Column('seller_project_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['seller_project_id'], ['seller_projects.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'saved_client',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('seller_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['seller_id'], ['seller.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'saved_seller',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('seller_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['seller_id'], ['seller.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('saved_seller')
+    op.drop_table('saved_client')
+    op.drop_table('project_files')
+    op.drop_table('certificate')
+    op.drop_table('experience')
+    op.drop_table('seller_projects')
+    op.drop_table('gigs_file')
+    op.drop_table('gig_tag_connect')
+    op.drop_table('seller_skills')
+    op.drop_table('seller_occupation')
+    op.drop_table('gigs')
+    op.drop_table('seller')
+    op.drop_table('gigs_tags')
+    op.drop_table('gigs_category')
+    op.drop_table('skills')
+    op.drop_table('occupation')
+    op.drop_table('user')
+    sa.Enum(name='workmodeenum').drop(op.get_bind(), checkfirst=False)
+    sa.Enum(name='jobtypeenum').drop(op.get_bind(), checkfirst=False)
@@ -0,0 +1,26 @@
+"""add user claims version
+
+Revision ID: 8b0e4d2c61a5
+Revises: 3f1c9a7be2d4
+Create Date: 2026-10-18 15:21:44.108372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b0e4d2c61a5'
+down_revision: Union[str, None] = '3f1c9a7be2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user', sa.Column('claims_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('user', 'claims_version')
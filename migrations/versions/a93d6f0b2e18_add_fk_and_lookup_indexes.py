@@ -0,0 +1,206 @@
+"""add fk and lookup indexes
+
+Revision ID: a93d6f0b2e18
+Revises: f4c81a2e9d57
+Create Date: 2026-10-18 21:46:05.392187
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a93d6f0b2e18'
+down_revision: Union[str, None] = 'f4c81a2e9d57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = (
+    ('ix_gigs_category_id', 'gigs', 'category_id'),
+    ('ix_gigs_user_id', 'gigs', 'user_id'),
+    ('ix_gigs_file_gigs_id', 'gigs_file', 'gigs_id'),
+    ('ix_gigs_file_file_url', 'gigs_file', 'file_url'),
+    ('ix_gigs_file_thumb_url', 'gigs_file', 'thumb_url'),
+    ('ix_gigs_file_webp_url', 'gigs_file', 'webp_url'),
+    ('ix_gig_tag_connect_tag_id', 'gig_tag_connect', 'tag_id'),
+    ('ix_seller_image_url', 'seller', 'image_url'),
+    ('ix_seller_image_thumb_url', 'seller', 'image_thumb_url'),
+    ('ix_seller_image_webp_url', 'seller', 'image_webp_url'),
+    ('ix_seller_cv_url', 'seller', 'cv_url'),
+    ('ix_seller_skills_skill_id', 'seller_skills', 'skill_id'),
+    ('ix_seller_occupation_occupation_id', 'seller_occupation', 'occupation_id'),
+    ('ix_seller_projects_seller_id', 'seller_projects', 'seller_id'),
+    ('ix_project_files_seller_project_id', 'project_files', 'seller_project_id'),
+    ('ix_project_files_file_url', 'project_files', 'file_url'),
+    ('ix_experience_seller_id', 'experience', 'seller_id'),
+    ('ix_certificate_seller_id', 'certificate', 'seller_id'),
+    ('ix_certificate_pdf_url', 'certificate', 'pdf_url'),
+    ('ix_saved_client_user_id', 'saved_client', 'user_id'),
+    ('ix_saved_client_seller_id', 'saved_client', 'seller_id'),
+    ('ix_saved_seller_user_id', 'saved_seller', 'user_id'),
+    ('ix_saved_seller_seller_id', 'saved_seller', 'seller_id')
+)
+
+UNIQUE_CONSTRAINTS = (
+    ('seller_user_id_key', 'seller', 'user_id'),
+    ('gigs_category_category_name_key', 'gigs_category', 'category_name'),
+    ('gigs_tags_tag_name_key', 'gigs_tags', 'tag_name'),
+    ('skills_skill_name_key', 'skills', 'skill_name'),
+    ('occupation_occup_name_key', 'occupation', 'occup_name')
+)
+
+# Table -> rows pointing at it: (table, fk column, other key column for composite-key link tables).
+REFERENCES = {
+    'seller': (
+        ('seller_projects', 'seller_id', None),
+        ('experience', 'seller_id', None),
+        ('certificate', 'seller_id', None),
+        ('saved_client', 'seller_id', None),
+        ('saved_seller', 'seller_id', None),
+        ('seller_skills', 'seller_id', 'skill_id'),
+        ('seller_occupation', 'seller_id', 'occupation_id')
+    ),
+    'gigs_category': (('gigs', 'category_id', None),),
+    'gigs_tags': (('gig_tag_connect', 'tag_id', 'gig_id'),),
+    'skills': (('seller_skills', 'skill_id', 'seller_id'),),
+    'occupation': (('seller_occupation', 'occupation_id', 'seller_id'),)
+}
+
+
+# Ref-counted seller files (file_blob kind, url column) and the columns that travel with each of them.
+SELLER_FILES = (
+    ('image', 'image_url', ('image_url', 'image_thumb_url', 'image_webp_url')),
+    ('cv', 'cv_url', ('cv_url',))
+)
+
+UNIQUE_INDEX_ATTEMPTS = 3
+
+
+def merge_duplicates(table, column):
+    # Every row sharing a value with an older row is folded into the oldest one: references are
+    # re-pointed (link rows that already exist for the survivor are dropped), then the duplicate goes.
+    # Each statement is atomic and safe to repeat, so this can also run outside a transaction.
+    duplicates = f"""
+        SELECT id AS old_id, min(id) OVER (PARTITION BY {column}) AS new_id
+        FROM {table} WHERE {column} IS NOT NULL
+    """
+    for ref_table, fk, other in REFERENCES[table]:
+        if other is None:
+            op.execute(f"""
+                UPDATE {ref_table} r SET {fk} = d.new_id FROM ({duplicates}) d
+                WHERE r.{fk} = d.old_id AND d.old_id <> d.new_id
+            """)
+        else:
+            op.execute(f"""
+                INSERT INTO {ref_table} ({fk}, {other})
+                SELECT d.new_id, r.{other} FROM {ref_table} r JOIN ({duplicates}) d ON r.{fk} = d.old_id
+                WHERE d.old_id <> d.new_id
+                ON CONFLICT DO NOTHING
+            """)
+    if table == 'seller':
+        coalesce_seller_files(duplicates)
+        delete_sellers_releasing_files(duplicates)
+    else:
+        op.execute(f"""
+            DELETE FROM {table} t USING ({duplicates}) d
+            WHERE t.id = d.old_id AND d.old_id <> d.new_id
+        """)
+
+
+def coalesce_seller_files(duplicates):
+    # A kept seller without an image (or CV) takes the oldest duplicate's, which stops holding it.
+    for kind, url_column, columns in SELLER_FILES:
+        op.execute(f"""
+            WITH donor AS (
+                SELECT DISTINCT ON (d.new_id) d.new_id, s.id AS donor_id, {', '.join(f's.{c}' for c in columns)}
+                FROM ({duplicates}) d JOIN seller s ON s.id = d.old_id
+                WHERE d.old_id <> d.new_id AND s.{url_column} IS NOT NULL
+                ORDER BY d.new_id, s.id
+            ), taken AS (
+                UPDATE seller t SET {', '.join(f'{c} = donor.{c}' for c in columns)} FROM donor
+                WHERE t.id = donor.new_id AND t.{url_column} IS NULL
+                RETURNING donor.donor_id
+            )
+            UPDATE seller s SET {', '.join(f'{c} = NULL' for c in columns)} FROM taken WHERE s.id = taken.donor_id
+        """)
+
+
+def delete_sellers_releasing_files(duplicates):
+    # Dropping a row drops its file references; the counts go down in the same statement as the delete.
+    released = ' UNION ALL '.join(
+        f"SELECT '{kind}' AS kind, {url_column} AS url FROM dropped WHERE {url_column} IS NOT NULL"
+        for kind, url_column, columns in SELLER_FILES
+    )
+    op.execute(f"""
+        WITH dropped AS (
+            DELETE FROM seller t USING ({duplicates}) d
+            WHERE t.id = d.old_id AND d.old_id <> d.new_id
+            RETURNING {', '.join(f't.{url_column}' for kind, url_column, columns in SELLER_FILES)}
+        ), released AS (
+            SELECT kind, url, count(*) AS refs FROM ({released}) r GROUP BY kind, url
+        )
+        UPDATE file_blob b SET ref_count = b.ref_count - released.refs, updated_at = timezone('utc', now())
+        FROM released WHERE b.kind = released.kind AND b.url = released.url
+    """)
+    op.execute("""
+        INSERT INTO job (name, payload, dedupe_key, status, attempts, run_at, created_at)
+        SELECT 'collect_garbage', '{}', 'collect_garbage', 'pending', 0, timezone('utc', now()), timezone('utc', now())
+        WHERE EXISTS (SELECT 1 FROM file_blob WHERE ref_count <= 0)
+        ON CONFLICT (dedupe_key) DO NOTHING
+    """)
+
+
+def add_unique_constraint(name, table, column):
+    # Rows written between the dedupe and the build can still collide; a failed concurrent build leaves an
+    # INVALID index behind, so it is dropped, the table deduped again and the build retried.
+    exists = sa.text('SELECT 1 FROM pg_constraint WHERE conname = :name')
+    if op.get_bind().execute(exists, {'name': name}).scalar():
+        # Added by an earlier run that failed on a later table.
+        return
+    for attempt in range(UNIQUE_INDEX_ATTEMPTS):
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+        if attempt:
+            merge_duplicates(table, column)
+        try:
+            op.execute(f'CREATE UNIQUE INDEX CONCURRENTLY {name} ON {table} ({column})')
+        except sa.exc.IntegrityError:
+            continue
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}')
+        return
+    # Duplicates keep arriving faster than a concurrent build: hold off writes, and new references to the
+    # table, for one last dedupe and a plain build.
+    op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+    op.execute('BEGIN')
+    try:
+        op.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+        merge_duplicates(table, column)
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE ({column})')
+        op.execute('COMMIT')
+    except BaseException:
+        op.execute('ROLLBACK')
+        raise
+
+
+def upgrade() -> None:
+    for name, table, column in UNIQUE_CONSTRAINTS:
+        merge_duplicates(table, column)
+    # CONCURRENTLY keeps the tables writable while the indexes build; it cannot run inside a transaction.
+    # Unique constraints are attached to an index built that way instead of taking ACCESS EXCLUSIVE for the build.
+    with op.get_context().autocommit_block():
+        for name, table, column in UNIQUE_CONSTRAINTS:
+            add_unique_constraint(name, table, column)
+        for name, table, column in INDEXES:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+            op.create_index(name, table, [column], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    # IF EXISTS throughout: the concurrent drops commit one by one, so a failed run can be repeated.
+    with op.get_context().autocommit_block():
+        for name, table, column in reversed(INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+    for name, table, column in reversed(UNIQUE_CONSTRAINTS):
+        op.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}')
@@ -0,0 +1,48 @@
+"""add file blob refcounts
+
+Revision ID: c5a1e7f90b36
+Revises: 8b0e4d2c61a5
+Create Date: 2026-10-18 17:48:09.527311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a1e7f90b36'
+down_revision: Union[str, None] = '8b0e4d2c61a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'file_blob',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('url', sa.Text(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('kind', 'url', name='uq_file_blob_kind_url')
+    )
+    op.execute("""
+        INSERT INTO file_blob (kind, url, ref_count, updated_at)
+        SELECT kind, url, count(*), now()
+        FROM (
+            SELECT 'gig_file' AS kind, file_url AS url FROM gigs_file
+            UNION ALL SELECT 'project_file', file_url FROM project_files
+            UNION ALL SELECT 'certificate', pdf_url FROM certificate
+            UNION ALL SELECT 'image', image_url FROM seller
+            UNION ALL SELECT 'cv', cv_url FROM seller
+        ) refs
+        WHERE url IS NOT NULL
+        GROUP BY kind, url
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('file_blob')
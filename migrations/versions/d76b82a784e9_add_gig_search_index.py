@@ -0,0 +1,57 @@
+"""add gig search index
+
+Revision ID: d76b82a784e9
+Revises: 5b9d2e7c1a04
+Create Date: 2026-10-18 10:12:41.318254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'd76b82a784e9'
+down_revision: Union[str, None] = '5b9d2e7c1a04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_table(
+        'gig_search_index',
+        sa.Column('gig_id', sa.Integer(), nullable=False),
+        sa.Column('document', postgresql.TSVECTOR(), nullable=False),
+        sa.Column('search_text', sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(['gig_id'], ['gigs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('gig_id')
+    )
+    op.create_index('ix_gig_search_index_document', 'gig_search_index', ['document'], unique=False,
+                    postgresql_using='gin')
+    op.create_index('ix_gig_search_index_search_text_trgm', 'gig_search_index', ['search_text'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'})
+    op.execute("""
+        INSERT INTO gig_search_index (gig_id, document, search_text)
+        SELECT g.id,
+               setweight(to_tsvector('simple', coalesce(g.gigs_title, '')), 'A')
+               || setweight(to_tsvector('simple', coalesce(t.tags, '')), 'B')
+               || setweight(to_tsvector('simple', coalesce(c.category_name, '')), 'C')
+               || setweight(to_tsvector('simple', coalesce(g.description, '')), 'D'),
+               concat_ws(' ', g.gigs_title, t.tags, c.category_name)
+        FROM gigs g
+        LEFT JOIN gigs_category c ON c.id = g.category_id
+        LEFT JOIN (
+            SELECT gt.gig_id, string_agg(tg.tag_name, ' ') AS tags
+            FROM gig_tag_connect gt
+            JOIN gigs_tags tg ON tg.id = gt.tag_id
+            GROUP BY gt.gig_id
+        ) t ON t.gig_id = g.id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_gig_search_index_search_text_trgm', table_name='gig_search_index')
+    op.drop_index('ix_gig_search_index_document', table_name='gig_search_index')
+    op.drop_table('gig_search_index')
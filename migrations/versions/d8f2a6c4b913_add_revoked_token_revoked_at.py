@@ -0,0 +1,28 @@
+"""add revoked_token revoked_at
+
+Revision ID: d8f2a6c4b913
+Revises: b6e03f5c7a21
+Create Date: 2026-10-20 11:42:17.530964
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f2a6c4b913'
+down_revision: Union[str, None] = 'b6e03f5c7a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('revoked_token', sa.Column('revoked_at', sa.TIMESTAMP(), server_default=sa.text("timezone('utc', now())"), nullable=False))
+    op.create_index('ix_revoked_token_revoked_at', 'revoked_token', ['revoked_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_revoked_token_revoked_at', table_name='revoked_token')
+    op.drop_column('revoked_token', 'revoked_at')
@@ -0,0 +1,32 @@
+"""add image variant urls
+
+Revision ID: e2b7d4f81c03
+Revises: c5a1e7f90b36
+Create Date: 2026-10-18 19:21:37.804416
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7d4f81c03'
+down_revision: Union[str, None] = 'c5a1e7f90b36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('seller', sa.Column('image_thumb_url', sa.Text(), nullable=True))
+    op.add_column('seller', sa.Column('image_webp_url', sa.Text(), nullable=True))
+    op.add_column('gigs_file', sa.Column('thumb_url', sa.Text(), nullable=True))
+    op.add_column('gigs_file', sa.Column('webp_url', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('gigs_file', 'webp_url')
+    op.drop_column('gigs_file', 'thumb_url')
+    op.drop_column('seller', 'image_webp_url')
+    op.drop_column('seller', 'image_thumb_url')
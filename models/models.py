@@ -2,7 +2,9 @@
 from sqlalchemy import Table, Column, Integer, String, Text, Boolean, TIMESTAMP, Date, ForeignKey, Float, MetaData, Enum
 from datetime import datetime
 import enum
-from sqlalchemy import Table, Column, Integer, String, Float, Text, Boolean, ForeignKey, Enum, MetaData
+from sqlalchemy import Table, Column, Integer, String, Float, Text, Boolean, ForeignKey, Enum, MetaData, Index
+from sqlalchemy import UniqueConstraint, JSON
+from sqlalchemy.dialects.postgresql import TSVECTOR
 import enum
 
 metadata = MetaData()
@@ -28,26 +30,29 @@ user = Table(
     Column('id', Integer, primary_key=True, autoincrement=True),
     Column('first_name', String),
     Column('last_name', String),
-    Column('email', String, nullable=False),
+    Column('email', String, nullable=False, unique=True),
     Column('username', String, nullable=False, unique=True),
     Column('password', String, nullable=False),
     Column('registered_date', TIMESTAMP, default=datetime.utcnow),
     Column('is_seller', Boolean, default=False),
     Column('is_client', Boolean, default=False),
     Column('is_superuser', Boolean, default=False),
-    Column('telegram_username', String), 
-    Column('phone_number', String) 
+    Column('telegram_username', String, unique=True),
+    Column('phone_number', String, unique=True),
+    Column('claims_version', Integer, nullable=False, default=0, server_default='0')
 )
 
 seller = Table(
     'seller',
     metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('user_id', Integer, ForeignKey('user.id',ondelete='CASCADE')),
-    Column('image_url', Text),
+    Column('user_id', Integer, ForeignKey('user.id',ondelete='CASCADE'), unique=True),
+    Column('image_url', Text, index=True),
     Column('description', Text),
-    Column('cv_url', Text),
-    Column('birth_date', Date)
+    Column('cv_url', Text, index=True),
+    Column('birth_date', Date),
+    Column('image_thumb_url', Text, index=True),
+    Column('image_webp_url', Text, index=True)
 )
 
 
@@ -55,7 +60,7 @@ occupation = Table(
     'occupation',
     metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('occup_name', String, nullable=False)
+    Column('occup_name', String, nullable=False, unique=True)
 )
 
 
@@ -63,7 +68,7 @@ seller_occupation = Table(
     'seller_occupation',
     metadata,
     Column('seller_id', Integer, ForeignKey('seller.id', ondelete='CASCADE'), primary_key=True),
-    Column('occupation_id', Integer, ForeignKey('occupation.id', ondelete='CASCADE'), primary_key=True)
+    Column('occupation_id', Integer, ForeignKey('occupation.id', ondelete='CASCADE'), primary_key=True, index=True)
 )
 
 
@@ -71,7 +76,7 @@ skills = Table(
     'skills',
     metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('skill_name', String, nullable=False)
+    Column('skill_name', String, nullable=False, unique=True)
 )
 
 
@@ -79,7 +84,7 @@ seller_skills = Table(
     'seller_skills',
     metadata,
     Column('seller_id', Integer, ForeignKey('seller.id', ondelete='CASCADE'), primary_key=True),
-    Column('skill_id', Integer, ForeignKey('skills.id', ondelete='CASCADE'), primary_key=True)
+    Column('skill_id', Integer, ForeignKey('skills.id', ondelete='CASCADE'), primary_key=True, index=True)
 )
 
 
@@ -87,7 +92,7 @@ gigs_category = Table(
     'gigs_category',
     metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('category_name', String, nullable=False)
+    Column('category_name', String, nullable=False, unique=True)
 
 )
 
@@ -102,8 +107,8 @@ gigs = Table(
     Column('price', Float, nullable=False),
     Column('description', Text),
     Column('status', Boolean, default=True, nullable=False),
-    Column('category_id', Integer, ForeignKey('gigs_category.id', ondelete='CASCADE')),
-    Column('user_id', Integer, ForeignKey('user.id', ondelete='CASCADE')),
+    Column('category_id', Integer, ForeignKey('gigs_category.id', ondelete='CASCADE'), index=True),
+    Column('user_id', Integer, ForeignKey('user.id', ondelete='CASCADE'), index=True),
     Column('job_type', Enum(JobTypeEnum), nullable=False),  
      Column('work_mode', Enum(WorkModeEnum), nullable=False)
 )
@@ -114,7 +119,7 @@ gigs_tags = Table(
     'gigs_tags',
     metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('tag_name', String, nullable=False)
+    Column('tag_name', String, nullable=False, unique=True)
    
 )
 
@@ -123,7 +128,7 @@ gig_tag_association = Table(
     'gig_tag_connect',
     metadata,
     Column('gig_id', Integer, ForeignKey('gigs.id', ondelete='CASCADE'), primary_key=True),
-    Column('tag_id', Integer, ForeignKey('gigs_tags.id', ondelete='CASCADE'), primary_key=True)
+    Column('tag_id', Integer, ForeignKey('gigs_tags.id', ondelete='CASCADE'), primary_key=True, index=True)
 )
 
 
@@ -131,12 +136,27 @@ gig_tag_association = Table(
 
 
 
+gig_search_index = Table(
+    'gig_search_index',
+    metadata,
+    Column('gig_id', Integer, ForeignKey('gigs.id', ondelete='CASCADE'), primary_key=True),
+    Column('document', TSVECTOR().with_variant(Text, 'sqlite'), nullable=False),
+    Column('search_text', Text, nullable=False),
+    Index('ix_gig_search_index_document', 'document', postgresql_using='gin'),
+    Index('ix_gig_search_index_search_text_trgm', 'search_text', postgresql_using='gin',
+          postgresql_ops={'search_text': 'gin_trgm_ops'})
+)
+
+
+
 gigs_file = Table(
     'gigs_file',
     metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('file_url', Text),
-    Column('gigs_id', Integer, ForeignKey('gigs.id',ondelete='CASCADE'))
+    Column('file_url', Text, index=True),
+    Column('gigs_id', Integer, ForeignKey('gigs.id',ondelete='CASCADE'), index=True),
+    Column('thumb_url', Text, index=True),
+    Column('webp_url', Text, index=True)
 )
 
 
@@ -147,7 +167,7 @@ seller_projects = Table(
     Column('title', String, nullable=False),
     Column('price', Float, nullable=False),
     Column('delivery_days', Integer),
-    Column('seller_id', Integer, ForeignKey('seller.id',ondelete='CASCADE')),
+    Column('seller_id', Integer, ForeignKey('seller.id',ondelete='CASCADE'), index=True),
     Column('description', Text),
     Column('status', Boolean,default=True,nullable=False)
 )
@@ -163,7 +183,7 @@ experience = Table(
     Column('company_name', String, nullable=False),
     Column('start_date', Date),
     Column('end_date', Date),
-    Column('seller_id', Integer, ForeignKey('seller.id',ondelete='CASCADE')),
+    Column('seller_id', Integer, ForeignKey('seller.id',ondelete='CASCADE'), index=True),
     Column('city', String),
     Column('country', String),
     Column('job_title', String),
@@ -176,8 +196,8 @@ certificate = Table(
     'certificate',
     metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('pdf_url', Text),
-    Column('seller_id', Integer, ForeignKey('seller.id',ondelete='CASCADE'))
+    Column('pdf_url', Text, index=True),
+    Column('seller_id', Integer, ForeignKey('seller.id',ondelete='CASCADE'), index=True)
 )
 
 
@@ -186,8 +206,8 @@ project_files = Table(
     'project_files',
     metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('file_url', Text),
-    Column('seller_project_id', Integer, ForeignKey('seller_projects.id',ondelete='CASCADE'))
+    Column('file_url', Text, index=True),
+    Column('seller_project_id', Integer, ForeignKey('seller_projects.id',ondelete='CASCADE'), index=True)
 )
 
 
@@ -196,17 +216,54 @@ saved_client = Table(
     'saved_client',
     metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('seller_id', Integer, ForeignKey('seller.id',ondelete='CASCADE')),
-    Column('user_id', Integer, ForeignKey('user.id',ondelete='CASCADE'))
+    Column('seller_id', Integer, ForeignKey('seller.id',ondelete='CASCADE'), index=True),
+    Column('user_id', Integer, ForeignKey('user.id',ondelete='CASCADE'), index=True)
 )
 
 saved_seller = Table(
     'saved_seller',
     metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('user_id', Integer, ForeignKey('user.id',ondelete='CASCADE')),
-    Column('seller_id', Integer, ForeignKey('seller.id',ondelete='CASCADE'))
+    Column('user_id', Integer, ForeignKey('user.id',ondelete='CASCADE'), index=True),
+    Column('seller_id', Integer, ForeignKey('seller.id',ondelete='CASCADE'), index=True)
 )
 
 
+file_blob = Table(
+    'file_blob',
+    metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('kind', String, nullable=False),
+    Column('url', Text, nullable=False),
+    Column('ref_count', Integer, nullable=False, default=0),
+    Column('updated_at', TIMESTAMP, default=datetime.utcnow, nullable=False),
+    UniqueConstraint('kind', 'url', name='uq_file_blob_kind_url')
+)
 
+
+job = Table(
+    'job',
+    metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('name', String, nullable=False),
+    Column('payload', JSON, nullable=False),
+    Column('dedupe_key', String, unique=True),
+    Column('status', String, nullable=False, default='pending'),
+    Column('attempts', Integer, nullable=False, default=0),
+    Column('run_at', TIMESTAMP, default=datetime.utcnow, nullable=False),
+    Column('locked_at', TIMESTAMP),
+    Column('last_error', Text),
+    Column('created_at', TIMESTAMP, default=datetime.utcnow, nullable=False),
+    Index('ix_job_status_run_at', 'status', 'run_at')
+)
+
+
+revoked_token = Table(
+    'revoked_token',
+    metadata,
+    Column('jti', String, primary_key=True),
+    Column('expires_at', TIMESTAMP, nullable=False),
+    Column('revoked_at', TIMESTAMP, nullable=False, default=datetime.utcnow),
+    Index('ix_revoked_token_expires_at', 'expires_at'),
+    Index('ix_revoked_token_revoked_at', 'revoked_at')
+)
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict, namedtuple
+
+from starlette.responses import JSONResponse
+
+from config import LOGIN_RATE_LIMIT_IP, LOGIN_RATE_LIMIT_USERNAME, REGISTER_RATE_LIMIT_IP, REFRESH_RATE_LIMIT_IP
+from config import RATE_LIMIT_MAX_KEYS
+
+
+MAX_BUFFERED_BODY = 64 * 1024
+
+Rate = namedtuple('Rate', ['capacity', 'period'])
+RateLimitRule = namedtuple('RateLimitRule', ['ip', 'username'])
+
+
+def parse_rate(spec: str):
+    if not spec:
+        return None
+    capacity, period = spec.split('/')
+    return Rate(int(capacity), float(period))
+
+
+class RateLimitBackend:
+    async def consume(self, key, rate: Rate) -> float:
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = asyncio.Lock()
+        self.evictions = 0
+
+    async def consume(self, key, rate: Rate) -> float:
+        # Token bucket refilled continuously at capacity/period, i.e. a smoothed sliding window.
+        # Returns 0 when the request may proceed, otherwise the seconds until a token is available.
+        async with self._lock:
+            now = time.monotonic()
+            tokens, updated_at = self._buckets.pop(key, (rate.capacity, now))
+            tokens = min(rate.capacity, tokens + (now - updated_at) * rate.capacity / rate.period)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) * rate.period / rate.capacity
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+            return retry_after
+
+    def stats(self):
+        return {
+            "keys": len(self._buckets),
+            "maxsize": self.maxsize,
+            "evictions": self.evictions
+        }
+
+
+class RateLimiter:
+    def __init__(self, backend: RateLimitBackend, rules: dict):
+        self.backend = backend
+        self.rules = {path: rule for path, rule in rules.items() if rule.ip or rule.username}
+        self.allowed = 0
+        self.shed = {}
+
+    async def check(self, path, ip, username=None) -> float:
+        rule = self.rules[path]
+        retry_after = 0.0
+        if rule.ip and ip:
+            retry_after = await self.backend.consume(f'ip:{ip}:{path}', rule.ip)
+            if retry_after:
+                self._count_shed(path, 'ip')
+                return retry_after
+        if rule.username and username:
+            retry_after = await self.backend.consume(f'username:{username.lower()}:{path}', rule.username)
+            if retry_after:
+                self._count_shed(path, 'username')
+                return retry_after
+        self.allowed += 1
+        return retry_after
+
+    def _count_shed(self, path, key_type):
+        counters = self.shed.setdefault(path, {'ip': 0, 'username': 0})
+        counters[key_type] += 1
+
+    def stats(self):
+        return {
+            "allowed": self.allowed,
+            "shed": self.shed,
+            "backend": self.backend.stats()
+        }
+
+
+def _username_from_body(body: bytes):
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    username = data.get('username') if isinstance(data, dict) else None
+    return username if isinstance(username, str) else None
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.limiter.rules:
+            return await self.app(scope, receive, send)
+
+        path = scope['path']
+        client = scope.get('client')
+        username = None
+        if self.limiter.rules[path].username:
+            body, receive = await self._buffer_body(receive)
+            if body and len(body) <= MAX_BUFFERED_BODY:
+                username = _username_from_body(body)
+
+        retry_after = await self.limiter.check(path, client[0] if client else None, username)
+        if retry_after:
+            response = JSONResponse(
+                {'detail': 'Too many requests'},
+                status_code=429,
+                headers={'Retry-After': str(math.ceil(retry_after))}
+            )
+            return await response(scope, receive, send)
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _buffer_body(receive):
+        # Reads at most just past MAX_BUFFERED_BODY; the app then gets the messages already read, followed by
+        # whatever the client is still sending, so an oversized body is never held in memory here.
+        messages = []
+        size = 0
+        more_body = True
+        while more_body and size <= MAX_BUFFERED_BODY:
+            message = await receive()
+            messages.append(message)
+            if message['type'] != 'http.request':
+                break
+            size += len(message.get('body', b''))
+            more_body = message.get('more_body', False)
+        pending = iter(messages)
+
+        async def replay():
+            return next(pending, None) or await receive()
+
+        if more_body:
+            return b'', replay
+        return b''.join(message.get('body', b'') for message in messages), replay
+
+
+rate_limiter = RateLimiter(MemoryRateLimitBackend(RATE_LIMIT_MAX_KEYS), {
+    '/auth/login': RateLimitRule(parse_rate(LOGIN_RATE_LIMIT_IP), parse_rate(LOGIN_RATE_LIMIT_USERNAME)),
+    '/auth/register': RateLimitRule(parse_rate(REGISTER_RATE_LIMIT_IP), None),
+    '/auth/refresh': RateLimitRule(parse_rate(REFRESH_RATE_LIMIT_IP), None)
+})
@@ -117,6 +117,7 @@ class Seller(BaseModel):
     id: int
     user_id: int
     image_url: Optional[str]
+    image_thumb_url: Optional[str] = None
     description: Optional[str]
     cv_url: Optional[str]
     birth_date: Optional[date]
@@ -1,19 +1,22 @@
 from fastapi import UploadFile,Body
-import aiofiles
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import insert, delete,func,update
 from sqlalchemy.future import select
-from auth.utils import verify_token
+from auth.utils import verify_claims, require_seller
+from storage.utils import save_upload
+from storage.blobs import retain_blob, release_blobs, release_project_blobs
+from jobs import enqueue
 from client.client import router_public
-from database import get_async_session
+from database import get_async_session, get_read_session
 from models.models import seller_projects, certificate, experience, occupation, \
     project_files, seller, user
+from .utils import load_seller_profile, get_cached_seller_profile, invalidate_seller_profile
 from .schemas import SellerProjectCreate, SellerProject, Certificate, \
     ExperienceCreate, Experience, \
     ProjectFile,SellerUpdateSchema,Profil
 from models.models import skills, seller_skills,seller_occupation,occupation,saved_seller
 from sqlalchemy import select
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List ,Dict
 from fastapi.responses import JSONResponse
 from models.models import gigs
@@ -29,39 +32,38 @@ async def update_seller_profile(
     birth_date: Optional[date] = Form(None),
     image_url: UploadFile = None,
     cv_url: UploadFile = None,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_seller),
     session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
 
-    user_id = token.get('user_id')
-    
-    seller_query = select(seller.c.id).where(seller.c.user_id == user_id)
-    result = await session.execute(seller_query)
-    seller_id = result.scalar()
-
-    if seller_id is None:
-        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
 
     out_file1 = None
     out_file2 = None
 
     if image_url is not None:
-        out_file1 = f'/{image_url.filename}'
-        async with aiofiles.open(f'image_file/{out_file1}', 'wb') as f:
-            content = await image_url.read()
-            await f.write(content)
+        out_file1 = await save_upload(image_url, 'image')
 
     if cv_url is not None:
-        out_file2 = f'/{cv_url.filename}'
-        async with aiofiles.open(f'cv_file/{out_file2}', 'wb') as f:
-            content = await cv_url.read()
-            await f.write(content)
+        out_file2 = await save_upload(cv_url, 'cv')
+
+    if out_file1 is not None or out_file2 is not None:
+        current = (await session.execute(
+            select(seller.c.image_url, seller.c.cv_url).where(seller.c.id == seller_id)
+        )).fetchone()
+        if out_file1 is not None:
+            await release_blobs(session, 'image', [current.image_url])
+            await retain_blob(session, 'image', out_file1)
+            await enqueue(session, 'process_image', kind='image', url=out_file1)
+        if out_file2 is not None:
+            await release_blobs(session, 'cv', [current.cv_url])
+            await retain_blob(session, 'cv', out_file2)
 
     query = update(seller).where(seller.c.id == seller_id)
     if out_file1 is not None:
-        query = query.values(image_url=out_file1)
+        query = query.values(image_url=out_file1, image_thumb_url=None, image_webp_url=None)
     if description is not None:
         query = query.values(description=description)
     if out_file2 is not None:
@@ -71,27 +73,21 @@ async def update_seller_profile(
 
     await session.execute(query)
     await session.commit()
+    await invalidate_seller_profile(seller_id)
 
     return {"message": "Seller profile updated successfully"}
 
 @seller_router.post("/project/", summary="Create a new project")
 async def create_seller_project(
         project: SellerProjectCreate,
-        token: dict = Depends(verify_token),
+        token: dict = Depends(require_seller),
         session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
 
-    user_id = token.get('user_id')
 
-
-    seller_query = select(seller.c.id).where(seller.c.user_id == user_id)
-    result = await session.execute(seller_query)
-    seller_id = result.scalar()
-
-    if seller_id is None:
-     raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
 
     existing_project_result=await session.execute(
         select(seller_projects).where(
@@ -129,84 +125,69 @@ async def create_seller_project(
 
 @seller_router.get("/projects/", response_model=List[SellerProject], summary="Get all projects by user")
 async def read_seller_projects(
-        token: dict = Depends(verify_token),
+        limit: int = Query(20, ge=1, le=100),
+        offset: int = Query(0, ge=0),
+        include_files: bool = True,
+        token: dict = Depends(require_seller),
         session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
 
-    user_id = token.get('user_id')
-
-    seller_query = select(seller.c.id).where(seller.c.user_id == user_id)
-    result = await session.execute(seller_query)
-    seller_id = result.scalar()
-    
-    if seller_id is None:
-        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
 
 
     result = await session.execute(
-        select(seller_projects).where(seller_projects.c.seller_id == seller_id)
+        select(seller_projects)
+        .where(seller_projects.c.seller_id == seller_id)
+        .order_by(seller_projects.c.id)
+        .limit(limit)
+        .offset(offset)
     )
     projects = result.fetchall()
 
     if not projects:
         raise HTTPException(status_code=404, detail="No projects found for this user")
 
-    project_list = []
-    for project in projects:
-  
-        print(project)
-        project_id = project[0]  
-
-  
+    files_by_project = {project.id: [] for project in projects}
+    if include_files:
         project_files_result = await session.execute(
-            select(project_files).where(project_files.c.seller_project_id == project_id)
+            select(project_files)
+            .where(project_files.c.seller_project_id.in_(files_by_project))
+            .order_by(project_files.c.id)
         )
-        project_files_data = project_files_result.fetchall()
-
-    
-       
-       
-
-        project_dict = {
-            "id": project[0],
-            "title": project[1],
-         
-            "price": project[2],
-            "delivery_days": project[3],
-            "seller_id": project[4],
-            "description": project[5],
-            "status": project[6],
-            "files": [ProjectFile(id=file.id, file_url=file.file_url, seller_project_id=file.seller_project_id) for file
-                      in project_files_data],
-           
-        }
-
-        project_list.append(SellerProject(**project_dict))
-
-    return project_list
+        for file in project_files_result.fetchall():
+            files_by_project[file.seller_project_id].append(
+                ProjectFile(id=file.id, file_url=file.file_url, seller_project_id=file.seller_project_id)
+            )
+
+    return [
+        SellerProject(
+            id=project.id,
+            title=project.title,
+            price=project.price,
+            delivery_days=project.delivery_days,
+            seller_id=project.seller_id,
+            description=project.description,
+            status=project.status,
+            files=files_by_project[project.id]
+        )
+        for project in projects
+    ]
 
 
 
 @seller_router.delete("/projects/{project_id}/", summary="Delete a project by ID")
 async def delete_seller_project(
         project_id: int,
-        token: dict = Depends(verify_token),
+        token: dict = Depends(require_seller),
         session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
 
-    user_id = token.get('user_id')
 
-
-    seller_query = select(seller.c.id).where(seller.c.user_id == user_id)
-    result = await session.execute(seller_query)
-    seller_id = result.scalar()
-    
-    if seller_id is None:
-        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
 
   
     result = await session.execute(
@@ -220,7 +201,7 @@ async def delete_seller_project(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found or not owned by the user")
 
-  
+    await release_project_blobs(session, seller_projects.c.id == project_id)
     await session.execute(
         delete(project_files).where(project_files.c.seller_project_id == project_id)
     )
@@ -244,20 +225,13 @@ async def delete_seller_project(
 @seller_router.post("/certificate/", summary="Add a new certificate")
 async def add_certificate(
         file: UploadFile,
-        token: dict = Depends(verify_token),
+        token: dict = Depends(require_seller),
         session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
 
-    user_id = token.get('user_id')
-
-    seller_query = select(seller.c.id).where(seller.c.user_id == user_id)
-    result = await session.execute(seller_query)
-    seller_id = result.scalar()
-
-    if seller_id is None:
-     raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
     
     
     cert_count_query = select(func.count(certificate.c.id)).where(certificate.c.seller_id == seller_id)
@@ -270,18 +244,16 @@ async def add_certificate(
 
 
     
-    if file is not None:
-        out_file = f'/{file.filename}'
-        async with aiofiles.open(f'certificate_file/{out_file}', 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+    out_file = await save_upload(file, 'certificate')
 
     new_cert = certificate.insert().values(
         pdf_url=out_file,
         seller_id=seller_id
     )
     result = await session.execute(new_cert)
+    await retain_blob(session, 'certificate', out_file)
     await session.commit()
+    await invalidate_seller_profile(seller_id)
 
     return JSONResponse(
         status_code=201,
@@ -293,20 +265,13 @@ async def add_certificate(
 
 @seller_router.get("/certificates/", response_model=List[Certificate], summary="Get all certificates by user")
 async def get_certificates(
-        token: dict = Depends(verify_token),
+        token: dict = Depends(require_seller),
         session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
 
-    user_id = token.get('user_id')
-
-    seller_query = select(seller.c.id).where(seller.c.user_id == user_id)
-    result = await session.execute(seller_query)
-    seller_id = result.scalar()
-
-    if seller_id is None:
-     raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
     
     result = await session.execute(
         select(certificate).where(certificate.c.seller_id == seller_id)
@@ -322,33 +287,28 @@ async def get_certificates(
 @seller_router.delete("/certificates/{cert_id}/", summary="Delete a certificate by ID")
 async def delete_certificate(
         cert_id: int,
-        token: dict = Depends(verify_token),
+        token: dict = Depends(require_seller),
         session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
 
-    user_id = token.get('user_id')
-
-    seller_query = select(seller.c.id).where(seller.c.user_id == user_id)
-    result = await session.execute(seller_query)
-    seller_id = result.scalar()
-
-    if seller_id is None:
-     raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
   
     result = await session.execute(select(certificate).where(
         (certificate.c.id == cert_id) & (certificate.c.seller_id == seller_id)
     ))
 
-    cert = result.scalar_one_or_none()
+    cert = result.fetchone()
 
     if not cert:
         raise HTTPException(status_code=404, detail="Certificate not found")
 
 
     await session.execute(certificate.delete().where(certificate.c.id == cert_id))
+    await release_blobs(session, 'certificate', [cert.pdf_url])
     await session.commit()
+    await invalidate_seller_profile(seller_id)
 
     return JSONResponse(
         status_code=200,
@@ -360,20 +320,14 @@ async def delete_certificate(
 @seller_router.post("/experience/",  summary="Add a new experience")
 async def add_experience(
         exp: ExperienceCreate,
-        token: dict = Depends(verify_token),
+        token: dict = Depends(require_seller),
         session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
 
-    user_id = token.get('user_id')
-  
 
-    seller_query = select(seller.c.id).where(seller.c.user_id == user_id)
-    result = await session.execute(seller_query)
-    seller_id = result.scalar()
-    if seller_id is None:
-     raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
 
      
     exp_count_query = select(func.count()).where(experience.c.seller_id == seller_id)
@@ -415,6 +369,7 @@ async def add_experience(
     )
     result = await session.execute(new_exp)
     await session.commit()
+    await invalidate_seller_profile(seller_id)
 
 
     return JSONResponse(
@@ -426,20 +381,14 @@ async def add_experience(
 
 @seller_router.get("/experiences/", response_model=List[Experience], summary="Get all experiences by user")
 async def get_experiences(
-        token: dict = Depends(verify_token),
+        token: dict = Depends(require_seller),
         session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
 
-    user_id = token.get('user_id')
-  
 
-    seller_query = select(seller.c.id).where(seller.c.user_id == user_id)
-    result = await session.execute(seller_query)
-    seller_id = result.scalar()
-    if seller_id is None:
-     raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
 
 
     result = await session.execute(
@@ -472,16 +421,16 @@ async def get_experiences(
 @seller_router.delete("/experiences/{exp_id}/", summary="Delete an experience by ID")
 async def delete_experience(
         exp_id: int,
-        token: dict = Depends(verify_token),
+        token: dict = Depends(require_seller),
         session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
 
-    user_id = token.get('user_id')
+    seller_id = token['seller_id']
 
     result = await session.execute(select(experience).where(
-        (experience.c.id == exp_id) & (experience.c.seller_id == user_id)
+        (experience.c.id == exp_id) & (experience.c.seller_id == seller_id)
     ))
     exp = result.scalar_one_or_none()
 
@@ -491,6 +440,7 @@ async def delete_experience(
 
     await session.execute(experience.delete().where(experience.c.id == exp_id))
     await session.commit()
+    await invalidate_seller_profile(seller_id)
 
 
     return JSONResponse(
@@ -503,20 +453,13 @@ async def delete_experience(
 @seller_router.get("/experiences/{exp_id}/", response_model=List[Experience], summary="Get an experience by ID")
 async def get_experience(
         exp_id: int,
-        token: dict = Depends(verify_token),
+        token: dict = Depends(require_seller),
         session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
 
-    user_id = token.get('user_id')
-
-    seller_query = select(seller.c.id).where(seller.c.user_id == user_id)
-    result = await session.execute(seller_query)
-    seller_id = result.scalar()
-    
-    if seller_id is None:
-        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
 
  
     result = await session.execute(select(experience).where(
@@ -537,21 +480,14 @@ async def add_project_files(
         file: UploadFile,
         seller_project_id: int,
 
-        token: dict = Depends(verify_token),
+        token: dict = Depends(require_seller),
         session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
 
-    user_id = token.get('user_id')
-
    
-    seller_query = select(seller.c.id).where(seller.c.user_id == user_id)
-    result = await session.execute(seller_query)
-    seller_id = result.scalar()
-    
-    if seller_id is None:
-        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
 
    
     project_query = select(seller_projects.c.id).where(
@@ -565,17 +501,14 @@ async def add_project_files(
         raise HTTPException(status_code=403, detail="You are not allowed to add files to this project")
     
 
-    if file is not None:
-        out_file = f'/{file.filename}'
-        async with aiofiles.open(f'project_file/{out_file}', 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+    out_file = await save_upload(file, 'project_file')
   
     new_proj_file = project_files.insert().values(
         file_url=out_file,
         seller_project_id=seller_project_id
     )
     await session.execute(new_proj_file)
+    await retain_blob(session, 'project_file', out_file)
     await session.commit()
 
     return JSONResponse(
@@ -587,21 +520,14 @@ async def add_project_files(
 
 @seller_router.get("/project-files/", summary="Get all project files for a seller")
 async def get_project_files(
-        token: dict = Depends(verify_token),
+        token: dict = Depends(require_seller),
         session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
 
-    user_id = token.get('user_id')
-
     # Seller ID ni olish
-    seller_query = select(seller.c.id).where(seller.c.user_id == user_id)
-    result = await session.execute(seller_query)
-    seller_id = result.scalar()
-
-    if seller_id is None:
-        raise HTTPException(status_code=404, detail="Seller not found")
+    seller_id = token['seller_id']
 
 
     files_query = select(project_files).select_from(
@@ -631,25 +557,24 @@ async def get_project_files(
 @seller_router.delete("/project-files/{proj_file_id}/", summary="Delete a project file by ID")
 async def delete_project_file(
         proj_file_id: int,
-        token: dict = Depends(verify_token),
+        token: dict = Depends(verify_claims),
         session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
 
-    user_id = token.get('user_id')
-
 
     result = await session.execute(select(project_files).where(
         (project_files.c.id == proj_file_id)
     ))
-    proj_file = result.scalar_one_or_none()
+    proj_file = result.fetchone()
 
     if not proj_file:
         raise HTTPException(status_code=404, detail="Project file not found")
 
    
     await session.execute(project_files.delete().where(project_files.c.id == proj_file_id))
+    await release_blobs(session, 'project_file', [proj_file.file_url])
     await session.commit()
 
     return JSONResponse(
@@ -662,17 +587,12 @@ async def delete_project_file(
 @seller_router.post("/seller/skill/", summary="Add multiple skills to seller profile")
 async def add_skills_to_seller(
     skills_ids: List[int],  
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_seller),
     session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
-    user_id = token.get('user_id')
-
-    seller_result = await session.execute(select(seller.c.id).where(seller.c.user_id == user_id))
-    seller_id = seller_result.scalar()
-    if not seller_id:
-        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
 
     
     skill_result = await session.execute(select(skills.c.id).where(skills.c.id.in_(skills_ids)))
@@ -695,6 +615,7 @@ async def add_skills_to_seller(
         insert_query = insert(seller_skills).values(values_to_insert)
         await session.execute(insert_query)
         await session.commit()
+        await invalidate_seller_profile(seller_id)
 
 
     return JSONResponse(
@@ -706,17 +627,12 @@ async def add_skills_to_seller(
 
 @seller_router.get("/seller/skills/", summary="Occupations")
 async def get_seller_profile(
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_seller),
     session: AsyncSession = Depends(get_async_session)
 ) -> Dict:
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
-    user_id = token.get('user_id')
-
-    seller_result = await session.execute(select(seller.c.id).where(seller.c.user_id == user_id))
-    seller_id = seller_result.scalar()
-    if not seller_id:
-        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
   
     seller_query = select(seller).where(seller.c.id == seller_id)
     seller_result = await session.execute(seller_query)
@@ -738,18 +654,13 @@ async def get_seller_profile(
 @seller_router.delete("/seller/skill/{skill_id}", summary="Remove a skill from seller profile")
 async def delete_skill_from_seller(
     skill_id: int,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_seller),
     session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
-    user_id = token.get('user_id')
-
   
-    seller_result = await session.execute(select(seller.c.id).where(seller.c.user_id == user_id))
-    seller_id = seller_result.scalar()
-    if not seller_id:
-        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
 
     skill_result = await session.execute(select(skills.c.id).where(skills.c.id == skill_id))
     if skill_result.scalar() is None:
@@ -769,6 +680,7 @@ async def delete_skill_from_seller(
     )
     await session.execute(delete_query)
     await session.commit()
+    await invalidate_seller_profile(seller_id)
 
 
     return JSONResponse(
@@ -781,17 +693,12 @@ async def delete_skill_from_seller(
 @seller_router.post("/seller/occupation/", summary="Add multiple occupations to seller profile")
 async def add_occupations_to_seller(
     occupation_ids: List[int],  
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_seller),
     session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
-    user_id = token.get('user_id')
-
-    seller_result = await session.execute(select(seller.c.id).where(seller.c.user_id == user_id))
-    seller_id = seller_result.scalar()
-    if not seller_id:
-        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
 
 
     occupation_result = await session.execute(select(occupation.c.id).where(occupation.c.id.in_(occupation_ids)))
@@ -815,6 +722,7 @@ async def add_occupations_to_seller(
         insert_query = insert(seller_occupation).values(values_to_insert)
         await session.execute(insert_query)
         await session.commit()
+        await invalidate_seller_profile(seller_id)
 
     return JSONResponse(
         status_code=201,
@@ -825,17 +733,12 @@ async def add_occupations_to_seller(
 
 @seller_router.get("/seller/occupations/", summary="Occupations")
 async def get_seller_profile(
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_seller),
     session: AsyncSession = Depends(get_async_session)
 ) -> Dict:
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
-    user_id = token.get('user_id')
-
-    seller_result = await session.execute(select(seller.c.id).where(seller.c.user_id == user_id))
-    seller_id = seller_result.scalar()
-    if not seller_id:
-        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
   
     seller_query = select(seller).where(seller.c.id == seller_id)
     seller_result = await session.execute(seller_query)
@@ -857,18 +760,13 @@ async def get_seller_profile(
 @seller_router.delete("/seller/occupation/{occupation_id}", summary="Remove an occupation from seller profile")
 async def delete_occupation_from_seller(
     occupation_id: int,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_seller),
     session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
-    user_id = token.get('user_id')
-
 
-    seller_result = await session.execute(select(seller.c.id).where(seller.c.user_id == user_id))
-    seller_id = seller_result.scalar()
-    if not seller_id:
-        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
 
   
     occupation_result = await session.execute(select(occupation.c.id).where(occupation.c.id == occupation_id))
@@ -890,6 +788,7 @@ async def delete_occupation_from_seller(
     )
     await session.execute(delete_query)
     await session.commit()
+    await invalidate_seller_profile(seller_id)
 
 
     return JSONResponse(
@@ -901,70 +800,18 @@ async def delete_occupation_from_seller(
 
 @seller_router.get("/seller/profile/", summary="Get seller's profile including skills, certificates, experience, and seller details")
 async def get_seller_profile(
-    token: dict = Depends(verify_token),
+    token: dict = Depends(verify_claims),
     session: AsyncSession = Depends(get_async_session)
 ) -> Dict:
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
     user_id = token.get('user_id')
 
-    seller_result = await session.execute(select(seller.c.id).where(seller.c.user_id == user_id))
-    seller_id = seller_result.scalar()
-    if not seller_id:
+    profile = await load_seller_profile(session, user_id=user_id)
+    if profile is None:
         raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
-  
-    seller_query = select(seller).where(seller.c.id == seller_id)
-    seller_result = await session.execute(seller_query)
-    seller_data = seller_result.fetchone()
-
-    if not seller_data:
-        raise HTTPException(status_code=404, detail=f"Seller not found with id {seller_id}")
-
-    seller_info = {
-        "id": seller_data.id,
-        "user_id": seller_data.user_id,
-        "image_url": seller_data.image_url,
-        "description": seller_data.description,
-        "cv_url": seller_data.cv_url,
-        "birth_date": seller_data.birth_date
-    }
-
-
-    skills_query = select(skills).join(seller_skills).where(seller_skills.c.seller_id == seller_id)
-    skills_result = await session.execute(skills_query)
-    skills_list = [{"id": skill.id, "skill_name": skill.skill_name} for skill in skills_result.fetchall()]
 
-
-    experience_query = select(experience).where(experience.c.seller_id == seller_id)
-    experience_result = await session.execute(experience_query)
-    experience_list = [{
-        "id": exp.id,
-        "company_name": exp.company_name,
-        "start_date": exp.start_date,
-        "end_date": exp.end_date,
-        "city": exp.city,
-        "country": exp.country,
-        "job_title": exp.job_title,
-        "description": exp.description
-    } for exp in experience_result.fetchall()]
-
-
-    certificates_query = select(certificate).where(certificate.c.seller_id == seller_id)
-    certificates_result = await session.execute(certificates_query)
-    certificates_list = [{"id": cert.id, "pdf_url": cert.pdf_url} for cert in certificates_result.fetchall()]
-
-    occupations_query = select(occupation).join(seller_occupation).where(seller_occupation.c.seller_id == seller_id)
-    occupations_result = await session.execute(occupations_query)
-    occupations_list = [{"id": occ.id, "occup_name": occ.occup_name} for occ in occupations_result.fetchall()]
-
-
-    return {
-        "seller": seller_info,
-        "skills": skills_list,
-        "experience": experience_list,
-        "certificates": certificates_list,
-        "occupations":occupations_list
-    }
+    return profile
 
 
 
@@ -972,26 +819,15 @@ async def get_seller_profile(
 @seller_router.post('/saved_clients', summary="Save a Client")
 async def save_client(
     client_id: int, 
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_seller),
     session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
     
-    user_id = token.get('user_id')
-
-    seller_result = await session.execute(select(seller.c.id).where(seller.c.user_id == user_id))
-    seller_id = seller_result.scalar()
-    if not seller_id:
-        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
-    
-    result = await session.execute(select(user).where(user.c.id == user_id))
-    user_data = result.fetchone()
+    seller_id = token['seller_id']
     
-    if not user_data:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if not user_data.is_seller:
+    if not token['is_seller']:
         raise HTTPException(status_code=403, detail="Only sellers can save clients")
 
     result = await session.execute(select(user).where(user.c.id == client_id))
@@ -1013,18 +849,13 @@ async def save_client(
 
 @seller_router.get('/saved_clients', summary="Get Saved Clients")
 async def get_saved_clients(
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_seller),
     session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
     
-    user_id = token.get('user_id')
-
-    seller_result = await session.execute(select(seller.c.id).where(seller.c.user_id == user_id))
-    seller_id = seller_result.scalar()
-    if not seller_id:
-        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
     result = await session.execute(select(saved_seller).where(saved_seller.c.seller_id == seller_id))
     saved_clients = result.fetchall()
 
@@ -1046,19 +877,14 @@ async def get_saved_clients(
 @seller_router.delete('/saved_clients/{saved_client_id}', summary="Delete Saved Client")
 async def delete_saved_client(
     saved_client_id: int,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_seller),
     session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
     
-    user_id = token.get('user_id')
 
-
-    seller_result = await session.execute(select(seller.c.id).where(seller.c.user_id == user_id))
-    seller_id = seller_result.scalar()
-    if not seller_id:
-        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
+    seller_id = token['seller_id']
     result = await session.execute(select(saved_seller).where(saved_seller.c.seller_id == seller_id, saved_seller.c.user_id == saved_client_id))
     saved_client_data = result.fetchone()
 
@@ -1081,20 +907,13 @@ async def delete_saved_client(
 @seller_router.get("/gigs/{gig_id}/apply", response_model=Dict[str, str])
 async def apply_for_gig(
     gig_id: int,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_seller),
     session: AsyncSession = Depends(get_async_session)
 ):
     if token is None:
         raise HTTPException(status_code=401, detail="Not registered")
     
-    user_id = token.get('user_id')
-
  
-    seller_result = await session.execute(select(seller.c.id).where(seller.c.user_id == user_id))
-    seller_id = seller_result.scalar_one_or_none()
-    if not seller_id:
-        raise HTTPException(status_code=404, detail=f"Seller not found for user_id {user_id}")
-
 
     result = await session.execute(select(gigs).where(gigs.c.id == gig_id))
     gig = result.fetchone()
@@ -1118,7 +937,7 @@ async def apply_for_gig(
 @router_public.get("/sellers/{occupation_name}/", summary="Get sellers by occupation name")
 async def get_sellers_by_occupation_name(
     occupation_name: str,
-    session: AsyncSession = Depends(get_async_session)
+    session: AsyncSession = Depends(get_read_session)
 ) -> Dict:
  
     occupation_query = select(occupation.c.id).where(occupation.c.occup_name.ilike(f"%{occupation_name}%"))
@@ -1129,7 +948,7 @@ async def get_sellers_by_occupation_name(
         raise HTTPException(status_code=404, detail="No occupations found with the given name")
 
 
-    seller_query = select(seller.c.id, seller.c.user_id, seller.c.image_url, seller.c.description, seller.c.cv_url, seller.c.birth_date).join(
+    seller_query = select(seller.c.id, seller.c.user_id, seller.c.image_url, seller.c.image_thumb_url, seller.c.description, seller.c.cv_url, seller.c.birth_date).join(
         seller_occupation,
         seller.c.id == seller_occupation.c.seller_id
     ).where(seller_occupation.c.occupation_id.in_(occupation_ids))
@@ -1139,6 +958,7 @@ async def get_sellers_by_occupation_name(
         "id": s.id,
         "user_id": s.user_id,
         "image_url": s.image_url,
+        "image_thumb_url": s.image_thumb_url,
         "description": s.description,
         "cv_url": s.cv_url,
         "birth_date": s.birth_date
@@ -1151,7 +971,7 @@ async def get_sellers_by_occupation_name(
 @router_public.get('/sellers_by_skill/{skil_name}', summary="Get Sellers by Skill")
 async def get_sellers_by_skill(
     skill_name: str,
-    session: AsyncSession = Depends(get_async_session)
+    session: AsyncSession = Depends(get_read_session)
 ):
 
     result = await session.execute(
@@ -1179,6 +999,7 @@ async def get_sellers_by_skill(
             "id": s.id,
             "user_id": s.user_id,
             "image_url": s.image_url,
+            "image_thumb_url": s.image_thumb_url,
             "description": s.description,
             "cv_url": s.cv_url,
             "birth_date": s.birth_date
@@ -1193,55 +1014,8 @@ async def get_seller_profile(
     seller_id:int,
     session: AsyncSession = Depends(get_async_session)
 ) -> Dict:
-    seller_query = select(seller).where(seller.c.id == seller_id)
-    seller_result = await session.execute(seller_query)
-    seller_data = seller_result.fetchone()
-
-    if not seller_data:
+    profile = await get_cached_seller_profile(session, seller_id)
+    if profile is None:
         raise HTTPException(status_code=404, detail=f"Seller not found with id {seller_id}")
 
-    seller_info = {
-        "id": seller_data.id,
-        "user_id": seller_data.user_id,
-        "image_url": seller_data.image_url,
-        "description": seller_data.description,
-        "cv_url": seller_data.cv_url,
-        "birth_date": seller_data.birth_date
-    }
-
-
-    skills_query = select(skills).join(seller_skills).where(seller_skills.c.seller_id == seller_id)
-    skills_result = await session.execute(skills_query)
-    skills_list = [{"id": skill.id, "skill_name": skill.skill_name} for skill in skills_result.fetchall()]
-
-    experience_query = select(experience).where(experience.c.seller_id == seller_id)
-    experience_result = await session.execute(experience_query)
-    experience_list = [{
-        "id": exp.id,
-        "company_name": exp.company_name,
-        "start_date": exp.start_date,
-        "end_date": exp.end_date,
-        "city": exp.city,
-        "country": exp.country,
-        "job_title": exp.job_title,
-        "description": exp.description
-    } for exp in experience_result.fetchall()]
-
-    certificates_query = select(certificate).where(certificate.c.seller_id == seller_id)
-    certificates_result = await session.execute(certificates_query)
-    certificates_list = [{"id": cert.id, "pdf_url": cert.pdf_url} for cert in certificates_result.fetchall()]
-
-    occupations_query = select(occupation).join(seller_occupation).where(seller_occupation.c.seller_id == seller_id)
-    occupations_result = await session.execute(occupations_query)
-    occupations_list = [{"id": occ.id, "occup_name": occ.occup_name} for occ in occupations_result.fetchall()]
-
-
-    return {
-        "seller": seller_info,
-        "skills": skills_list,
-        "experience": experience_list,
-        "certificates": certificates_list,
-        "occupations":occupations_list
-    }
-
-
+    return profile
@@ -0,0 +1,117 @@
+from sqlalchemy import select, func, literal_column, JSON
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import MemoryCacheBackend
+from config import PROFILE_CACHE_TTL, PROFILE_CACHE_SIZE
+from models.models import seller, skills, seller_skills, experience, certificate, occupation, seller_occupation
+
+
+EXPERIENCE_FIELDS = ('id', 'company_name', 'start_date', 'end_date', 'city', 'country', 'job_title', 'description')
+
+# Swap for any CacheBackend implementation (e.g. a Redis one) to share entries across workers.
+profile_cache = MemoryCacheBackend(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+
+
+def _json_list(table, fields, where, join=None):
+    obj = func.json_build_object(*[arg for field in fields for arg in (field, table.c[field])])
+    query = select(
+        func.coalesce(func.json_agg(aggregate_order_by(obj, table.c.id)), literal_column("'[]'::json"), type_=JSON)
+    )
+    if join is not None:
+        query = query.select_from(join)
+    return query.where(where).scalar_subquery()
+
+
+def _seller_info(row):
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "image_url": row.image_url,
+        "image_thumb_url": row.image_thumb_url,
+        "image_webp_url": row.image_webp_url,
+        "description": row.description,
+        "cv_url": row.cv_url,
+        "birth_date": row.birth_date
+    }
+
+
+async def _load_profile_postgres(session: AsyncSession, condition):
+    query = select(
+        seller,
+        _json_list(
+            skills, ('id', 'skill_name'), seller_skills.c.seller_id == seller.c.id,
+            join=skills.join(seller_skills, seller_skills.c.skill_id == skills.c.id)
+        ).label('skills_json'),
+        _json_list(experience, EXPERIENCE_FIELDS, experience.c.seller_id == seller.c.id).label('experience_json'),
+        _json_list(certificate, ('id', 'pdf_url'), certificate.c.seller_id == seller.c.id).label('certificates_json'),
+        _json_list(
+            occupation, ('id', 'occup_name'), seller_occupation.c.seller_id == seller.c.id,
+            join=occupation.join(seller_occupation, seller_occupation.c.occupation_id == occupation.c.id)
+        ).label('occupations_json')
+    ).where(condition)
+    row = (await session.execute(query)).fetchone()
+    if row is None:
+        return None
+
+    return {
+        "seller": _seller_info(row),
+        "skills": row.skills_json,
+        "experience": row.experience_json,
+        "certificates": row.certificates_json,
+        "occupations": row.occupations_json
+    }
+
+
+async def _load_profile_sequential(session: AsyncSession, condition):
+    row = (await session.execute(select(seller).where(condition))).fetchone()
+    if row is None:
+        return None
+    seller_id = row.id
+
+    skills_result = await session.execute(
+        select(skills).join(seller_skills).where(seller_skills.c.seller_id == seller_id).order_by(skills.c.id)
+    )
+    experience_result = await session.execute(
+        select(experience).where(experience.c.seller_id == seller_id).order_by(experience.c.id)
+    )
+    certificates_result = await session.execute(
+        select(certificate).where(certificate.c.seller_id == seller_id).order_by(certificate.c.id)
+    )
+    occupations_result = await session.execute(
+        select(occupation).join(seller_occupation).where(seller_occupation.c.seller_id == seller_id).order_by(occupation.c.id)
+    )
+
+    return {
+        "seller": _seller_info(row),
+        "skills": [{"id": skill.id, "skill_name": skill.skill_name} for skill in skills_result.fetchall()],
+        "experience": [{field: getattr(exp, field) for field in EXPERIENCE_FIELDS} for exp in experience_result.fetchall()],
+        "certificates": [{"id": cert.id, "pdf_url": cert.pdf_url} for cert in certificates_result.fetchall()],
+        "occupations": [{"id": occ.id, "occup_name": occ.occup_name} for occ in occupations_result.fetchall()]
+    }
+
+
+async def load_seller_profile(session: AsyncSession, seller_id: int = None, user_id: int = None):
+    condition = seller.c.id == seller_id if user_id is None else seller.c.user_id == user_id
+    if session.bind.dialect.name == 'postgresql':
+        return await _load_profile_postgres(session, condition)
+    return await _load_profile_sequential(session, condition)
+
+
+def _profile_key(seller_id):
+    return f'seller_profile:{seller_id}'
+
+
+async def get_cached_seller_profile(session: AsyncSession, seller_id: int):
+    # The cache is shared, so it must be filled from the primary: a lagging replica could
+    # re-cache a profile that an invalidation just dropped and keep serving it for a full TTL.
+    profile = await profile_cache.get(_profile_key(seller_id))
+    if profile is None:
+        profile = await load_seller_profile(session, seller_id=seller_id)
+        if profile is not None:
+            await profile_cache.set(_profile_key(seller_id), profile)
+    return profile
+
+
+async def invalidate_seller_profile(seller_id: int):
+    await profile_cache.delete(_profile_key(seller_id))
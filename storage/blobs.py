@@ -0,0 +1,145 @@
+import os
+import time
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import BLOB_GC_GRACE, BLOB_GC_BATCH_SIZE
+from database import dialect_insert
+from jobs import enqueue, job_handler
+from models.models import file_blob, gigs, gigs_file, seller, certificate, seller_projects, project_files
+from storage.utils import content_path
+from storage.images import variant_paths
+
+
+async def retain_blob(session: AsyncSession, kind: str, url: str):
+    query = dialect_insert(session)(file_blob).values(kind=kind, url=url, ref_count=1, updated_at=datetime.utcnow())
+    query = query.on_conflict_do_update(
+        index_elements=[file_blob.c.kind, file_blob.c.url],
+        set_={'ref_count': file_blob.c.ref_count + 1, 'updated_at': query.excluded.updated_at}
+    )
+    await session.execute(query)
+
+
+async def release_blobs(session: AsyncSession, kind: str, urls):
+    by_count = {}
+    for url, count in Counter(url for url in urls if url).items():
+        by_count.setdefault(count, []).append(url)
+    if by_count:
+        # One sweep per grace period picks up everything released in the meantime.
+        await enqueue(session, 'collect_garbage', delay=BLOB_GC_GRACE, dedupe_key='collect_garbage')
+    for count, grouped_urls in by_count.items():
+        await session.execute(
+            update(file_blob)
+            .where(file_blob.c.kind == kind, file_blob.c.url.in_(grouped_urls))
+            .values(ref_count=file_blob.c.ref_count - count, updated_at=datetime.utcnow())
+        )
+
+
+async def _release_selected(session: AsyncSession, kind: str, query):
+    await release_blobs(session, kind, (await session.execute(query)).scalars().all())
+
+
+async def release_gig_blobs(session: AsyncSession, condition):
+    await _release_selected(session, 'gig_file', select(gigs_file.c.file_url).join(gigs).where(condition))
+
+
+async def release_project_blobs(session: AsyncSession, condition):
+    await _release_selected(
+        session, 'project_file', select(project_files.c.file_url).join(seller_projects).where(condition)
+    )
+
+
+async def release_seller_blobs(session: AsyncSession, condition):
+    await _release_selected(session, 'image', select(seller.c.image_url).where(condition))
+    await _release_selected(session, 'cv', select(seller.c.cv_url).where(condition))
+    await _release_selected(session, 'certificate', select(certificate.c.pdf_url).join(seller).where(condition))
+    await release_project_blobs(session, seller_projects.c.seller_id.in_(select(seller.c.id).where(condition)))
+
+
+# Blob files are renamed with this prefix while their row delete is in flight.
+GC_PREFIX = '.gc-'
+
+
+def set_aside(path: str):
+    # Renaming is atomic, so an upload landing on the same path afterwards writes a new file that is
+    # left alone. The renamed file is removed only once the row delete has committed.
+    aside = os.path.join(os.path.dirname(path), GC_PREFIX + os.path.basename(path))
+    try:
+        os.replace(path, aside)
+    except FileNotFoundError:
+        return None
+    return path, aside
+
+
+def restore_files(moved):
+    for path, aside in moved:
+        try:
+            os.replace(aside, path)
+        except FileNotFoundError:
+            pass
+
+
+def unlink_file(aside: str):
+    try:
+        size = os.stat(aside).st_size
+        os.remove(aside)
+    except FileNotFoundError:
+        return 0
+    return size
+
+
+@job_handler('collect_garbage')
+async def collect_garbage(session: AsyncSession, grace: float = BLOB_GC_GRACE, batch_size: int = BLOB_GC_BATCH_SIZE):
+    stats = {"scanned": 0, "removed": 0, "skipped_recent": 0, "bytes_freed": 0}
+    # Files written within the grace period may belong to an upload whose transaction has not committed yet.
+    cutoff = time.time() - grace
+    last_id = 0
+    while True:
+        query = (
+            select(file_blob.c.id, file_blob.c.kind, file_blob.c.url)
+            .where(file_blob.c.ref_count <= 0, file_blob.c.id > last_id)
+            .order_by(file_blob.c.id)
+            .limit(batch_size)
+        )
+        if session.bind.dialect.name == 'postgresql':
+            # Held until commit, so a retain_blob for one of these rows waits and then inserts a fresh row.
+            query = query.with_for_update(skip_locked=True)
+        rows = (await session.execute(query)).fetchall()
+        if not rows:
+            await session.rollback()
+            break
+        last_id = rows[-1].id
+        # (moved original, moved variants) for every row deleted in this batch
+        garbage = []
+        try:
+            for row in rows:
+                stats["scanned"] += 1
+                original = set_aside(content_path(row.kind, row.url))
+                if original is not None and os.stat(original[1]).st_mtime > cutoff:
+                    restore_files([original])
+                    stats["skipped_recent"] += 1
+                    continue
+                variants = [moved for moved in map(set_aside, variant_paths(row.kind, row.url)) if moved is not None]
+                garbage.append((original, variants))
+                # Re-checked under the lock; on SQLite this conditional delete is the compare-and-set.
+                deleted = await session.execute(
+                    delete(file_blob).where(file_blob.c.id == row.id, file_blob.c.ref_count <= 0)
+                )
+                if not deleted.rowcount:
+                    garbage.pop()
+                    restore_files(([original] if original else []) + variants)
+            await session.commit()
+        except BaseException:
+            for original, variants in garbage:
+                restore_files(([original] if original else []) + variants)
+            raise
+        for original, variants in garbage:
+            if original is not None:
+                stats["removed"] += 1
+                stats["bytes_freed"] += unlink_file(original[1])
+            for _, aside in variants:
+                stats["bytes_freed"] += unlink_file(aside)
+    return stats
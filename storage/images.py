@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import mimetypes
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import IMAGE_WORKERS, THUMBNAIL_SIZE, WEBP_MAX_SIZE, WEBP_QUALITY
+from jobs import job_handler
+from models.models import seller, gigs_file
+from seller.utils import invalidate_seller_profile
+from storage.utils import IMAGE_TYPES, content_path
+
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> longest edge in pixels. Every variant is written as WebP.
+IMAGE_VARIANTS = {'thumb': THUMBNAIL_SIZE, 'large': WEBP_MAX_SIZE}
+
+# Upload kind -> (table, original url column, variant name -> url column)
+VARIANT_COLUMNS = {
+    'image': (seller, seller.c.image_url, {'thumb': seller.c.image_thumb_url, 'large': seller.c.image_webp_url}),
+    'gig_file': (gigs_file, gigs_file.c.file_url, {'thumb': gigs_file.c.thumb_url, 'large': gigs_file.c.webp_url})
+}
+
+image_executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+
+
+def is_image(url: str):
+    return mimetypes.guess_type(url)[0] in IMAGE_TYPES
+
+
+def variant_url(url: str, name: str):
+    return f'{os.path.splitext(url)[0]}.{name}.webp'
+
+
+def variant_paths(kind: str, url: str):
+    if kind not in VARIANT_COLUMNS:
+        return []
+    return [content_path(kind, variant_url(url, name)) for name in IMAGE_VARIANTS]
+
+
+def _render_variants(source: str, targets, quality: int):
+    # Runs in a worker process. Originals are content-addressed, so an existing variant is already correct.
+    targets = [(path, size) for path, size in targets if not os.path.exists(path)]
+    if not targets:
+        return
+    with Image.open(source) as original:
+        largest = max(size for _, size in targets)
+        # Lets the JPEG decoder downscale by a power of two instead of decoding every pixel.
+        original.draft('RGB', (largest, largest))
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA' if original.has_transparency_data else 'RGB')
+        for path, size in sorted(targets, key=lambda target: -target[1]):
+            image = original.copy()
+            image.thumbnail((size, size), Image.LANCZOS)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.variant-')
+            os.close(fd)
+            try:
+                image.save(tmp_path, 'WEBP', quality=quality)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+
+async def generate_variants(kind: str, url: str):
+    variants = {name: variant_url(url, name) for name in IMAGE_VARIANTS}
+    targets = [(content_path(kind, variants[name]), size) for name, size in IMAGE_VARIANTS.items()]
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(image_executor, _render_variants, content_path(kind, url), targets, WEBP_QUALITY)
+    return variants
+
+
+@job_handler('process_image')
+async def process_image(session: AsyncSession, kind: str, url: str):
+    if not is_image(url):
+        return
+    try:
+        variants = await generate_variants(kind, url)
+    except (OSError, Image.DecompressionBombError):
+        # Not a decodable image (or the original is gone); retrying will not change that.
+        logger.warning('Could not render variants for %s %s', kind, url, exc_info=True)
+        return
+
+    table, column, columns = VARIANT_COLUMNS[kind]
+    result = await session.execute(
+        update(table)
+        .where(column == url)
+        .values({columns[name]: value for name, value in variants.items()})
+        .returning(table.c.id)
+    )
+    ids = result.scalars().all()
+    await session.commit()
+    if table is seller:
+        for seller_id in ids:
+            await invalidate_seller_profile(seller_id)
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import select, delete, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import BLOB_GC_GRACE, REAPER_BATCH_SIZE, REAPER_QUARANTINE_DIR
+from jobs import job_handler
+from models.models import seller, gigs_file, certificate, project_files, file_blob
+from storage.blobs import set_aside, restore_files
+from storage.utils import UPLOAD_KINDS
+
+
+logger = logging.getLogger(__name__)
+
+# Upload kind -> every column that may hold a url for a file in that kind's directory.
+REFERENCE_COLUMNS = {
+    'image': (seller.c.image_url, seller.c.image_thumb_url, seller.c.image_webp_url),
+    'cv': (seller.c.cv_url,),
+    'certificate': (certificate.c.pdf_url,),
+    'project_file': (project_files.c.file_url,),
+    'gig_file': (gigs_file.c.file_url, gigs_file.c.thumb_url, gigs_file.c.webp_url)
+}
+
+# Left behind by uploads or variant renders that died before their final rename. Blob GC's '.gc-' files are
+# not among them: a rename keeps the old mtime, so one in flight would look stale and be taken from under GC.
+TEMP_PREFIXES = ('.upload-', '.variant-')
+
+
+def _scan(directory: str):
+    stack = [directory]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.startswith('.') and not entry.name.startswith(TEMP_PREFIXES):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path, entry.stat(follow_symlinks=False)
+
+
+def _batches(directory: str, batch_size: int):
+    batch = []
+    for item in _scan(directory):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _url(directory: str, path: str):
+    return '/' + os.path.relpath(path, directory).replace(os.sep, '/')
+
+
+async def _referenced(session: AsyncSession, kind: str, urls):
+    query = union_all(*[select(column.label('url')).where(column.in_(urls)) for column in REFERENCE_COLUMNS[kind]])
+    return set((await session.execute(query)).scalars().all())
+
+
+def _dispose(directory: str, aside: str, url: str, quarantine: bool):
+    if not quarantine:
+        os.remove(aside)
+        return
+    target = os.path.join(REAPER_QUARANTINE_DIR, directory) + url
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(aside, target)
+
+
+def _set_aside_stale(path: str, cutoff: float):
+    moved = set_aside(path)
+    if moved is not None and os.stat(moved[1]).st_mtime > cutoff:
+        # Re-written since the scan, e.g. by an upload of the same content that has not committed yet.
+        restore_files([moved])
+        return None
+    return moved
+
+
+async def _claim_orphans(session: AsyncSession, kind: str, orphans: dict, cutoff: float):
+    # Between the scan and now an upload may have re-created and referenced any of these files.
+    # Locking their blob rows holds off retain_blob until commit; the reference check then runs again,
+    # and each file is renamed aside so one written after this point is a new file that stays put.
+    urls = list(orphans)
+    locked = select(file_blob.c.id).where(file_blob.c.kind == kind, file_blob.c.url.in_(urls))
+    if session.bind.dialect.name == 'postgresql':
+        locked = locked.with_for_update()
+    await session.execute(locked)
+    referenced = await _referenced(session, kind, urls)
+    claimed = {}
+    try:
+        for url in urls:
+            if url in referenced:
+                continue
+            moved = await asyncio.to_thread(_set_aside_stale, orphans[url], cutoff)
+            if moved is not None:
+                claimed[url] = moved
+        if claimed:
+            # The refcount rows for these files are stale; drop them so blob GC does not trip over them.
+            await session.execute(delete(file_blob).where(file_blob.c.kind == kind, file_blob.c.url.in_(list(claimed))))
+        await session.commit()
+    except BaseException:
+        restore_files(claimed.values())
+        raise
+    return claimed
+
+
+@job_handler('reap_orphans')
+async def reap_orphans(session: AsyncSession, dry_run: bool = True, quarantine: bool = False,
+                       grace: float = BLOB_GC_GRACE, batch_size: int = REAPER_BATCH_SIZE):
+    started = time.monotonic()
+    # Files written within the grace period may belong to an upload whose transaction has not committed yet.
+    cutoff = time.time() - grace
+    stats = {"dry_run": dry_run, "quarantine": quarantine, "kinds": {}}
+    for kind, spec in UPLOAD_KINDS.items():
+        kind_stats = {"scanned": 0, "orphans": 0, "orphan_bytes": 0, "skipped_recent": 0, "disposed": 0}
+        stats["kinds"][kind] = kind_stats
+        batches = _batches(spec.directory, batch_size)
+        # Directory walking blocks, so each batch is pulled on a worker thread.
+        while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+            kind_stats["scanned"] += len(batch)
+            files = {_url(spec.directory, path): (path, stat) for path, stat in batch}
+            referenced = await _referenced(session, kind, list(files))
+            orphans = {}
+            for url, (path, stat) in files.items():
+                if url in referenced:
+                    continue
+                if stat.st_mtime > cutoff:
+                    kind_stats["skipped_recent"] += 1
+                    continue
+                kind_stats["orphans"] += 1
+                kind_stats["orphan_bytes"] += stat.st_size
+                orphans[url] = path
+            if dry_run or not orphans:
+                continue
+            claimed = await _claim_orphans(session, kind, orphans, cutoff)
+            for url, (_, aside) in claimed.items():
+                try:
+                    await asyncio.to_thread(_dispose, spec.directory, aside, url, quarantine)
+                except FileNotFoundError:
+                    continue
+                kind_stats["disposed"] += 1
+
+    elapsed = time.monotonic() - started
+    scanned = sum(kind_stats["scanned"] for kind_stats in stats["kinds"].values())
+    stats.update(
+        scanned=scanned,
+        orphans=sum(kind_stats["orphans"] for kind_stats in stats["kinds"].values()),
+        orphan_bytes=sum(kind_stats["orphan_bytes"] for kind_stats in stats["kinds"].values()),
+        disposed=sum(kind_stats["disposed"] for kind_stats in stats["kinds"].values()),
+        elapsed_s=elapsed,
+        files_per_second=scanned / elapsed if elapsed else 0.0
+    )
+    logger.info('Orphan reaper finished: %s', stats)
+    return stats
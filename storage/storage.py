@@ -0,0 +1,147 @@
+import mimetypes
+import os
+import re
+import stat as stat_mode
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request
+from starlette.responses import Response
+
+from storage.utils import UPLOAD_KINDS, UPLOAD_CHUNK_SIZE, IMAGE_TYPES
+
+
+storage_router = APIRouter(tags=["Storage API"])
+
+# A SHA-256 name, optionally followed by an image variant name (see storage.images).
+CONTENT_HASH = re.compile(r'[0-9a-f]{64}(\.[a-z]+)?')
+RANGE = re.compile(r'bytes=(\d*)-(\d*)')
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'public, no-cache'
+# Only these are rendered by the browser; anything else is forced to a download so that uploaded
+# (or legacy) HTML, SVG or script can never run on the API origin.
+INLINE_TYPES = IMAGE_TYPES | {'application/pdf'}
+
+
+class RangeFileResponse(Response):
+    def __init__(self, path: str, size: int, start: int, end: int, status_code: int, headers: dict,
+                 media_type: str, send_body: bool):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.count = end - start + 1 if size else 0
+        self.size = size
+        self.send_body = send_body
+        self.headers['content-length'] = str(self.count)
+
+    async def __call__(self, scope, receive, send):
+        await send({'type': 'http.response.start', 'status': self.status_code, 'headers': self.raw_headers})
+        if not self.send_body or not self.count:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        extensions = scope.get('extensions') or {}
+        if 'http.response.zerocopysend' in extensions:
+            with open(self.path, 'rb') as f:
+                await send({
+                    'type': 'http.response.zerocopysend',
+                    'file': f,
+                    'offset': self.start,
+                    'count': self.count
+                })
+        elif 'http.response.pathsend' in extensions and self.count == self.size:
+            await send({'type': 'http.response.pathsend', 'path': self.path})
+        else:
+            remaining = self.count
+            async with await anyio.open_file(self.path, 'rb') as f:
+                await f.seek(self.start)
+                while remaining:
+                    chunk = await f.read(min(UPLOAD_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+            if remaining:
+                await send({'type': 'http.response.body', 'body': b''})
+
+
+def _resolve(kind: str, path: str):
+    spec = UPLOAD_KINDS.get(kind)
+    if spec is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    root = os.path.realpath(spec.directory)
+    full_path = os.path.realpath(os.path.join(root, path))
+    if not full_path.startswith(root + os.sep) or os.path.basename(full_path).startswith('.'):
+        raise HTTPException(status_code=404, detail="File not found")
+    return full_path
+
+
+def _etag_matches(header: str, etag: str):
+    if header is None:
+        return False
+    if header.strip() == '*':
+        return True
+    return etag.removeprefix('W/') in [tag.strip().removeprefix('W/') for tag in header.split(',')]
+
+
+def _byte_range(header: str, size: int):
+    match = RANGE.fullmatch(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={'Content-Range': f'bytes */{size}'})
+    return start, end
+
+
+@storage_router.api_route('/{kind}/{path:path}', methods=['GET', 'HEAD'], summary="Download an uploaded file")
+async def get_file(kind: str, path: str, request: Request):
+    full_path = _resolve(kind, path)
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=404, detail="File not found")
+    if not stat_mode.S_ISREG(stat.st_mode):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    stem = os.path.splitext(os.path.basename(full_path))[0]
+    if CONTENT_HASH.fullmatch(stem):
+        # Content-addressed: the bytes behind this name never change.
+        etag, cache_control = f'"{stem}"', IMMUTABLE_CACHE
+    else:
+        etag, cache_control = f'W/"{stat.st_mtime_ns:x}-{stat.st_size:x}"', REVALIDATE_CACHE
+
+    headers = {
+        'etag': etag,
+        'cache-control': cache_control,
+        'accept-ranges': 'bytes',
+        'x-content-type-options': 'nosniff'
+    }
+    if _etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+
+    size = stat.st_size
+    start, end, status_code = 0, size - 1, 200
+    range_header = request.headers.get('range')
+    if_range = request.headers.get('if-range')
+    if range_header and size and (if_range is None or if_range.strip() == etag):
+        byte_range = _byte_range(range_header, size)
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers['content-range'] = f'bytes {start}-{end}/{size}'
+
+    media_type = mimetypes.guess_type(full_path)[0]
+    if media_type not in INLINE_TYPES:
+        media_type = 'application/octet-stream'
+        headers['content-disposition'] = 'attachment'
+    return RangeFileResponse(
+        full_path, size, start, end, status_code, headers, media_type,
+        send_body=request.method != 'HEAD'
+    )
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+
+import aiofiles
+from fastapi import HTTPException, UploadFile
+
+from config import IMAGE_UPLOAD_MAX_SIZE, CV_UPLOAD_MAX_SIZE, CERTIFICATE_UPLOAD_MAX_SIZE
+from config import PROJECT_FILE_UPLOAD_MAX_SIZE, GIG_FILE_UPLOAD_MAX_SIZE
+
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+IMAGE_TYPES = {'image/jpeg', 'image/png', 'image/webp', 'image/gif'}
+DOCUMENT_TYPES = {
+    'application/pdf',
+    'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+}
+
+UploadKind = namedtuple('UploadKind', ['directory', 'max_size', 'mime_types'])
+
+# mime_types=None accepts any content type.
+UPLOAD_KINDS = {
+    'image': UploadKind('image_file', IMAGE_UPLOAD_MAX_SIZE, IMAGE_TYPES),
+    'cv': UploadKind('cv_file', CV_UPLOAD_MAX_SIZE, DOCUMENT_TYPES | IMAGE_TYPES),
+    'certificate': UploadKind('certificate_file', CERTIFICATE_UPLOAD_MAX_SIZE, {'application/pdf'} | IMAGE_TYPES),
+    'project_file': UploadKind('project_file', PROJECT_FILE_UPLOAD_MAX_SIZE, None),
+    'gig_file': UploadKind('gig_file', GIG_FILE_UPLOAD_MAX_SIZE, None)
+}
+
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF-', 'application/pdf')
+)
+SNIFFABLE_TYPES = {mime for _, mime in SIGNATURES} | {'image/webp'}
+
+# Stored extensions come from the validated content type, never from the client's filename:
+# identical bytes always map to one blob, and nothing can be stored as .html or .svg.
+EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'application/pdf': '.pdf',
+    'application/msword': '.doc',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': '.docx'
+}
+UNKNOWN_EXTENSION = '.bin'
+
+
+def sniff_mime(head: bytes):
+    for signature, mime in SIGNATURES:
+        if head.startswith(signature):
+            return mime
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def _check_mime(kind: UploadKind, head: bytes, declared: str):
+    sniffed = sniff_mime(head)
+    if kind.mime_types is None:
+        # Any content is accepted, so the declared type proves nothing.
+        return sniffed
+    mime = sniffed or declared
+    # A declared type we know the signature of must actually match it.
+    if mime not in kind.mime_types or (sniffed is None and declared in SNIFFABLE_TYPES):
+        raise HTTPException(status_code=415, detail=f'Unsupported file type: {mime}')
+    return mime
+
+
+def _extension(mime: str):
+    return EXTENSIONS.get(mime, UNKNOWN_EXTENSION)
+
+
+def content_path(kind: str, url: str):
+    return UPLOAD_KINDS[kind].directory + url
+
+
+async def save_upload(file_upload: UploadFile, kind: str) -> str:
+    spec = UPLOAD_KINDS[kind]
+    os.makedirs(spec.directory, exist_ok=True)
+    # Temp file lives in the destination directory so the final rename stays on one filesystem.
+    fd, tmp_path = tempfile.mkstemp(dir=spec.directory, prefix='.upload-')
+    os.close(fd)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        chunk = await file_upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            raise HTTPException(status_code=400, detail='File is empty')
+        # Only the head carries a signature; unrecognised content must not be re-sniffed on every chunk.
+        mime = _check_mime(spec, chunk, file_upload.content_type)
+        async with aiofiles.open(tmp_path, 'wb') as f:
+            while chunk:
+                size += len(chunk)
+                if size > spec.max_size:
+                    raise HTTPException(status_code=413, detail=f'File is larger than {spec.max_size} bytes')
+                digest.update(chunk)
+                await f.write(chunk)
+                chunk = await file_upload.read(UPLOAD_CHUNK_SIZE)
+
+        name = digest.hexdigest()
+        url = f'/{name[:2]}/{name[2:4]}/{name}{_extension(mime)}'
+        path = content_path(kind, url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return url
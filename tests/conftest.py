@@ -0,0 +1,80 @@
+import asyncio
+import os
+
+import pytest
+
+# config reads these at import time; the app-level tests below run against SQLite instead.
+for name, value in (('DB_NAME', 'test'), ('DB_USER', 'test'), ('DB_PASSWORD', 'test'), ('DB_HOST', 'localhost'),
+                    ('DB_PORT', '5432'), ('SECRET', 'test-secret-' + 'x' * 32), ('REGISTER_RATE_LIMIT_IP', '1000/60'),
+                    ('LOGIN_RATE_LIMIT_USERNAME', '1000/60')):
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def session_maker(tmp_path):
+    pytest.importorskip('aiosqlite')
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+    from sqlalchemy.pool import NullPool
+    from models.models import metadata
+
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "test.db"}', poolclass=NullPool)
+
+    async def create_schema():
+        async with engine.begin() as connection:
+            await connection.run_sync(metadata.create_all)
+
+    asyncio.run(create_schema())
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=True)
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def client(session_maker, tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import database
+    from main import app
+    from admin.utils import reference_cache
+    from auth.utils import token_cache, current_user_cache, revoked_tokens, claims_versions
+    from client import search
+    from seller.utils import profile_cache
+
+    async def get_session():
+        async with session_maker() as session:
+            yield session
+
+    # Uploads land in per-kind directories relative to the working directory.
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(search, '_fallback_loaded', False)
+    search.fallback_index.clear()
+    token_cache.clear()
+    revoked_tokens.clear()
+    claims_versions.clear()
+    asyncio.run(current_user_cache.clear())
+    asyncio.run(profile_cache.clear())
+    monkeypatch.setattr(reference_cache, '_entries', {})
+    app.dependency_overrides[database.get_async_session] = get_session
+    app.dependency_overrides[database.get_read_session] = get_session
+    # Not used as a context manager, so the lifespan (and with it the job workers) never starts.
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def register(client):
+    def register(name, is_seller=False, **fields):
+        data = dict(
+            first_name='First', last_name='Last', email=f'{name}@example.com', username=name,
+            password1='secret', password2='secret', is_seller=is_seller, is_client=True,
+            telegram_username=f'@{name}', phone_number=f'+99890{abs(hash(name)) % 10 ** 7:07d}'
+        )
+        data.update(fields)
+        return client.post('/auth/register', json=data)
+    return register
+
+
+@pytest.fixture
+def login(client):
+    def login(username):
+        tokens = client.post('/auth/login', json={'username': username, 'password': 'secret'}).json()
+        return {'Authorization': f'Bearer {tokens["access"]}'}
+    return login
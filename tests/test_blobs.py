@@ -0,0 +1,99 @@
+import asyncio
+import os
+import sqlite3
+import time
+
+from sqlalchemy import select
+
+from models.models import file_blob, job
+from storage import blobs
+from storage.blobs import retain_blob, release_blobs, collect_garbage
+from storage.images import variant_paths
+from storage.utils import content_path
+
+
+def write_file(path, age=0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'data')
+    os.utime(path, (time.time() - age,) * 2)
+    return path
+
+
+async def blob_rows(session_maker):
+    async with session_maker() as session:
+        return [tuple(row) for row in (await session.execute(select(file_blob.c.url, file_blob.c.ref_count))).fetchall()]
+
+
+def test_refcount_drops_to_zero_and_queues_one_gc(session_maker):
+    async def run():
+        async with session_maker() as session:
+            await retain_blob(session, 'image', '/a.png')
+            await retain_blob(session, 'image', '/a.png')
+            await session.commit()
+        counts = []
+        for _ in range(2):
+            async with session_maker() as session:
+                await release_blobs(session, 'image', ['/a.png'])
+                await session.commit()
+            counts.append((await blob_rows(session_maker))[0][1])
+        async with session_maker() as session:
+            queued = (await session.execute(select(job.c.name))).scalars().all()
+        return counts, queued
+
+    assert asyncio.run(run()) == ([1, 0], ['collect_garbage'])
+
+
+def test_gc_removes_unreferenced_files_with_their_variants(session_maker, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    original = write_file(content_path('image', '/a.png'), age=100)
+    variants = [write_file(path, age=100) for path in variant_paths('image', '/a.png')]
+    kept = write_file(content_path('image', '/b.png'), age=100)
+
+    async def run():
+        async with session_maker() as session:
+            await session.execute(file_blob.insert(), [
+                dict(kind='image', url='/a.png', ref_count=0), dict(kind='image', url='/b.png', ref_count=1)
+            ])
+            await session.commit()
+        async with session_maker() as session:
+            stats = await collect_garbage(session, grace=10)
+        return stats, await blob_rows(session_maker)
+
+    stats, remaining = asyncio.run(run())
+    assert (stats['removed'], stats['skipped_recent']) == (1, 0)
+    assert remaining == [('/b.png', 1)]
+    assert not any(os.path.exists(path) for path in [original] + variants)
+    assert os.path.exists(kept)
+    assert not [name for name in os.listdir(os.path.dirname(original)) if name.startswith(blobs.GC_PREFIX)]
+
+
+def test_gc_restores_recent_and_re_retained_files(session_maker, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    recent = write_file(content_path('image', '/recent.png'))
+    retained = write_file(content_path('image', '/retained.png'), age=100)
+    set_aside = blobs.set_aside
+
+    def set_aside_while_an_upload_retains(path):
+        # Another connection references the file again after GC selected its row but before the delete.
+        if path == retained:
+            with sqlite3.connect(tmp_path / 'test.db') as connection:
+                connection.execute("UPDATE file_blob SET ref_count = 1 WHERE url = '/retained.png'")
+        return set_aside(path)
+
+    monkeypatch.setattr(blobs, 'set_aside', set_aside_while_an_upload_retains)
+
+    async def run():
+        async with session_maker() as session:
+            await session.execute(file_blob.insert(), [
+                dict(kind='image', url='/recent.png', ref_count=0), dict(kind='image', url='/retained.png', ref_count=0)
+            ])
+            await session.commit()
+        async with session_maker() as session:
+            stats = await collect_garbage(session, grace=10)
+        return stats, sorted(await blob_rows(session_maker))
+
+    stats, remaining = asyncio.run(run())
+    assert (stats['scanned'], stats['removed'], stats['skipped_recent']) == (2, 0, 1)
+    assert remaining == [('/recent.png', 0), ('/retained.png', 1)]
+    assert os.path.exists(recent) and os.path.exists(retained)
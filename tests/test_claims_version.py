@@ -0,0 +1,73 @@
+import asyncio
+
+from sqlalchemy import update
+
+from auth import utils
+from models.models import user
+
+
+def test_bump_outdates_tokens_in_this_worker_on_commit(client, register, login, session_maker):
+    register('owner')
+    headers = login('owner')
+    assert client.get('/auth/get_current_user', headers=headers).status_code == 200
+    user_id = utils.decode_token(headers['Authorization'][7:])['user_id']
+
+    async def bump(commit):
+        async with session_maker() as session:
+            await utils.bump_claims_version(session, user_id)
+            if commit:
+                await session.commit()
+
+    asyncio.run(bump(commit=False))
+    assert client.get('/auth/get_current_user', headers=headers).status_code == 200
+    asyncio.run(bump(commit=True))
+    response = client.get('/auth/get_current_user', headers=headers)
+    assert response.status_code == 401
+    assert response.json()['detail'] == 'Token is outdated, log in again'
+
+
+def test_other_workers_bumps_are_seen_once_the_version_expires(client, register, login, session_maker):
+    register('owner')
+    headers = login('owner')
+    assert client.get('/auth/get_current_user', headers=headers).status_code == 200
+    user_id = utils.decode_token(headers['Authorization'][7:])['user_id']
+
+    async def bump_elsewhere():
+        async with session_maker() as session:
+            await session.execute(update(user).where(user.c.id == user_id).values(claims_version=user.c.claims_version + 1))
+            await session.commit()
+
+    asyncio.run(bump_elsewhere())
+    assert client.get('/auth/get_current_user', headers=headers).status_code == 200
+    utils.claims_versions.delete(user_id)
+    assert client.get('/auth/get_current_user', headers=headers).status_code == 401
+
+
+def test_deleting_a_user_drops_their_cached_version(client, register, login):
+    register('admin')
+    register('owner')
+    headers = login('owner')
+    assert client.get('/auth/get_current_user', headers=headers).status_code == 200
+    user_id = utils.decode_token(headers['Authorization'][7:])['user_id']
+
+    assert client.delete(f'/superuser/user/{user_id}', headers=login('admin')).status_code == 200
+    response = client.get('/auth/get_current_user', headers=headers)
+    assert response.status_code == 401
+    assert response.json()['detail'] == 'User not found'
+
+
+def test_bump_drops_the_cached_current_user(client, register, login, session_maker):
+    register('owner')
+    headers = login('owner')
+    assert client.get('/auth/get_current_user', headers=headers).status_code == 200
+    user_id = utils.decode_token(headers['Authorization'][7:])['user_id']
+
+    async def bump():
+        assert await utils.current_user_cache.get(user_id) is not None
+        async with session_maker() as session:
+            await utils.bump_claims_version(session, user_id)
+            await session.commit()
+        await asyncio.sleep(0)
+        return await utils.current_user_cache.get(user_id)
+
+    assert asyncio.run(bump()) is None
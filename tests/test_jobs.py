@@ -0,0 +1,122 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+import jobs
+from jobs import JobQueue, enqueue
+from models.models import job
+
+
+def queue(session_maker, **options):
+    settings = dict(workers=1, poll_interval=0.05, max_attempts=3, backoff=10, backoff_max=25, lock_timeout=60)
+    settings.update(options)
+    return JobQueue(session_maker, **settings)
+
+
+async def rows(session_maker):
+    async with session_maker() as session:
+        return (await session.execute(select(job).order_by(job.c.id))).fetchall()
+
+
+async def claim(jobs_queue):
+    async with jobs_queue.session_maker() as session:
+        return await jobs_queue._claim(session)
+
+
+def test_dedupe_key_collapses_pending_jobs_until_one_is_claimed(session_maker):
+    async def run():
+        async with session_maker() as session:
+            await enqueue(session, 'reindex', dedupe_key='reindex')
+            await enqueue(session, 'reindex', dedupe_key='reindex')
+            await session.commit()
+        assert len(await rows(session_maker)) == 1
+
+        assert (await claim(queue(session_maker))).name == 'reindex'
+        async with session_maker() as session:
+            await enqueue(session, 'reindex', dedupe_key='reindex')
+            await session.commit()
+        return [(row.status, row.dedupe_key) for row in await rows(session_maker)]
+
+    assert asyncio.run(run()) == [('running', None), ('pending', 'reindex')]
+
+
+def test_claim_takes_due_jobs_once_and_reclaims_expired_locks(session_maker):
+    async def run():
+        jobs_queue = queue(session_maker, lock_timeout=60)
+        async with session_maker() as session:
+            await enqueue(session, 'later', delay=60)
+            await enqueue(session, 'now', value=1)
+            await session.commit()
+
+        claimed = await claim(jobs_queue)
+        assert (claimed.name, claimed.payload, claimed.attempts) == ('now', {'value': 1}, 1)
+        assert await claim(jobs_queue) is None
+
+        # A worker that died mid-job stops refreshing locked_at; after lock_timeout the job is up for grabs again.
+        async with session_maker() as session:
+            await session.execute(update(job).where(job.c.id == claimed.id).values(
+                locked_at=datetime.utcnow() - timedelta(seconds=61)
+            ))
+            await session.commit()
+        reclaimed = await claim(jobs_queue)
+        assert (reclaimed.id, reclaimed.attempts) == (claimed.id, 2)
+
+    asyncio.run(run())
+
+
+def test_heartbeat_keeps_a_long_job_from_being_reclaimed(session_maker, monkeypatch):
+    started = []
+
+    async def slow(session):
+        started.append(datetime.utcnow())
+        await asyncio.sleep(0.6)
+
+    monkeypatch.setitem(jobs.job_handlers, 'slow', slow)
+
+    async def run():
+        jobs_queue = queue(session_maker, lock_timeout=0.3)
+        async with session_maker() as session:
+            await enqueue(session, 'slow')
+            await session.commit()
+        claimed = await claim(jobs_queue)
+        running = asyncio.create_task(jobs_queue._run(claimed))
+        await asyncio.sleep(0.45)
+        # Well past lock_timeout since the claim, but the heartbeat has refreshed the lock meanwhile.
+        assert await claim(jobs_queue) is None
+        await running
+        return jobs_queue.completed, await rows(session_maker)
+
+    assert asyncio.run(run()) == (1, [])
+    assert len(started) == 1
+
+
+def test_failed_job_backs_off_then_gives_up(session_maker, monkeypatch):
+    async def broken(session):
+        raise RuntimeError('boom')
+
+    monkeypatch.setitem(jobs.job_handlers, 'broken', broken)
+    monkeypatch.setattr(jobs.random, 'uniform', lambda low, high: high)
+
+    async def run():
+        jobs_queue = queue(session_maker, max_attempts=3, backoff=10, backoff_max=25)
+        async with session_maker() as session:
+            await enqueue(session, 'broken')
+            await session.commit()
+        delays = []
+        for _ in range(3):
+            async with session_maker() as session:
+                await session.execute(update(job).values(run_at=datetime.utcnow()))
+                await session.commit()
+            before = datetime.utcnow()
+            await jobs_queue._run(await claim(jobs_queue))
+            row = (await rows(session_maker))[0]
+            if row.status == 'pending':
+                delays.append(round((row.run_at - before).total_seconds()))
+        return delays, row, jobs_queue
+
+    delays, row, jobs_queue = asyncio.run(run())
+    # backoff * 2 ** (attempt - 1), capped at backoff_max.
+    assert delays == [10, 20]
+    assert (row.status, row.attempts, row.last_error) == ('failed', 3, "RuntimeError('boom')")
+    assert (jobs_queue.retried, jobs_queue.failed) == (2, 1)
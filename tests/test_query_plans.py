@@ -0,0 +1,77 @@
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from models.models import metadata, user, seller, gigs, gigs_file, gigs_tags, gigs_category, certificate, \
+    project_files, seller_projects, experience, saved_client, saved_seller, skills, occupation, seller_skills, \
+    seller_occupation, gig_tag_association, gig_search_index
+
+
+# Plans are only meaningful on Postgres, e.g. TEST_DATABASE_URL=postgresql+asyncpg://postgres@localhost/plans
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL is not set')
+
+# The search index needs pg_trgm and is not part of these lookups.
+TABLES = [table for table in metadata.sorted_tables if table is not gig_search_index]
+
+# Lookups the handlers, the reaper and the variant renderer run on every request or batch.
+LOOKUPS = [
+    select(gigs.c.id).where(gigs.c.user_id == 1),
+    select(gigs.c.id).where(gigs.c.category_id == 1),
+    select(gigs_file.c.id).where(gigs_file.c.gigs_id == 1),
+    select(gigs_file.c.id).where(gigs_file.c.file_url == 'x'),
+    select(gigs_file.c.id).where(gigs_file.c.thumb_url == 'x'),
+    select(gigs_file.c.id).where(gigs_file.c.webp_url == 'x'),
+    select(seller.c.id).where(seller.c.user_id == 1),
+    select(seller.c.id).where(seller.c.image_url == 'x'),
+    select(seller.c.id).where(seller.c.image_thumb_url == 'x'),
+    select(seller.c.id).where(seller.c.image_webp_url == 'x'),
+    select(seller.c.id).where(seller.c.cv_url == 'x'),
+    select(user.c.id).where(user.c.email == 'x'),
+    select(user.c.id).where(user.c.username == 'x'),
+    select(gigs_tags.c.id).where(gigs_tags.c.tag_name == 'x'),
+    select(gigs_category.c.id).where(gigs_category.c.category_name == 'x'),
+    select(skills.c.id).where(skills.c.skill_name == 'x'),
+    select(occupation.c.id).where(occupation.c.occup_name == 'x'),
+    select(seller_skills.c.seller_id).where(seller_skills.c.skill_id == 1),
+    select(seller_occupation.c.seller_id).where(seller_occupation.c.occupation_id == 1),
+    select(gig_tag_association.c.gig_id).where(gig_tag_association.c.tag_id == 1),
+    select(certificate.c.id).where(certificate.c.seller_id == 1),
+    select(certificate.c.id).where(certificate.c.pdf_url == 'x'),
+    select(project_files.c.id).where(project_files.c.seller_project_id == 1),
+    select(project_files.c.id).where(project_files.c.file_url == 'x'),
+    select(seller_projects.c.id).where(seller_projects.c.seller_id == 1),
+    select(experience.c.id).where(experience.c.seller_id == 1),
+    select(saved_client.c.id).where(saved_client.c.seller_id == 1),
+    select(saved_client.c.id).where(saved_client.c.user_id == 1),
+    select(saved_seller.c.id).where(saved_seller.c.seller_id == 1),
+    select(saved_seller.c.id).where(saved_seller.c.user_id == 1),
+]
+
+
+async def _plans():
+    engine = create_async_engine(TEST_DATABASE_URL)
+    plans = []
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(metadata.drop_all, tables=TABLES)
+            await connection.run_sync(metadata.create_all, tables=TABLES)
+            # Empty tables make a sequential scan the cheapest plan; this asks whether an index exists at all.
+            await connection.execute(text('SET LOCAL enable_seqscan = off'))
+            for query in LOOKUPS:
+                compiled = query.compile(engine, compile_kwargs={'literal_binds': True})
+                result = await connection.execute(text(f'EXPLAIN {compiled}'))
+                plans.append((str(compiled), '\n'.join(result.scalars().all())))
+            await connection.run_sync(metadata.drop_all, tables=TABLES)
+    finally:
+        await engine.dispose()
+    return plans
+
+
+def test_lookups_use_an_index():
+    unindexed = [query for query, plan in asyncio.run(_plans()) if 'Seq Scan' in plan]
+    assert not unindexed, 'Sequential scan for:\n' + '\n'.join(unindexed)
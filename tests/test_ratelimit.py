@@ -0,0 +1,93 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+from starlette.responses import JSONResponse
+
+import ratelimit
+from ratelimit import MemoryRateLimitBackend, RateLimiter, RateLimitMiddleware, RateLimitRule, Rate
+
+
+def frozen_clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(ratelimit, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_burst_up_to_capacity_then_wait(monkeypatch):
+    frozen_clock(monkeypatch)
+    backend = MemoryRateLimitBackend(maxsize=10)
+    rate = Rate(capacity=3, period=60)
+
+    async def consume(times):
+        return [await backend.consume('key', rate) for _ in range(times)]
+
+    waits = asyncio.run(consume(4))
+    assert waits[:3] == [0, 0, 0]
+    assert waits[3] == 20
+
+
+def test_tokens_refill_continuously(monkeypatch):
+    clock = frozen_clock(monkeypatch)
+    backend = MemoryRateLimitBackend(maxsize=10)
+    rate = Rate(capacity=2, period=10)
+
+    async def consume():
+        return await backend.consume('key', rate)
+
+    assert [asyncio.run(consume()) for _ in range(2)] == [0, 0]
+    assert asyncio.run(consume()) == 5
+    clock.now += 2.5
+    # Half a token has come back since the refused request, so half a refill period remains.
+    assert asyncio.run(consume()) == 2.5
+    clock.now += 5
+    assert asyncio.run(consume()) == 0
+    clock.now += 60
+    # Idle time never banks more than capacity.
+    assert [asyncio.run(consume()) for _ in range(3)] == [0, 0, 5]
+
+
+def app_with_limit(rule):
+    received = []
+
+    async def app(scope, receive, send):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        received.append(body)
+        await JSONResponse({'size': len(body)})(scope, receive, send)
+
+    limiter = RateLimiter(MemoryRateLimitBackend(maxsize=10), {'/login': rule})
+    return TestClient(RateLimitMiddleware(app, limiter)), limiter, received
+
+
+def test_exhausted_bucket_answers_429_with_retry_after(monkeypatch):
+    frozen_clock(monkeypatch)
+    client, limiter, _ = app_with_limit(RateLimitRule(None, Rate(capacity=2, period=90)))
+
+    for _ in range(2):
+        assert client.post('/login', json={'username': 'Bob'}).status_code == 200
+    response = client.post('/login', json={'username': 'bob'})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '45'
+    assert client.post('/login', json={'username': 'alice'}).status_code == 200
+    assert limiter.shed == {'/login': {'ip': 0, 'username': 1}}
+
+
+def test_oversized_body_is_passed_through_unparsed(monkeypatch):
+    frozen_clock(monkeypatch)
+    client, limiter, received = app_with_limit(RateLimitRule(None, Rate(capacity=1, period=60)))
+    body = json.dumps({'username': 'bob', 'padding': 'x' * ratelimit.MAX_BUFFERED_BODY}).encode()
+
+    def chunks():
+        for start in range(0, len(body), 4096):
+            yield body[start:start + 4096]
+
+    for _ in range(2):
+        assert client.post('/login', content=chunks()).json() == {'size': len(body)}
+    assert received == [body, body]
+    assert limiter.shed == {}
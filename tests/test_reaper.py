@@ -0,0 +1,69 @@
+import asyncio
+import os
+import time
+
+from models.models import certificate
+from storage import reaper
+from storage.reaper import reap_orphans
+from storage.utils import content_path
+
+
+def write_file(path, age=100):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'data')
+    os.utime(path, (time.time() - age,) * 2)
+    return path
+
+
+def reap(session_maker, **options):
+    async def run():
+        async with session_maker() as session:
+            await session.execute(certificate.insert().values(pdf_url='/kept.pdf'))
+            await session.commit()
+        async with session_maker() as session:
+            return await reap_orphans(session, grace=10, **options)
+    return asyncio.run(run())
+
+
+def test_reaper_removes_only_stale_unreferenced_files(session_maker, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    kept = write_file(content_path('certificate', '/kept.pdf'))
+    orphan = write_file(content_path('certificate', '/orphan.pdf'))
+    recent = write_file(content_path('certificate', '/recent.pdf'), age=0)
+    dead_upload = write_file(content_path('certificate', '/.upload-x1y2'))
+    # Set aside by a blob GC run that is still deciding whether to unlink or restore it.
+    in_gc = write_file(content_path('certificate', '/.gc-collected.pdf'))
+
+    stats = reap(session_maker, dry_run=False)
+    assert stats['kinds']['certificate'] == {
+        'scanned': 4, 'orphans': 2, 'orphan_bytes': 8, 'skipped_recent': 1, 'disposed': 2
+    }
+    assert [os.path.exists(path) for path in (kept, orphan, recent, dead_upload, in_gc)] == [True, False, True, False, True]
+
+
+def test_dry_run_touches_nothing(session_maker, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    orphan = write_file(content_path('certificate', '/orphan.pdf'))
+
+    stats = reap(session_maker, dry_run=True)
+    assert (stats['orphans'], stats['disposed']) == (1, 0)
+    assert os.path.exists(orphan)
+
+
+def test_file_referenced_after_the_scan_is_kept(session_maker, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    orphan = write_file(content_path('certificate', '/orphan.pdf'))
+    claim_orphans = reaper._claim_orphans
+
+    async def upload_commits_first(session, kind, orphans, cutoff):
+        # An upload of the same content commits its reference between the scan and the claim.
+        await session.execute(certificate.insert().values(pdf_url='/orphan.pdf'))
+        await session.commit()
+        return await claim_orphans(session, kind, orphans, cutoff)
+
+    monkeypatch.setattr(reaper, '_claim_orphans', upload_commits_first)
+    stats = reap(session_maker, dry_run=False)
+    assert (stats['orphans'], stats['disposed']) == (1, 0)
+    assert os.path.exists(orphan)
+    assert not [name for name in os.listdir(os.path.dirname(orphan)) if name.startswith('.gc-')]
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import statistics
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select, event, insert
+from sqlalchemy.exc import IntegrityError
+
+from auth.auth import unique_violation_detail
+from models.models import metadata, gig_search_index, user, seller
+
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+
+def _users(session_maker):
+    async def load():
+        async with session_maker() as session:
+            query = select(user.c.username, user.c.is_superuser, seller.c.id.label('seller_id')).select_from(
+                user.outerjoin(seller, seller.c.user_id == user.c.id)
+            ).order_by(user.c.id)
+            return [tuple(row) for row in (await session.execute(query)).fetchall()]
+    return asyncio.run(load())
+
+
+def test_first_user_is_superuser_and_seller_row_is_created_with_the_user(client, register, session_maker):
+    assert register('first', is_seller=True).status_code == 200
+    assert register('second').status_code == 200
+    assert _users(session_maker) == [('first', True, 1), ('second', False, None)]
+
+
+def test_register_checks_uniqueness_in_one_statement(client, register, session_maker):
+    register('first')
+    statements = []
+    event.listen(session_maker.kw['bind'].sync_engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    assert register('second', is_seller=True).status_code == 200
+
+    selects = [statement for statement in statements if statement.lstrip().upper().startswith('SELECT')]
+    assert len(selects) == 1
+    assert selects[0].count('EXISTS') == 5
+    assert [statement.split()[:3] for statement in statements if statement not in selects] == [
+        ['INSERT', 'INTO', 'user'], ['INSERT', 'INTO', 'seller']
+    ]
+
+
+@pytest.mark.parametrize('field, value, detail', [
+    ('username', 'taken', 'Username already in use'),
+    ('email', 'taken@example.com', 'Email already in use'),
+    ('telegram_username', '@taken', 'Telegram username in use'),
+    ('phone_number', '+998900000000', 'Phone already in use'),
+])
+def test_duplicate_fields_are_rejected(client, register, session_maker, field, value, detail):
+    register('taken', phone_number='+998900000000')
+    response = register('other', **{field: value})
+    assert response.status_code == 400
+    assert response.json()['detail'] == detail
+    assert len(_users(session_maker)) == 1
+
+
+def _integrity_error(orig):
+    return IntegrityError('INSERT INTO "user" ...', {}, orig)
+
+
+def test_unique_violation_detail_reads_the_constraint_name():
+    # psycopg style: the constraint is on the DBAPI error itself.
+    psycopg_error = SimpleNamespace(diag=SimpleNamespace(constraint_name='user_telegram_username_key'))
+    assert unique_violation_detail(_integrity_error(psycopg_error)) == 'Telegram username in use'
+
+    # asyncpg style: SQLAlchemy's adapted error is raised from the driver's, which carries the name.
+    driver_error = Exception('duplicate key value violates unique constraint')
+    driver_error.constraint_name = 'user_username_key'
+    asyncpg_error = Exception(str(driver_error))
+    asyncpg_error.__cause__ = driver_error
+    assert unique_violation_detail(_integrity_error(asyncpg_error)) == 'Username already in use'
+
+    # A message that merely mentions a column no longer decides the answer.
+    unnamed_error = Exception('UNIQUE constraint failed: user.telegram_username')
+    assert unique_violation_detail(_integrity_error(unnamed_error)) == 'Account already exists'
+
+
+async def _check_timings(users=5000, rounds=200):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    # The checks register ran before and after they were folded into one statement, against a populated table.
+    def separate_checks(n):
+        return [select(user).where(user.c.username == f'new{n}'), select(user).where(user.c.email == f'new{n}@example.com'),
+                select(user).where(user.c.telegram_username == f'@new{n}'), select(user).where(user.c.phone_number == f'+{n}')]
+
+    def combined_check(n):
+        return select(
+            select(user.c.id).where(user.c.username == f'new{n}').exists(),
+            select(user.c.id).where(user.c.email == f'new{n}@example.com').exists(),
+            select(user.c.id).where(user.c.telegram_username == f'@new{n}').exists(),
+            select(user.c.id).where(user.c.phone_number == f'+{n}').exists(),
+            select(user.c.id).exists()
+        )
+
+    async def before(connection, n):
+        for query in separate_checks(n):
+            (await connection.execute(query)).first()
+        len((await connection.execute(select(user))).fetchall())
+
+    async def after(connection, n):
+        (await connection.execute(combined_check(n))).one()
+
+    tables = [table for table in metadata.sorted_tables if table is not gig_search_index]
+    engine = create_async_engine(TEST_DATABASE_URL)
+    results = {}
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(metadata.drop_all, tables=tables)
+            await connection.run_sync(metadata.create_all, tables=tables)
+            await connection.execute(insert(user), [
+                dict(username=f'user{n}', email=f'user{n}@example.com', password='x', telegram_username=f'@user{n}',
+                     phone_number=f'+{n}0') for n in range(users)
+            ])
+        async with engine.connect() as connection:
+            for name, check in (('before', before), ('after', after)):
+                timings = []
+                for n in range(rounds):
+                    started = time.perf_counter()
+                    await check(connection, n)
+                    timings.append(time.perf_counter() - started)
+                quantiles = statistics.quantiles(timings, n=100)
+                results[name] = (quantiles[49], quantiles[98], rounds / sum(timings))
+        async with engine.begin() as connection:
+            await connection.run_sync(metadata.drop_all, tables=tables)
+    finally:
+        await engine.dispose()
+    return results
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL is not set')
+def test_postgres_combined_check_beats_the_separate_queries():
+    results = asyncio.run(_check_timings())
+    for name, (p50, p99, throughput) in results.items():
+        print('register checks %s: p50 %.2f ms, p99 %.2f ms, %.0f checks/s' % (name, p50 * 1e3, p99 * 1e3, throughput))
+    assert results['after'][0] < results['before'][0]
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+import database
+from cache import TTLCache
+from main import app
+from models.models import metadata, gigs
+
+
+@pytest.fixture
+def replica(client, session_maker, tmp_path, monkeypatch):
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+    from sqlalchemy.pool import NullPool
+
+    # The replica is a second SQLite database that never receives the primary's writes, i.e. one lagging forever.
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "replica.db"}', poolclass=NullPool)
+
+    async def create_schema():
+        async with engine.begin() as connection:
+            await connection.run_sync(metadata.create_all)
+
+    asyncio.run(create_schema())
+    monitor = database.ReplicaMonitor(max_lag=5, interval=0)
+    monkeypatch.setattr(database, 'async_session_maker', session_maker)
+    monkeypatch.setattr(database, 'replica_engine', engine)
+    monkeypatch.setattr(database, 'replica_session_maker', async_sessionmaker(engine, class_=AsyncSession))
+    monkeypatch.setattr(database, 'replica_monitor', monitor)
+    monkeypatch.setattr(database, 'recent_writers', TTLCache(maxsize=100, ttl=database.READ_YOUR_WRITES_WINDOW))
+    app.dependency_overrides.pop(database.get_read_session)
+    yield monitor
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def gig_on_primary(session_maker):
+    async def insert_gig():
+        async with session_maker() as session:
+            await session.execute(gigs.insert().values(
+                gigs_title='Logo', duration=3, price=10, description='A logo', category_id=1, user_id=1,
+                job_type='one_time_project', work_mode='online'
+            ))
+            await session.commit()
+
+    asyncio.run(insert_gig())
+
+
+def listed_titles(client):
+    response = client.get('/public/gigs')
+    assert response.status_code == 200
+    return [gig['gigs_title'] for gig in response.json()['items']]
+
+
+def test_reads_go_to_the_replica(client, replica, gig_on_primary):
+    assert listed_titles(client) == []
+    assert (replica.replica_reads, replica.primary_fallbacks, replica.sticky_reads) == (1, 0, 0)
+
+
+def test_a_write_pins_later_reads_to_the_primary(client, register, replica, gig_on_primary):
+    assert register('owner').status_code == 200
+    assert client.cookies.get(database.STICKY_COOKIE) == '1'
+
+    assert listed_titles(client) == ['Logo']
+    assert (replica.replica_reads, replica.sticky_reads) == (0, 1)
+
+    client.cookies.clear()
+    assert listed_titles(client) == []
+
+
+def test_lagging_replica_falls_back_to_the_primary(client, replica, gig_on_primary, monkeypatch):
+    # SQLite always reports zero lag, so a negative allowance makes it count as too far behind.
+    monkeypatch.setattr(replica, 'max_lag', -1)
+    assert listed_titles(client) == ['Logo']
+    assert (replica.replica_reads, replica.primary_fallbacks, replica.healthy) == (0, 1, False)
+
+
+def test_unreachable_replica_falls_back_to_the_primary(client, replica, gig_on_primary, tmp_path, monkeypatch):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    monkeypatch.setattr(database, 'replica_engine', create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "missing" / "replica.db"}'))
+    assert listed_titles(client) == ['Logo']
+    assert (replica.primary_fallbacks, replica.lag, replica.healthy) == (1, None, False)
@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from auth import utils
+from models.models import revoked_token
+
+
+def login_tokens(client, username):
+    return client.post('/auth/login', json={'username': username, 'password': 'secret'}).json()
+
+
+def test_logout_revokes_in_this_worker_without_a_refresh(client, register):
+    register('owner')
+    tokens = login_tokens(client, 'owner')
+    headers = {'Authorization': f'Bearer {tokens["access"]}'}
+    assert client.get('/auth/get_current_user', headers=headers).status_code == 200
+
+    assert client.post('/auth/logout', json={'refresh': tokens['refresh']}, headers=headers).status_code == 200
+    assert not utils.revoked_tokens.stale()
+    response = client.get('/auth/get_current_user', headers=headers)
+    assert response.status_code == 401
+    assert response.json()['detail'] == 'Token is revoked!'
+
+
+def test_other_workers_revocations_arrive_on_refresh(client, register, session_maker):
+    register('owner')
+    tokens = login_tokens(client, 'owner')
+    headers = {'Authorization': f'Bearer {tokens["access"]}'}
+    assert client.get('/auth/get_current_user', headers=headers).status_code == 200
+    jti = utils.decode_token(tokens['access'])['jti']
+
+    async def revoke_elsewhere():
+        async with session_maker() as session:
+            await session.execute(revoked_token.insert().values(
+                jti=jti, expires_at=datetime.utcnow() + timedelta(minutes=5), revoked_at=datetime.utcnow()
+            ))
+            await session.commit()
+
+    asyncio.run(revoke_elsewhere())
+    # Until the next sync the request is answered from the local set alone.
+    assert client.get('/auth/get_current_user', headers=headers).status_code == 200
+    utils.revoked_tokens._next_refresh = 0.0
+    assert client.get('/auth/get_current_user', headers=headers).status_code == 401
+    assert jti in utils.revoked_tokens
+
+
+def test_expired_entries_are_pruned_on_refresh(session_maker):
+    revocations = utils.RevocationList(refresh_interval=0)
+
+    async def run():
+        revocations.add('gone', datetime.utcnow() - timedelta(seconds=1))
+        revocations.add('live', datetime.utcnow() + timedelta(minutes=5))
+        async with session_maker() as session:
+            await revocations.refresh(session)
+
+    asyncio.run(run())
+    assert 'gone' not in revocations
+    assert 'live' in revocations
+    assert len(revocations) == 1
@@ -0,0 +1,40 @@
+GIG = dict(duration=3, price=100, description='Services built with FastAPI', job_type='full_time', work_mode='online')
+
+
+def _search(client, q):
+    response = client.get('/public/search', params={'q': q})
+    assert response.status_code == 200
+    return [item['id'] for item in response.json()['items']], response.json()['total']
+
+
+def _create_gig(client, headers, title, category_id=1):
+    response = client.post('/gig', json=dict(GIG, gigs_title=title, category_id=category_id), headers=headers)
+    assert response.status_code == 201, response.text
+
+
+def test_search_ranks_title_matches_and_tolerates_typos(client, register, login):
+    register('owner')
+    headers = login('owner')
+    client.post('/superuser/gigs_category', json={'category_name': 'programming'}, headers=headers)
+    _create_gig(client, headers, 'Python backend developer')
+    _create_gig(client, headers, 'Logo designer')
+
+    assert _search(client, 'pyhton') == ([1], 1)
+    assert _search(client, 'dev') == ([1], 1)
+    assert _search(client, 'programming') == ([1, 2], 2)
+
+
+def test_search_drops_switched_off_and_deleted_gigs(client, register, login):
+    register('owner')
+    headers = login('owner')
+    client.post('/superuser/gigs_category', json={'category_name': 'programming'}, headers=headers)
+    _create_gig(client, headers, 'Python backend developer')
+    _create_gig(client, headers, 'Python data engineer')
+    assert _search(client, 'python') == ([1, 2], 2)
+
+    assert client.put('/gigs/1/status', json={'status': False}, headers=headers).status_code == 201
+    assert _search(client, 'python') == ([2], 1)
+
+    assert client.put('/gigs/1/status', json={'status': True}, headers=headers).status_code == 201
+    assert client.delete('/gigs/2', headers=headers).status_code == 200
+    assert _search(client, 'python') == ([1], 1)
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import statistics
+import time
+
+import pytest
+from sqlalchemy import event, insert
+
+from models.models import metadata, gig_search_index, user, seller, skills, seller_skills, experience, certificate
+from seller.utils import load_seller_profile, _load_profile_sequential
+
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+EXPERIENCE = dict(start_date=None, end_date=None, city=None, country=None, job_title=None, description=None)
+
+
+def test_public_and_private_profiles_match_and_follow_writes(client, register, login):
+    register('owner', is_seller=True)
+    headers = login('owner')
+    client.post('/superuser/skill_toseller', json={'skill_name': 'python'}, headers=headers)
+    assert client.post('/seller/skill/', json=[1], headers=headers).status_code == 201
+    assert client.post('/experience/', json=dict(EXPERIENCE, company_name='Acme'), headers=headers).status_code == 201
+
+    private = client.get('/seller/profile/', headers=headers).json()
+    public = client.get('/public/seller/profile/1').json()
+    assert public == private
+    assert public['skills'] == [{'id': 1, 'skill_name': 'python'}]
+    assert [exp['company_name'] for exp in public['experience']] == ['Acme']
+
+    # The public profile is cached; a write by the owner must invalidate it.
+    client.post('/experience/', json=dict(EXPERIENCE, company_name='Globex'), headers=headers)
+    public = client.get('/public/seller/profile/1').json()
+    assert [exp['company_name'] for exp in public['experience']] == ['Acme', 'Globex']
+    assert client.get('/public/seller/profile/2').status_code == 404
+
+
+async def _timed(load, rounds=200):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await load()
+        timings.append(time.perf_counter() - started)
+    quantiles = statistics.quantiles(timings, n=100)
+    return quantiles[49], quantiles[98], len(timings) / sum(timings)
+
+
+async def _profiles():
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    tables = [table for table in metadata.sorted_tables if table is not gig_search_index]
+    engine = create_async_engine(TEST_DATABASE_URL)
+    statements = []
+    event.listen(engine.sync_engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(metadata.drop_all, tables=tables)
+            await connection.run_sync(metadata.create_all, tables=tables)
+            await connection.execute(insert(user).values(id=1, email='a@example.com', username='a', password='x'))
+            await connection.execute(insert(seller).values(id=1, user_id=1, description='about'))
+            await connection.execute(insert(skills).values([{'id': 1, 'skill_name': 'go'}, {'id': 2, 'skill_name': 'sql'}]))
+            await connection.execute(insert(seller_skills).values([{'seller_id': 1, 'skill_id': 2}, {'seller_id': 1, 'skill_id': 1}]))
+            await connection.execute(insert(experience).values(seller_id=1, company_name='Acme'))
+            await connection.execute(insert(certificate).values(seller_id=1, pdf_url='/c.pdf'))
+        async with async_sessionmaker(engine)() as session:
+            statements.clear()
+            assembled = await load_seller_profile(session, seller_id=1)
+            round_trips = len(statements)
+            statements.clear()
+            sequential = await _load_profile_sequential(session, seller.c.id == 1)
+            sequential_round_trips = len(statements)
+            # Loopback first, then with a 1 ms network round trip modelled as a pause before every statement.
+            for label, rtt in (('loopback', 0), ('1ms rtt', 0.001)):
+                delay = lambda *args: time.sleep(rtt)
+                event.listen(engine.sync_engine, 'before_cursor_execute', delay)
+                before = await _timed(lambda: _load_profile_sequential(session, seller.c.id == 1))
+                after = await _timed(lambda: load_seller_profile(session, seller_id=1))
+                event.remove(engine.sync_engine, 'before_cursor_execute', delay)
+                print('profile %s p50/p99 ms, loads/s: %d statements %.2f/%.2f, %.0f; one statement %.2f/%.2f, %.0f' % (
+                    label, sequential_round_trips, before[0] * 1e3, before[1] * 1e3, before[2],
+                    after[0] * 1e3, after[1] * 1e3, after[2]))
+        async with engine.begin() as connection:
+            await connection.run_sync(metadata.drop_all, tables=tables)
+    finally:
+        await engine.dispose()
+    return assembled, round_trips, sequential, sequential_round_trips
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL is not set')
+def test_postgres_profile_is_one_round_trip_and_matches_sequential_loader():
+    assembled, round_trips, sequential, sequential_round_trips = asyncio.run(_profiles())
+    assert round_trips == 1
+    assert sequential_round_trips > 1
+    assert assembled == sequential
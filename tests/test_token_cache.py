@@ -0,0 +1,85 @@
+import asyncio
+import statistics
+import time
+from types import SimpleNamespace
+
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import event
+
+from auth import utils
+from cache import TTLCache
+
+
+def test_repeated_token_is_decoded_once(client, register, login, monkeypatch):
+    register('owner')
+    headers = login('owner')
+    decoded = []
+    decode_token = utils.decode_token
+    monkeypatch.setattr(utils, 'decode_token', lambda token: decoded.append(token) or decode_token(token))
+    hits = utils.token_cache.hits
+
+    for _ in range(3):
+        assert client.get('/auth/get_current_user', headers=headers).status_code == 200
+    assert len(decoded) == 1
+    assert utils.token_cache.hits == hits + 2
+
+
+def test_cached_token_still_expires_at_its_exp(client, register, login, monkeypatch):
+    register('owner')
+    headers = login('owner')
+    assert client.get('/auth/get_current_user', headers=headers).status_code == 200
+
+    # The entry is still cached (its TTL runs on the monotonic clock), but the token's own exp has passed.
+    later = time.time() + utils.ACCESS_TOKEN_LIFETIME.total_seconds() + 1
+    monkeypatch.setattr(utils, 'time', SimpleNamespace(time=lambda: later, monotonic=time.monotonic))
+    response = client.get('/auth/get_current_user', headers=headers)
+    assert response.status_code == 401
+    assert response.json()['detail'] == 'Token is expired!'
+
+
+def test_tampered_token_misses_the_cache(client, register, login):
+    register('owner')
+    headers = login('owner')
+    assert client.get('/auth/get_current_user', headers=headers).status_code == 200
+
+    tampered = {'Authorization': headers['Authorization'][:-2] + 'xx'}
+    assert client.get('/auth/get_current_user', headers=tampered).status_code == 401
+
+
+def test_cache_is_bounded_and_counts_hits():
+    cache = TTLCache(maxsize=2, ttl=60)
+    for key in 'abc':
+        cache.set(key, key.upper())
+    assert cache.get('a') is None
+    assert cache.get('c') == 'C'
+    stats = cache.stats()
+    assert (stats['size'], stats['evictions'], stats['hits'], stats['misses']) == (2, 1, 1, 1)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_cached_verify_is_db_free_and_faster(client, register, login, session_maker):
+    register('owner')
+    credentials = HTTPAuthorizationCredentials(scheme='Bearer', credentials=login('owner')['Authorization'][7:])
+    statements = []
+    event.listen(session_maker.kw['bind'].sync_engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    async def measure(cached, rounds=300):
+        timings = []
+        async with session_maker() as session:
+            await utils.verify_token(credentials, session)
+            statements.clear()
+            for _ in range(rounds):
+                if not cached:
+                    utils.token_cache.clear()
+                    utils.claims_versions.clear()
+                started = time.perf_counter()
+                await utils.verify_token(credentials, session)
+                timings.append(time.perf_counter() - started)
+        return statistics.quantiles(timings, n=100), len(statements)
+
+    (uncached, uncached_statements), (cached, cached_statements) = asyncio.run(measure(False)), asyncio.run(measure(True))
+    print('verify_token p50/p99 us: uncached %.0f/%.0f, cached %.0f/%.0f' % (
+        uncached[49] * 1e6, uncached[98] * 1e6, cached[49] * 1e6, cached[98] * 1e6))
+    assert cached_statements == 0
+    assert uncached_statements == 300
+    assert cached[49] * 10 < uncached[49]